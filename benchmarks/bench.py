@@ -0,0 +1,255 @@
+"""组合、回写、检查与导入等主要路径的基准测试。
+
+在仓库根目录运行：
+
+    python -m benchmarks.bench                       # 与 benchmarks/baseline.json 比较
+    python -m benchmarks.bench --sizes 10 1000       # 只测部分规模
+    python -m benchmarks.bench --save-baseline       # 以本次结果作为新的基线
+
+界面相关的操作在 QT_QPA_PLATFORM=offscreen 下驱动真实窗口。每项操作报告多次
+运行耗时的中位数，以及单独一次运行在 tracemalloc 下的 Python 内存峰值（不含 Qt
+在 C++ 侧的分配）。超过基线的比例大于阈值时以退出码 1 结束。基线与机器相关，
+换机器后应重新生成。
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from prompt_builder.core import ModuleCollection, ModuleItem, compose_prompt, load_preset, save_preset  # noqa: E402
+
+BASELINE = Path(__file__).with_name("baseline.json")
+SIZES = (10, 1000, 10000, 100000)
+
+WORDS = ["模型", "约束", "边界条件", "数值", "估算", "analysis", "result", "parameter", "energy", "noise"]
+
+
+def synthetic_modules(count: int, seed: int = 0) -> ModuleCollection:
+    """生成 count 个模块：正文长度从几十到几千字符不等，夹杂占位符与中英文。"""
+    rng = random.Random(seed)
+    modules = []
+    for i in range(count):
+        lines = []
+        for _ in range(max(1, int(rng.lognormvariate(2.0, 1.0)))):
+            words = rng.choices(WORDS, k=rng.randint(3, 12))
+            if rng.random() < 0.2:
+                words.append("{" + rng.choice(WORDS) + "}")
+            lines.append(" ".join(words))
+        modules.append(ModuleItem(f"M{i}", f"模块 {i}", "\n".join(lines), rng.random() > 0.1))
+    return ModuleCollection(modules)
+
+
+def copy_modules(modules: ModuleCollection) -> ModuleCollection:
+    return ModuleCollection(ModuleItem(m.key, m.title, m.content, m.enabled) for m in modules)
+
+
+class Case:
+    """一项操作：setup 准备状态（不计时），run 为被测代码。"""
+
+    def __init__(self, name: str, run: Callable[[], Any], setup: Optional[Callable[[], None]] = None) -> None:
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        case.setup()
+        start = time.perf_counter()
+        case.run()
+        times.append(time.perf_counter() - start)
+    case.setup()
+    tracemalloc.start()
+    try:
+        case.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_bytes": peak}
+
+
+def core_cases(modules: ModuleCollection, workdir: Path) -> Iterator[Case]:
+    yield Case("compose_prompt", lambda: compose_prompt(modules))
+    yield Case("load_preset_json", lambda: load_preset(str(workdir / "preset.json")))
+    yield Case("load_preset_pack", lambda: load_preset(str(workdir / "preset.pbpack")))
+
+
+def gui_cases(modules: ModuleCollection, workdir: Path) -> Iterator[Case]:
+    from PySide6.QtWidgets import QApplication
+
+    from prompt_builder.gui import PromptBuilderWindow
+
+    app = QApplication.instance() or QApplication([])
+    window = PromptBuilderWindow()
+    window.resize(1280, 820)
+    window.show()
+    window.tabs.setCurrentWidget(window.preview_tab)
+    window.ensure_preview_tab()
+    app.processEvents()
+    try:
+        yield from window_cases(app, window, modules, workdir)
+    finally:
+        window.close()
+        app.processEvents()
+
+
+def window_cases(app, window, modules: ModuleCollection, workdir: Path) -> Iterator[Case]:
+    def settle() -> None:
+        # 把统计、检查等后台工作做完，避免计入下一项操作
+        app.processEvents()
+        while window._token_dirty:
+            window.flush_token_counts()
+        window.validation_timer.stop()
+        window.validator.cancel()
+        window.validator.wait()
+        app.processEvents()
+
+    def load() -> None:
+        window.set_modules(copy_modules(modules))
+        window.refresh_preview_from_modules()
+        settle()
+
+    json_path = workdir / "preset.json"
+
+    def import_preset() -> None:
+        # 与“导入预设”相同，只是不弹文件对话框
+        window.set_modules(load_preset(str(json_path)))
+        window.select_first_module()
+        window.refresh_preview_from_modules()
+
+    yield Case("import_preset", import_preset, settle)
+    yield Case("set_modules", lambda: window.set_modules(copy_modules(modules)), load)
+
+    def unfiltered() -> None:
+        window.filter_input.clear()
+        load()
+
+    yield Case("filter_module_list", lambda: window.filter_input.setText("模块 9"), unfiltered)
+    yield Case("refresh_preview_from_modules", window.refresh_preview_from_modules, load)
+
+    def parse_back() -> None:
+        window.parse_preview_back(window.preview_editor.toPlainText())
+
+    yield Case("parse_preview_back", parse_back, load)
+
+    def keystroke() -> None:
+        # 在第一个段落正文里输入一个字符：预览回写、索引、高亮与统计的增量路径
+        cursor = window.preview_editor.textCursor()
+        block = window.preview_editor.document().findBlock(window._sections.offset(0))
+        cursor.setPosition(block.position() + block.length())
+        cursor.insertText("x")
+        app.processEvents()
+
+    yield Case("preview_keystroke", keystroke, load)
+
+    def validate() -> None:
+        window.run_validation(manual=True)
+        window.validator.wait()
+        app.processEvents()
+
+    yield Case("validate_preview", validate, load)
+
+
+def run_suite(sizes: List[int], repeat: int, gui: bool, stream=sys.stdout) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        modules = synthetic_modules(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = Path(tmp)
+            save_preset(str(workdir / "preset.json"), modules)
+            save_preset(str(workdir / "preset.pbpack"), modules)
+            for case in core_cases(modules, workdir):
+                record(results, case, size, repeat, stream)
+            if gui:
+                for case in gui_cases(modules, workdir):
+                    record(results, case, size, repeat, stream)
+    return results
+
+
+def record(results: Dict[str, Dict[str, float]], case: Case, size: int, repeat: int, stream) -> None:
+    # 大规模下的慢操作只跑一次，避免整套测试耗时过长
+    result = measure(case, 1 if size >= 100000 else repeat)
+    results[f"{case.name}/{size}"] = result
+    print(f"{case.name:<30} {size:>7}  {result['seconds'] * 1000:10.1f} ms  "
+          f"{result['peak_bytes'] / 1048576:9.1f} MB", file=stream, flush=True)
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    max_slowdown: float,
+    max_memory_growth: float,
+    min_seconds: float,
+    min_bytes: int,
+) -> List[Tuple[str, str]]:
+    """返回超出阈值的项目。过小的耗时与内存波动大，低于下限的不参与比较。"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["seconds"] >= min_seconds and result["seconds"] > base["seconds"] * max_slowdown:
+            regressions.append((name, f"耗时 {base['seconds'] * 1000:.1f} → {result['seconds'] * 1000:.1f} ms"))
+        if result["peak_bytes"] >= min_bytes and result["peak_bytes"] > base["peak_bytes"] * max_memory_growth:
+            regressions.append(
+                (name, f"内存峰值 {base['peak_bytes'] / 1048576:.1f} → {result['peak_bytes'] / 1048576:.1f} MB")
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench", description="Prompt 模板生成器基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="模块数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项操作计时的次数，取中位数")
+    parser.add_argument("--no-gui", action="store_true", help="只测不依赖界面的操作")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="基线 JSON 文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--json", type=Path, help="另存本次结果")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="耗时超过基线的倍数阈值")
+    parser.add_argument("--max-memory-growth", type=float, default=1.25, help="内存峰值超过基线的倍数阈值")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="低于此耗时的操作不比较耗时")
+    parser.add_argument("--min-mb", type=float, default=1.0, help="低于此峰值的操作不比较内存")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.repeat, not args.no_gui)
+    payload = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    if args.json:
+        args.json.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.save_baseline:
+        if args.baseline.exists():
+            # 只覆盖本次测到的项目，保留其他规模的基线
+            previous = json.loads(args.baseline.read_text(encoding="utf-8"))
+            payload["results"] = {**previous.get("results", {}), **results}
+        args.baseline.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"基线已写入：{args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"没有基线文件 {args.baseline}，跳过比较", file=sys.stderr)
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+    regressions = compare(
+        results, baseline, args.max_slowdown, args.max_memory_growth, args.min_ms / 1000, int(args.min_mb * 1048576)
+    )
+    for name, detail in regressions:
+        print(f"退化：{name}  {detail}", file=sys.stderr)
+    if regressions:
+        return 1
+    print("与基线相比没有超出阈值的退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+from .core import (
+    DEFAULT_MODULES,
+    ModuleCollection,
+    ModuleItem,
+    compose_prompt,
+    load_preset,
+    modules_from_payload,
+    modules_to_payload,
+    parse_prompt,
+    parse_sections,
+    render_section,
+    save_preset,
+    write_prompt,
+)
+from .templates import (
+    CompiledTemplate,
+    Placeholder,
+    TemplateCache,
+    compile_modules,
+    compile_template,
+    fill_placeholders,
+)
+from .tokens import EstimatingTokenizer, TokenCounter, Tokenizer, VocabTokenizer, load_tokenizer
+
+__all__ = [
+    "CompiledTemplate",
+    "DEFAULT_MODULES",
+    "EstimatingTokenizer",
+    "ModuleCollection",
+    "ModuleItem",
+    "Placeholder",
+    "TemplateCache",
+    "TokenCounter",
+    "Tokenizer",
+    "VocabTokenizer",
+    "compile_modules",
+    "compile_template",
+    "compose_prompt",
+    "fill_placeholders",
+    "load_preset",
+    "load_tokenizer",
+    "modules_from_payload",
+    "modules_to_payload",
+    "parse_prompt",
+    "parse_sections",
+    "render_section",
+    "save_preset",
+    "write_prompt",
+]
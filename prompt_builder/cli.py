@@ -0,0 +1,183 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO
+
+from .core import compose_prompt, load_preset
+from .export import export_archive, export_text, unique_member
+from .includes import resolve_includes
+from .templates import compile_modules
+
+COMMANDS = {"render", "search", "diff", "variants", "serve"}
+
+def iter_rows(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"第 {lineno} 行不是 JSON 对象")
+        yield row
+
+
+def row_filename(row: Dict[str, Any], index: int, name_key: Optional[str]) -> str:
+    # 不安全字符的替换与重名处理见 export.unique_member
+    if name_key and row.get(name_key) not in (None, ""):
+        return str(row[name_key]) + ".txt"
+    return f"{index:08d}.txt"
+
+
+def render_command(args: argparse.Namespace) -> int:
+    modules = load_preset(args.preset)
+    template = compose_prompt(modules)
+
+    if not args.vars:
+        text = template.strip() + "\n"
+        if args.archive:
+            export_archive(args.archive, [{"name": "prompt.txt", "text": text}], 1)
+        elif args.out:
+            out = Path(args.out)
+            out.mkdir(parents=True, exist_ok=True)
+            export_text(out / "prompt.txt", text)
+        else:
+            sys.stdout.write(text)
+        return 0
+
+    compiled = compile_modules(resolve_includes(modules))
+    stream = sys.stdin if args.vars == "-" else open(args.vars, encoding="utf-8")
+    with stream:
+        # 逐行读取、逐个写出，内存占用与行数无关；模板只编译一次
+        rows = (
+            {"name": row_filename(row, index, args.name_key), "text": compiled.fill(row).strip() + "\n"}
+            for index, row in enumerate(iter_rows(stream))
+        )
+        if args.archive:
+            # 总数未知，不报告进度；归档整体写完后才替换到目标路径
+            count = export_archive(args.archive, rows, 0)
+            target = args.archive
+        else:
+            out = Path(args.out)
+            out.mkdir(parents=True, exist_ok=True)
+            count = 0
+            # --name-key 取值相同的行依次加序号，与归档中的成员名一致，不会互相覆盖
+            used: Set[str] = set()
+            for row in rows:
+                (out / unique_member(row["name"], used)).write_text(row["text"], encoding="utf-8")
+                count += 1
+            target = str(out)
+    print(f"已生成 {count} 个 Prompt：{target}", file=sys.stderr)
+    return 0
+
+
+def search_command(args: argparse.Namespace) -> int:
+    from .library import PresetLibrary
+
+    library = PresetLibrary(args.library)
+    try:
+        stats = library.update()
+        for path, error in stats.failed:
+            print(f"跳过 {path}：{error}", file=sys.stderr)
+        for hit in library.search(args.query, args.limit):
+            print(f"{hit.path}\t[{hit.key}] {hit.title}\t{hit.snippet}")
+    finally:
+        library.close()
+    return 0
+
+
+def diff_command(args: argparse.Namespace) -> int:
+    from .diff import diff_presets, load_modules, unified_lines
+
+    result = diff_presets(load_modules(args.old), load_modules(args.new))
+    if not args.summary:
+        for line in unified_lines(result, args.context):
+            print(line)
+    print(result.summary(), file=sys.stderr)
+    # 与 diff 命令一致：相同返回 0，有差异返回 1
+    return 1 if result else 0
+
+
+def variants_command(args: argparse.Namespace) -> int:
+    from .variants import VariantMatrix, axes_from_spec, generate_variants
+
+    modules = load_preset(args.preset)
+    spec = json.loads(Path(args.spec).read_text(encoding="utf-8"))
+    matrix = VariantMatrix(modules, axes_from_spec(spec, modules))
+    sizes = " × ".join(f"{axis.name}({len(axis.values)})" for axis in matrix.axes)
+    print(f"共 {len(matrix)} 个变体：{sizes}", file=sys.stderr)
+    if args.count:
+        return 0
+    stats = generate_variants(matrix, args.out, args.workers, args.chunk_size)
+    print(f"已写出 {stats.written} 个变体，跳过重复 {stats.duplicates} 个：{args.out}", file=sys.stderr)
+    return 0
+
+
+def serve_command(args: argparse.Namespace) -> int:
+    import asyncio
+
+    from .server import serve
+
+    try:
+        asyncio.run(serve(args.presets, args.host, args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="app.py", description="Prompt 模板生成器命令行工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="按预设批量渲染 Prompt（无需图形界面）")
+    render.add_argument("preset", help="预设文件（JSON 或 .pbpack 预设包）")
+    render.add_argument("--vars", help="占位符取值，JSONL 每行一个对象；- 表示标准输入")
+    render.add_argument("--out", help="输出目录；不指定时输出到标准输出")
+    render.add_argument("--name-key", help="用行内该字段的值作为输出文件名")
+    render.add_argument("--archive", help="写入一个 zip / tar / tar.gz 归档，代替输出目录")
+    render.set_defaults(handler=render_command)
+
+    search = commands.add_parser("search", help="在预设库目录中全文检索模块（索引增量更新）")
+    search.add_argument("library", help="预设库目录")
+    search.add_argument("query", help="检索词，空格分隔的各段需同时命中")
+    search.add_argument("--limit", type=int, default=20, help="最多显示的结果数")
+    search.set_defaults(handler=search_command)
+
+    diff = commands.add_parser("diff", help="按模块比较两份预设或两个自动保存的会话目录")
+    diff.add_argument("old", help="旧预设（JSON、.pbpack 或自动保存目录）")
+    diff.add_argument("new", help="新预设")
+    diff.add_argument("--context", type=int, default=3, help="内容差异保留的上下文行数")
+    diff.add_argument("--summary", action="store_true", help="只输出统计")
+    diff.set_defaults(handler=diff_command)
+
+    variants = commands.add_parser("variants", help="按变体矩阵生成全部 Prompt 组合（多进程，按内容去重）")
+    variants.add_argument("preset", help="预设文件（JSON 或 .pbpack 预设包）")
+    variants.add_argument("spec", help="变体矩阵定义（JSON），列出各维度")
+    variants.add_argument("--out", help="输出目录，另写 variants.jsonl 记录各变体的取值")
+    variants.add_argument("--workers", type=int, default=0, help="工作进程数，默认为 CPU 核数")
+    variants.add_argument("--chunk-size", type=int, default=256, help="每个任务渲染的变体数")
+    variants.add_argument("--count", action="store_true", help="只输出变体总数")
+    variants.set_defaults(handler=variants_command)
+
+    serve = commands.add_parser("serve", help="启动本地 HTTP 服务，按目录中的预设组合、填充与检查 Prompt")
+    serve.add_argument("presets", help="预设目录（含子目录）")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址，默认只接受本机连接")
+    serve.add_argument("--port", type=int, default=8765, help="监听端口；0 表示由系统分配")
+    serve.add_argument("--interval", type=float, default=1.0, help="检查预设文件变化的间隔（秒），0 表示不检查")
+    serve.set_defaults(handler=serve_command)
+    return parser
+
+
+def main(argv: List[str]) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "vars", None) and not (args.out or args.archive):
+        parser.error("--vars 需要同时指定 --out 或 --archive")
+    if args.command == "variants" and not (args.out or args.count):
+        parser.error("variants 需要指定 --out 或 --count")
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, TypeError) as exc:
+        # TypeError 来自预设中模块字段不符（ModuleItem 不接受的键）
+        print(f"错误：{exc}", file=sys.stderr)
+        return 1
@@ -0,0 +1,467 @@
+import hashlib
+import json
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+if TYPE_CHECKING:
+    from .export import Progress
+    from .includes import IncludeResolver
+
+
+def content_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class Body:
+    """不可变的模块正文。摘要按需计算后缓存。"""
+
+    __slots__ = ("text", "_digest", "__weakref__")
+
+    def __init__(self, text: str, digest: Optional[bytes] = None) -> None:
+        self.text = text
+        self._digest = digest
+
+    @property
+    def digest(self) -> bytes:
+        if self._digest is None:
+            self._digest = content_digest(self.text)
+        return self._digest
+
+
+class ContentPool:
+    """按内容摘要去重的正文池。
+
+    只持有弱引用：没有模块再引用的正文随之释放，池的大小与仍在使用的不同
+    正文数量成正比。
+    """
+
+    def __init__(self) -> None:
+        self._bodies: "weakref.WeakValueDictionary[bytes, Body]" = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def intern(self, text: str) -> Body:
+        digest = content_digest(text)
+        body = self._bodies.get(digest)
+        if body is None:
+            body = self._bodies[digest] = Body(text, digest)
+        return body
+
+
+CONTENT_POOL = ContentPool()
+
+
+class ModuleItem:
+    """一个模块。
+
+    构造时正文放进 CONTENT_POOL，内容相同的模块共用一份字符串；复制模块也
+    共用正文。编辑（给 content 赋值）时换成该模块独有的新正文，不影响共用
+    旧正文的其他模块，也不必在每次输入时计算摘要。
+    """
+
+    __slots__ = ("key", "title", "enabled", "_body")
+
+    def __init__(self, key: str, title: str, content: str, enabled: bool = True) -> None:
+        self.key = key
+        self.title = title
+        self.enabled = enabled
+        self._body: Optional[Body] = CONTENT_POOL.intern(content)
+
+    @property
+    def content(self) -> str:
+        return self._body.text
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._body = Body(value)
+
+    @property
+    def digest(self) -> bytes:
+        """正文摘要。比较两个模块的内容时比较摘要即可。"""
+        return self._body.digest
+
+    @property
+    def loaded(self) -> bool:
+        """内容是否已在内存中；从预设包按需读取的模块见 packfile.LazyModuleItem。"""
+        return True
+
+    @property
+    def size_hint(self) -> int:
+        """内容长度的估计值，不会触发按需读取。"""
+        return len(self.content)
+
+    def same_content(self, other: "ModuleItem") -> bool:
+        return self._body is other._body or self.digest == other.digest
+
+    def copy(self) -> "ModuleItem":
+        """与原模块共用正文的副本。"""
+        item = ModuleItem.__new__(ModuleItem)
+        item.key, item.title, item.enabled, item._body = self.key, self.title, self.enabled, self._body
+        return item
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"key": self.key, "title": self.title, "content": self.content, "enabled": self.enabled}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ModuleItem):
+            return NotImplemented
+        return (
+            self.key == other.key
+            and self.title == other.title
+            and self.enabled == other.enabled
+            and self.same_content(other)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(key={self.key!r}, title={self.title!r}, "
+            f"content=<{self.size_hint} chars>, enabled={self.enabled!r})"
+        )
+
+
+DEFAULT_MODULES: List[ModuleItem] = [
+    ModuleItem("A", "专家角色模块（可替换）", """你是一位领域顶级专家，在以下方向具备长期、系统、可验证的研究经验：
+
+主领域：{主领域，如 等离子体物理 / 光学 / 加速器物理 / 机械工程 / 控制理论}
+次领域（可多选）：{相关分支}
+
+研究方法覆盖：
+- 理论建模
+- 数值模拟
+- 实验设计与数据分析
+
+你的回答应体现：
+- 清晰的物理/工程图像
+- 严格的假设与适用边界
+- 可复现、可验证、可扩展的思路"""),
+    ModuleItem("B", "用户背景模块（稳定）", """我是一名受过严格训练的专业研究人员（博士及以上水平），具备良好的数学、物理和工程基础。
+
+你可以默认我能够理解：
+- 方程、量纲分析、无量纲参数
+- 常见近似、数值方法、实验不确定性
+
+但请你：
+- 把关键逻辑与物理因果链讲清楚
+- 明确指出常见误区与失效条件"""),
+    ModuleItem("C", "回答总原则（强约束）", """- 先框架，后细节
+  - 先给最小自洽模型 / 控制方程 / 系统结构
+  - 再展开推导、对比与结论
+- 明确假设与边界
+  - 所有近似必须说明：何时成立、何时失效
+- 不确定性显式化
+  - 无数据 ≠ 猜测
+  - 请给出区间、主导不确定源、需要的补充信息
+- 前沿问题给证据链
+  - 教材 / 综述 / 原始论文 / 实验报告
+  - 给出处、作者、年份（必要时给 DOI 或 arXiv）
+- 科研导向
+  - 不只回答“是什么”
+  - 还要回答“如何验证 / 如何测量 / 如何模拟 / 如何反证”"""),
+    ModuleItem("D", "标准输出结构模块（默认开启）", """若无特殊说明，请按以下结构输出：
+
+1️⃣ 结论速览（Executive Summary）
+- 3–6 条核心结论
+- 给出物理或工程上的“为什么”
+
+2️⃣ 物理 / 工程图像
+- 核心机制
+- 主导过程
+- 因果关系
+
+3️⃣ 模型与关键方程
+- 控制方程
+- 主要无量纲参数
+- 主导项 vs 次要项
+
+4️⃣ 对比表格（核心）
+方案 / 机制	基本原理	关键参数	典型量级	优点	局限	适用条件	可观测量
+
+5️⃣ 核心计算 / 数量级估算
+- 明确步骤
+- 明确单位
+- 给出合理数量级或区间
+
+6️⃣ 验证与预测
+- 实验可测量量
+- 参数扫描建议
+- 诊断/数值/工程验证路径
+
+7️⃣ 参考资料
+- 教材
+- 综述
+- 原始论文
+- 数据/实验来源"""),
+    ModuleItem("E", "推导 / 计算 / 模拟规范（按需）", """当问题涉及计算或模拟时：
+
+- 明确采用方法：
+  - 解析 / 数值 / 半经验
+- 若是模拟，说明：
+  - 模型类型（流体 / PIC / MHD / FEM / 控制模型等）
+  - 边界条件
+  - 时间与空间分辨率限制
+  - 常见数值陷阱"""),
+    ModuleItem("F", "问题定义模块（每次只填这里）", """问题陈述：
+{用一句话描述问题}
+
+目标量 / 关注指标：
+{如 能量约束时间 / 诊断信噪比 / 稳定性阈值 / 精度 / 成本}
+
+希望解决的核心矛盾：
+{效率 vs 稳定性 / 精度 vs 成本 / 理论 vs 实验}"""),
+    ModuleItem("G", "已知条件模块（可选填）", """几何/结构参数：
+场/边界条件：
+时间尺度 / 空间尺度：
+已知实验或模拟结果：
+可用诊断 / 计算资源：
+
+若未给出，请你采用物理上合理的默认假设并明确说明。"""),
+    ModuleItem("H", "输出控制开关（每次可改）", """深度级别：科普 / 研究生 / 论文级（默认：研究生）
+数学强度：低 / 中 / 高（默认：中-高）
+对比强度：单方案 / 多方案对比 / 全景对比
+计算程度：
+- 不需要
+- 数量级估算
+- 推导 + 估算
+- 推导 + 估算 + 不确定性分析
+输出长度：短 / 中 / 长"""),
+]
+
+
+class ModuleCollection:
+    """有序模块集合。
+
+    按键取模块与勾选切换为 O(1)；行号索引在插入/删除后从变动处起惰性重建，
+    相邻行移动只更新两项。新键先取空闲字母，之后按递增序号分配 M{n}，
+    并跳过已被占用的键。
+
+    profiles 是随预设保存的启用方案：方案名 → 启用的模块键。
+    """
+
+    def __init__(self, modules: Iterable[ModuleItem] = ()) -> None:
+        self._items: List[ModuleItem] = []
+        self._by_key: Dict[str, ModuleItem] = {}
+        self._rows: Dict[str, int] = {}
+        self._stale_from = 0
+        self._serial = 0
+        self.profiles: Dict[str, List[str]] = {}
+        for module in modules:
+            self.append(module)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[ModuleItem]:
+        return iter(self._items)
+
+    def __getitem__(self, row: int) -> ModuleItem:
+        return self._items[row]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._by_key
+
+    def keys(self) -> List[str]:
+        return [m.key for m in self._items]
+
+    def get(self, key: Optional[str]) -> Optional[ModuleItem]:
+        return self._by_key.get(key) if key is not None else None
+
+    def row_of(self, key: Optional[str]) -> int:
+        if key not in self._by_key:
+            return -1
+        if self._stale_from < len(self._items):
+            for row in range(self._stale_from, len(self._items)):
+                self._rows[self._items[row].key] = row
+            self._stale_from = len(self._items)
+        return self._rows[key]
+
+    def insert(self, row: int, module: ModuleItem) -> None:
+        if module.key in self._by_key:
+            raise ValueError(f"模块键重复：{module.key}")
+        row = max(0, min(row, len(self._items)))
+        self._items.insert(row, module)
+        self._by_key[module.key] = module
+        self._stale_from = min(self._stale_from, row)
+
+    def append(self, module: ModuleItem) -> None:
+        self.insert(len(self._items), module)
+
+    def remove(self, key: str) -> ModuleItem:
+        row = self.row_of(key)
+        if row < 0:
+            raise KeyError(key)
+        module = self._items.pop(row)
+        del self._by_key[key]
+        del self._rows[key]
+        self._stale_from = min(self._stale_from, row)
+        return module
+
+    def move(self, row: int, to_row: int) -> None:
+        module = self._items.pop(row)
+        self._items.insert(to_row, module)
+        lo, hi = min(row, to_row), max(row, to_row)
+        if self._stale_from > hi:
+            for r in range(lo, hi + 1):
+                self._rows[self._items[r].key] = r
+        else:
+            self._stale_from = min(self._stale_from, lo)
+
+    def set_enabled(self, key: str, enabled: bool) -> bool:
+        module = self._by_key[key]
+        if module.enabled == enabled:
+            return False
+        module.enabled = enabled
+        return True
+
+    def enabled_keys(self) -> List[str]:
+        return [m.key for m in self._items if m.enabled]
+
+    def profile_changes(self, name: str) -> List[Tuple[str, bool]]:
+        """切换到启用方案 name 需要改变启用状态的模块，返回 (键, 新状态)。方案中已不存在的键忽略。"""
+        enabled = set(self.profiles[name])
+        return [(m.key, m.key in enabled) for m in self._items if m.enabled != (m.key in enabled)]
+
+    def toggle(self, key: str) -> bool:
+        module = self._by_key[key]
+        module.enabled = not module.enabled
+        return module.enabled
+
+    def allocate_key(self) -> str:
+        for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+            if c not in self._by_key:
+                return c
+        self._serial = max(self._serial, len(self._items))
+        while True:
+            self._serial += 1
+            key = f"M{self._serial}"
+            if key not in self._by_key:
+                return key
+
+
+def render_section(module: ModuleItem) -> str:
+    return f"### [{module.key}] {module.title}\n{module.content.strip()}\n"
+
+
+def utf16_length(text: str) -> int:
+    # 与 QTextDocument 的位置单位一致
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def parse_sections(text: str) -> Tuple[int, List[Tuple[ModuleItem, int]]]:
+    """按 `### [key] title` 标题切分预览文本。
+
+    返回标题之前前言部分的跨度，以及每个模块及其在文档中的跨度（UTF-16 码元，
+    含结尾换行，约定与 sections.SectionIndex 一致）。
+    """
+    preamble = 0
+    sections: List[Tuple[ModuleItem, int]] = []
+    current: Optional[Tuple[str, str]] = None
+    lines: List[str] = []
+    span = 0
+
+    def flush() -> None:
+        if current is not None:
+            key, title = current
+            sections.append((ModuleItem(key, title, "\n".join(lines).strip()), span))
+
+    for line in text.split("\n"):
+        if line.startswith("### [") and "] " in line:
+            flush()
+            key, title = line[5:].split("] ", 1)
+            current = (key, title.strip())
+            lines = []
+            span = utf16_length(line) + 1
+        elif current is not None:
+            lines.append(line)
+            span += utf16_length(line) + 1
+        else:
+            preamble += utf16_length(line) + 1
+    flush()
+    return preamble, sections
+
+
+def parse_prompt(text: str) -> List[ModuleItem]:
+    return [module for module, _ in parse_sections(text)[1]]
+
+
+def compose_prompt(modules: Iterable[ModuleItem], resolver: Optional["IncludeResolver"] = None) -> str:
+    """组合已启用模块的全文，模块间的 {{include:...}} 按 resolver（未提供时临时建立）展开。"""
+    from .includes import resolve_includes
+
+    return "\n".join(render_section(m) for m in resolve_includes(modules, resolver) if m.enabled)
+
+
+def write_prompt(stream: TextIO, modules: Iterable[ModuleItem], resolver: Optional["IncludeResolver"] = None) -> int:
+    """逐段写出与 compose_prompt 相同的文本，不在内存中拼出全文。返回写出的字符数。"""
+    from .includes import resolve_includes
+
+    written = 0
+    for module in resolve_includes(modules, resolver):
+        if not module.enabled:
+            continue
+        if written:
+            stream.write("\n")
+            written += 1
+        section = render_section(module)
+        stream.write(section)
+        written += len(section)
+    return written
+
+
+def profiles_from_payload(payload: Dict[str, Any]) -> Dict[str, List[str]]:
+    profiles = payload.get("profiles") or {}
+    if not isinstance(profiles, dict) or not all(isinstance(keys, list) for keys in profiles.values()):
+        raise ValueError("启用方案格式错误")
+    return {str(name): [str(key) for key in keys] for name, keys in profiles.items()}
+
+
+def modules_from_payload(payload: Dict[str, Any]) -> ModuleCollection:
+    # 格式不对时统一抛出 ValueError，调用方按读取失败处理
+    if not isinstance(payload, dict):
+        raise ValueError("预设格式错误：顶层应为 JSON 对象")
+    entries = payload.get("modules", [])
+    if not isinstance(entries, list) or not all(isinstance(m, dict) for m in entries):
+        raise ValueError("预设格式错误：modules 应为对象列表")
+    modules = ModuleCollection(ModuleItem(**m) for m in entries)
+    if not len(modules):
+        raise ValueError("未读取到模块")
+    modules.profiles = profiles_from_payload(payload)
+    return modules
+
+
+def modules_to_payload(modules: Iterable[ModuleItem]) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"version": 1, "modules": [m.to_dict() for m in modules]}
+    # 没有启用方案时不写该字段，文件与旧版本保持一致
+    profiles = getattr(modules, "profiles", None)
+    if profiles:
+        payload["profiles"] = profiles
+    return payload
+
+
+def load_preset(path: str) -> ModuleCollection:
+    from .packfile import is_pack, load_pack
+
+    if is_pack(path):
+        return load_pack(path)
+    return modules_from_payload(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def save_preset(path: str, modules: Iterable[ModuleItem], progress: Optional["Progress"] = None) -> None:
+    """保存预设；先写临时文件再原子替换，中途出错不会留下残缺的预设。"""
+    from .export import atomic_open
+    from .packfile import PACK_SUFFIX, save_pack
+
+    if Path(path).suffix == PACK_SUFFIX:
+        save_pack(path, modules, progress)
+        return
+    payload = modules_to_payload(modules)
+    with atomic_open(path) as f:
+        f.write(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+    if progress is not None:
+        progress(len(payload["modules"]), len(payload["modules"]))
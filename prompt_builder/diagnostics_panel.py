@@ -0,0 +1,105 @@
+from typing import Optional
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QDialog,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from .metrics import METRICS, Metrics
+
+COLUMNS = ("名称", "次数", "p50 ms", "p95 ms", "p99 ms", "最大 ms", "合计 ms")
+FIELDS = ("count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_ms")
+
+
+class DiagnosticsPanel(QDialog):
+    """热点路径耗时统计（Ctrl+Shift+D 打开）。显示期间每秒刷新一次。"""
+
+    def __init__(self, metrics: Metrics = METRICS, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setWindowTitle("诊断：热点路径耗时")
+        self.resize(720, 360)
+        layout = QVBoxLayout(self)
+
+        top = QHBoxLayout()
+        self.enabled_check = QCheckBox("采集耗时")
+        self.enabled_check.setChecked(metrics.enabled)
+        self.summary_label = QLabel()
+        top.addWidget(self.enabled_check)
+        top.addStretch(1)
+        top.addWidget(self.summary_label)
+        layout.addLayout(top)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.reset_btn = QPushButton("清空")
+        self.dump_btn = QPushButton("导出 JSON")
+        buttons.addStretch(1)
+        buttons.addWidget(self.reset_btn)
+        buttons.addWidget(self.dump_btn)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        self.reset_btn.clicked.connect(self.reset)
+        self.dump_btn.clicked.connect(self.dump)
+
+    def showEvent(self, event) -> None:
+        self.enabled_check.setChecked(self.metrics.enabled)
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.metrics.enabled = enabled
+        self.refresh()
+
+    def reset(self) -> None:
+        self.metrics.reset()
+        self.refresh()
+
+    def refresh(self) -> None:
+        snapshot = self.metrics.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (name, summary) in enumerate(snapshot.items()):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column, field in enumerate(FIELDS, 1):
+                value = summary[field]
+                item = QTableWidgetItem(str(value) if field == "count" else f"{value:.2f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        state = "采集中" if self.metrics.enabled else "未开启"
+        self.summary_label.setText(f"{state}，共 {sum(s['count'] for s in snapshot.values())} 次调用")
+
+    def dump(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "导出诊断数据", "prompt_builder_metrics.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            self.metrics.dump(path)
+        except OSError as exc:
+            self.summary_label.setText(f"导出失败：{exc}")
+            return
+        self.summary_label.setText(f"已导出：{path}")
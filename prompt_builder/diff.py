@@ -0,0 +1,263 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+from .core import ModuleCollection, ModuleItem, load_preset
+from .journal import SNAPSHOT_FILE, Journal
+
+# (tag, i1, i2, j1, j2)，tag 为 equal / replace / delete / insert，含义与 difflib 相同
+Opcode = Tuple[str, int, int, int, int]
+
+# 编辑距离超过此值时不再逐行比对，整段记为替换，内存占用保持在几 MB 以内
+MAX_EDITS = 1000
+
+
+def _matching_blocks(a: Sequence[str], b: Sequence[str], max_edits: int) -> Optional[List[Tuple[int, int, int]]]:
+    """Myers 差分算法，返回按顺序排列的公共块 (i, j, 长度)；编辑距离超过 max_edits 时返回 None。"""
+    n, m = len(a), len(b)
+    limit = min(n + m, max_edits)
+    offset = limit + 1
+    v = [0] * (2 * limit + 3)
+    trace: List[List[int]] = []
+    for d in range(limit + 1):
+        # 保存第 d 步开始前 k ∈ [-d-1, d+1] 的状态，回溯时使用
+        trace.append(v[offset - d - 1: offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: List[List[int]], x: int, y: int) -> List[Tuple[int, int, int]]:
+    blocks = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        # trace[d] 的下标 0 对应 k = -d-1
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+            start_x = v[prev_k + d + 1]
+        else:
+            prev_k = k - 1
+            start_x = v[prev_k + d + 1] + 1
+        start_y = start_x - k
+        if x > start_x:
+            blocks.append((start_x, start_y, x - start_x))
+        x = v[prev_k + d + 1]
+        y = x - prev_k
+    if x > 0:
+        blocks.append((0, 0, x))
+    blocks.reverse()
+    return blocks
+
+
+def line_opcodes(a: Sequence[str], b: Sequence[str], max_edits: int = MAX_EDITS) -> List[Opcode]:
+    """逐行比较 a 与 b。先去掉相同的首尾行，只对中间部分运行 Myers 算法。"""
+    n, m = len(a), len(b)
+    head = 0
+    while head < n and head < m and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and tail < m - head and a[n - 1 - tail] == b[m - 1 - tail]:
+        tail += 1
+    middle = _matching_blocks(a[head: n - tail], b[head: m - tail], max_edits)
+    blocks = [(0, 0, head)]
+    if middle is not None:
+        blocks.extend((i + head, j + head, size) for i, j, size in middle)
+    blocks.append((n - tail, m - tail, tail))
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for bi, bj, size in blocks:
+        if i < bi and j < bj:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(("delete", i, bi, j, j))
+        elif j < bj:
+            opcodes.append(("insert", i, i, j, bj))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal":
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, bi + size, j1, bj + size))
+            else:
+                opcodes.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes
+
+
+def group_opcodes(opcodes: List[Opcode], context: int = 3) -> Iterator[List[Opcode]]:
+    """把改动按上下文分组，相同行只保留改动前后各 context 行（与 difflib 的分组方式一致）。"""
+    if not opcodes:
+        return
+    codes = list(opcodes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = (tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2)
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > context * 2:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+@dataclass
+class ModuleDiff:
+    """一个键在两份预设中的差异。status 为 added / removed / changed / moved。"""
+
+    key: str
+    status: str
+    old: Optional[ModuleItem] = None
+    new: Optional[ModuleItem] = None
+    opcodes: List[Opcode] = field(default_factory=list)
+    old_lines: List[str] = field(default_factory=list)
+    new_lines: List[str] = field(default_factory=list)
+    moved: bool = False
+
+    @property
+    def title_changed(self) -> bool:
+        return self.old is not None and self.new is not None and self.old.title != self.new.title
+
+    @property
+    def enabled_changed(self) -> bool:
+        return self.old is not None and self.new is not None and self.old.enabled != self.new.enabled
+
+    @property
+    def content_changed(self) -> bool:
+        return any(tag != "equal" for tag, *_ in self.opcodes)
+
+    def describe(self) -> str:
+        module = self.new or self.old
+        parts = [f"[{self.key}] {module.title}"]
+        if self.status == "added":
+            parts.append("新增")
+        elif self.status == "removed":
+            parts.append("删除")
+        else:
+            if self.title_changed:
+                parts.append(f"标题：{self.old.title} → {self.new.title}")
+            if self.enabled_changed:
+                parts.append("启用" if self.new.enabled else "停用")
+            if self.content_changed:
+                added = sum(j2 - j1 for tag, _, _, j1, j2 in self.opcodes if tag != "equal")
+                removed = sum(i2 - i1 for tag, i1, i2, _, _ in self.opcodes if tag != "equal")
+                parts.append(f"内容 +{added} -{removed} 行")
+            if self.moved:
+                parts.append("位置变化")
+        return "  ".join(parts)
+
+
+@dataclass
+class PresetDiff:
+    modules: List[ModuleDiff]
+    unchanged: int
+
+    def __bool__(self) -> bool:
+        return bool(self.modules)
+
+    def summary(self) -> str:
+        counts = {status: 0 for status in ("added", "removed", "changed", "moved")}
+        for diff in self.modules:
+            counts[diff.status] += 1
+        return (
+            f"新增 {counts['added']}，删除 {counts['removed']}，修改 {counts['changed']}，"
+            f"仅移动 {counts['moved']}，相同 {self.unchanged}"
+        )
+
+
+def diff_modules(old: ModuleItem, new: ModuleItem) -> ModuleDiff:
+    diff = ModuleDiff(old.key, "changed", old, new)
+    if not old.same_content(new):
+        diff.old_lines = old.content.split("\n")
+        diff.new_lines = new.content.split("\n")
+        diff.opcodes = line_opcodes(diff.old_lines, diff.new_lines)
+    return diff
+
+
+def diff_presets(old: ModuleCollection, new: ModuleCollection) -> PresetDiff:
+    """按键对齐两份预设，只对内容摘要不同的模块逐行比较。
+
+    结果按新预设的顺序排列，删除的模块放在最后。已启用与否、标题变化也计入
+    changed；键集合相同但相对顺序改变的模块标记为 moved。
+    """
+    old_keys = old.keys()
+    new_keys = new.keys()
+    common_new = [key for key in new_keys if key in old]
+    common_old = [key for key in old_keys if key in new]
+    # 公共键在两边的相对顺序做一次键级差分，不在相同块内的键视为移动；
+    # 重排过多（超过 MAX_EDITS）时中间段整体视为移动
+    in_place = set()
+    for tag, i1, i2, _, _ in line_opcodes(common_old, common_new):
+        if tag == "equal":
+            in_place.update(common_old[i1:i2])
+
+    modules: List[ModuleDiff] = []
+    unchanged = 0
+    for key in new_keys:
+        after = new.get(key)
+        before = old.get(key)
+        if before is None:
+            modules.append(ModuleDiff(key, "added", new=after))
+            continue
+        moved = key not in in_place
+        if before == after:
+            if moved:
+                modules.append(ModuleDiff(key, "moved", before, after, moved=True))
+            else:
+                unchanged += 1
+            continue
+        diff = diff_modules(before, after)
+        diff.moved = moved
+        modules.append(diff)
+    for key in old_keys:
+        if key not in new:
+            modules.append(ModuleDiff(key, "removed", old=old.get(key)))
+    return PresetDiff(modules, unchanged)
+
+
+def load_modules(path: Union[str, Path]) -> ModuleCollection:
+    """读取比较的一方：预设文件（JSON 或 .pbpack），或自动保存的会话目录（含快照与日志）。"""
+    path = Path(path)
+    if path.name == SNAPSHOT_FILE:
+        path = path.parent
+    if path.is_dir():
+        modules = Journal(path).restore()
+        if modules is None:
+            raise ValueError(f"{path} 中没有自动保存的会话")
+        return modules
+    return load_preset(str(path))
+
+
+def unified_lines(preset_diff: PresetDiff, context: int = 3) -> Iterator[str]:
+    """逐行产出便于阅读的文本差异：每个模块一行说明，内容改动按 unified diff 的格式列出。"""
+    markers = {"added": "+", "removed": "-", "changed": "~", "moved": "↕"}
+    for diff in preset_diff.modules:
+        yield f"{markers[diff.status]} {diff.describe()}"
+        for group in group_opcodes(diff.opcodes, context):
+            first, last = group[0], group[-1]
+            yield f"  @@ -{first[1] + 1},{last[2] - first[1]} +{first[3] + 1},{last[4] - first[3]} @@"
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    for line in diff.old_lines[i1:i2]:
+                        yield f"    {line}"
+                    continue
+                for line in diff.old_lines[i1:i2]:
+                    yield f"  - {line}"
+                for line in diff.new_lines[j1:j2]:
+                    yield f"  + {line}"
@@ -0,0 +1,140 @@
+from itertools import zip_longest
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor, QFont, QTextBlockFormat, QTextCharFormat, QTextCursor
+from PySide6.QtWidgets import (
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QListWidget,
+    QPlainTextEdit,
+    QSplitter,
+    QVBoxLayout,
+    QWidget,
+)
+
+from .diff import ModuleDiff, PresetDiff, group_opcodes
+
+# (左侧文本, 右侧文本, 类型)；类型为 header / equal / delete / insert / replace / gap
+Row = Tuple[str, str, str]
+
+LEFT_COLORS = {"header": "#2F81F7", "delete": "#F85149", "replace": "#F85149", "insert": "#6E7681"}
+RIGHT_COLORS = {"header": "#2F81F7", "insert": "#3FB950", "replace": "#3FB950", "delete": "#6E7681"}
+
+
+def side_by_side_rows(diff: ModuleDiff, context: int = 3) -> List[Row]:
+    """把一个模块的差异排成左右对齐的行，替换块中较短的一侧补空行。"""
+    rows: List[Row] = [(
+        diff.describe() if diff.old is not None else "",
+        diff.describe() if diff.new is not None else "",
+        "header",
+    )]
+    if diff.status == "added":
+        rows.extend(("", line, "insert") for line in diff.new.content.split("\n"))
+    elif diff.status == "removed":
+        rows.extend((line, "", "delete") for line in diff.old.content.split("\n"))
+    for index, group in enumerate(group_opcodes(diff.opcodes, context)):
+        if index:
+            rows.append(("⋯", "⋯", "gap"))
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                rows.extend((line, line, "equal") for line in diff.old_lines[i1:i2])
+                continue
+            pairs = zip_longest(diff.old_lines[i1:i2], diff.new_lines[j1:j2], fillvalue="")
+            rows.extend((left, right, tag) for left, right in pairs)
+    rows.append(("", "", "equal"))
+    return rows
+
+
+class DiffPanel(QDialog):
+    """左右对照显示两份预设的模块差异；两侧同步滚动，左侧列表跳转到对应模块。"""
+
+    def __init__(self, result: PresetDiff, old_name: str, new_name: str, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.result = result
+        self.setWindowTitle(f"比较：{old_name} → {new_name}")
+        self.resize(1100, 640)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel(result.summary())
+        layout.addWidget(self.summary_label)
+
+        splitter = QSplitter(Qt.Horizontal)
+        self.module_list = QListWidget()
+        splitter.addWidget(self.module_list)
+        panes = QWidget()
+        pane_layout = QHBoxLayout(panes)
+        pane_layout.setContentsMargins(0, 0, 0, 0)
+        self.left = self._make_pane(old_name, pane_layout)
+        self.right = self._make_pane(new_name, pane_layout)
+        splitter.addWidget(panes)
+        splitter.setSizes([240, 860])
+        layout.addWidget(splitter, 1)
+
+        self._rows_of: Dict[int, int] = {}
+        self._render()
+        self.left.verticalScrollBar().valueChanged.connect(self.right.verticalScrollBar().setValue)
+        self.right.verticalScrollBar().valueChanged.connect(self.left.verticalScrollBar().setValue)
+        self.left.horizontalScrollBar().valueChanged.connect(self.right.horizontalScrollBar().setValue)
+        self.right.horizontalScrollBar().valueChanged.connect(self.left.horizontalScrollBar().setValue)
+        self.module_list.currentRowChanged.connect(self.jump_to)
+
+    def _make_pane(self, title: str, layout: QHBoxLayout) -> QPlainTextEdit:
+        column = QVBoxLayout()
+        column.addWidget(QLabel(title))
+        editor = QPlainTextEdit()
+        editor.setReadOnly(True)
+        # 不换行，保证两侧行号一一对应
+        editor.setLineWrapMode(QPlainTextEdit.NoWrap)
+        editor.setFont(QFont("Consolas", 10))
+        column.addWidget(editor)
+        layout.addLayout(column)
+        return editor
+
+    def _render(self) -> None:
+        rows: List[Row] = []
+        for index, diff in enumerate(self.result.modules):
+            self._rows_of[index] = len(rows)
+            self.module_list.addItem(diff.describe())
+            rows.extend(side_by_side_rows(diff))
+        self.left.setPlainText("\n".join(left for left, _, _ in rows))
+        self.right.setPlainText("\n".join(right for _, right, _ in rows))
+        self._highlight(self.left, rows, LEFT_COLORS)
+        self._highlight(self.right, rows, RIGHT_COLORS)
+
+    @staticmethod
+    def _highlight(editor: QPlainTextEdit, rows: List[Row], colors: Dict[str, str]) -> None:
+        # 相邻同类行合并成一段，按段设置块背景，格式调用次数只与改动块数相当
+        document = editor.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        start = 0
+        for index in range(1, len(rows) + 1):
+            kind = rows[start][2]
+            if index < len(rows) and rows[index][2] == kind:
+                continue
+            if kind in colors:
+                last = document.findBlockByNumber(index - 1)
+                cursor.setPosition(document.findBlockByNumber(start).position())
+                cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+                color = QColor(colors[kind])
+                if kind == "header":
+                    fmt = QTextCharFormat()
+                    fmt.setForeground(color)
+                    fmt.setFontWeight(QFont.Bold)
+                    cursor.mergeCharFormat(fmt)
+                else:
+                    color.setAlpha(50)
+                    block_format = QTextBlockFormat()
+                    block_format.setBackground(color)
+                    cursor.mergeBlockFormat(block_format)
+            start = index
+        cursor.endEditBlock()
+
+    def jump_to(self, index: int) -> None:
+        if index not in self._rows_of:
+            return
+        block = self.left.document().findBlockByNumber(self._rows_of[index])
+        cursor = QTextCursor(block)
+        self.left.setTextCursor(cursor)
+        self.left.verticalScrollBar().setValue(self._rows_of[index])
@@ -0,0 +1,173 @@
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Set, Union
+
+from .core import ModuleCollection, ModuleItem, modules_to_payload, render_section
+from .includes import resolve_includes
+
+# 进度回调：(已完成, 总数)
+Progress = Callable[[int, int], None]
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def _fsync_directory(directory: Path) -> None:
+    # 让替换后的目录项也落盘；Windows 不支持打开目录，跳过
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path: Union[str, Path]) -> Iterator[BinaryIO]:
+    """写到同目录的临时文件，fsync 后原子替换目标文件。
+
+    写入过程中出错或进程崩溃时目标文件保持原样，不会留下写了一半的文件。
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    _fsync_directory(path.parent)
+
+
+def export_prompt(
+    path: Union[str, Path], modules: Iterable[ModuleItem], progress: Optional[Progress] = None
+) -> int:
+    """逐段写出展开 include 后的 Prompt 全文（与 compose_prompt 相同），返回写出的字符数。"""
+    modules = list(modules)
+    total = len(modules)
+    written = 0
+    with atomic_open(path) as f:
+        for index, module in enumerate(resolve_includes(modules), 1):
+            if module.enabled:
+                section = ("\n" if written else "") + render_section(module)
+                f.write(section.encode("utf-8"))
+                written += len(section)
+            if progress is not None:
+                progress(index, total)
+    return written
+
+
+def export_text(path: Union[str, Path], text: str) -> None:
+    with atomic_open(path) as f:
+        f.write(text.encode("utf-8"))
+
+
+def unique_member(name: str, used: Set[str]) -> str:
+    """归档内的成员名：替换不安全字符，重名时在扩展名前加序号。"""
+    stem, suffix = os.path.splitext(_UNSAFE_NAME.sub("_", name))
+    candidate = stem + suffix
+    serial = 1
+    while candidate in used:
+        serial += 1
+        candidate = f"{stem}-{serial}{suffix}"
+    used.add(candidate)
+    return candidate
+
+
+class ArchiveWriter:
+    """向已打开的文件依次写入 zip 或 tar 成员，由 open_archive 创建。"""
+
+    def __init__(self, f: BinaryIO, name: str) -> None:
+        # 预设包保存也用到本模块，归档相关的库只在真正写归档时导入
+        import tarfile
+        import zipfile
+
+        name = name.lower()
+        if not name.endswith(ARCHIVE_SUFFIXES):
+            raise ValueError(f"不支持的归档格式：{name}（可用 {' / '.join(ARCHIVE_SUFFIXES)}）")
+        self.kind = "zip" if name.endswith(".zip") else "tar"
+        self.count = 0
+        self._names: Set[str] = set()
+        if self.kind == "zip":
+            self._archive: Union["zipfile.ZipFile", "tarfile.TarFile"] = zipfile.ZipFile(
+                f, "w", compression=zipfile.ZIP_DEFLATED
+            )
+        else:
+            self._archive = tarfile.open(fileobj=f, mode="w:gz" if name.endswith((".tar.gz", ".tgz")) else "w")
+
+    def add_text(self, name: str, text: str) -> str:
+        """写入一个 UTF-8 文本成员，返回实际使用的成员名。"""
+        name = unique_member(name, self._names)
+        data = text.encode("utf-8")
+        if self.kind == "zip":
+            with self._archive.open(name, "w") as member:
+                member.write(data)
+        else:
+            import tarfile
+
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+        self.count += 1
+        return name
+
+    def close(self) -> None:
+        self._archive.close()
+
+
+@contextmanager
+def open_archive(path: Union[str, Path]) -> Iterator[ArchiveWriter]:
+    """按扩展名创建 zip / tar / tar.gz 归档，成员逐个写出、不在内存中拼出整个归档。
+
+    归档经 atomic_open 写入；with 块内出错时放弃整个归档，目标路径保持原样。
+    """
+    path = Path(path)
+    with atomic_open(path) as f:
+        writer = ArchiveWriter(f, path.name)
+        try:
+            yield writer
+        except BaseException:
+            # 临时文件随后会被删除，这里只让归档对象正常收尾
+            with suppress(Exception):
+                writer.close()
+            raise
+        writer.close()
+
+
+def preset_text(modules: Iterable[ModuleItem]) -> str:
+    return json.dumps(modules_to_payload(modules), ensure_ascii=False, indent=2)
+
+
+def snapshot_modules(modules: ModuleCollection) -> ModuleCollection:
+    """交给后台线程导出的副本：与原模块共用正文，界面上的后续修改不影响导出内容。"""
+    snapshot = ModuleCollection(m.copy() for m in modules)
+    snapshot.profiles = {name: list(keys) for name, keys in modules.profiles.items()}
+    return snapshot
+
+
+def export_archive(
+    path: Union[str, Path], members: Iterable[Dict[str, str]], total: int, progress: Optional[Progress] = None
+) -> int:
+    """把 members（每项含 name 与 text）写成一个归档，返回成员数。members 可以是生成器，逐项生成逐项写出。"""
+    with open_archive(path) as archive:
+        for index, member in enumerate(members, 1):
+            archive.add_text(member["name"], member["text"])
+            if progress is not None:
+                progress(index, total)
+    return archive.count
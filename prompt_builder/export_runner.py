@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, Signal
+
+from .export import Progress
+
+# 后台导出任务：接收进度回调，在工作线程中完成全部写入
+ExportJob = Callable[[Progress], object]
+
+
+class ExportSignals(QObject):
+    # 参数中的 int 为任务编号
+    progress = Signal(int, int, int)
+    # 出错时为错误信息，成功时为空字符串
+    finished = Signal(int, str)
+
+
+class ExportTask(QRunnable):
+    # 进度按百分比节流，十万个模块也只发出百余次信号
+    STEPS = 100
+
+    def __init__(self, job_id: int, job: ExportJob) -> None:
+        super().__init__()
+        self.job_id = job_id
+        self.job = job
+        self.signals = ExportSignals()
+        self._step = -1
+
+    def _progress(self, done: int, total: int) -> None:
+        step = done * self.STEPS // total if total > 0 else 0
+        if step != self._step or done == total:
+            self._step = step
+            self.signals.progress.emit(self.job_id, done, total)
+
+    def run(self) -> None:
+        try:
+            self.job(self._progress)
+        except Exception as exc:
+            self.signals.finished.emit(self.job_id, str(exc) or type(exc).__name__)
+        else:
+            self.signals.finished.emit(self.job_id, "")
+
+
+class ExportRunner(QObject):
+    """在后台线程依次执行导出，界面只接收进度与结果。
+
+    只有一个工作线程，多个导出按提交顺序排队；同一路径的两次导出不会交错写入。
+    """
+
+    progress = Signal(str, int, int)
+    finished = Signal(str, str)
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._serial = 0
+        self._jobs: Dict[int, str] = {}
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+
+    def is_running(self) -> bool:
+        return bool(self._jobs)
+
+    def start(self, description: str, job: ExportJob, on_success: Optional[Callable[[], None]] = None) -> None:
+        """description 用于状态栏提示；on_success 在导出成功后于界面线程调用。"""
+        self._serial += 1
+        self._jobs[self._serial] = description
+        if on_success is not None:
+            self._callbacks[self._serial] = on_success
+        task = ExportTask(self._serial, job)
+        task.signals.progress.connect(self._on_progress, Qt.QueuedConnection)
+        task.signals.finished.connect(self._on_finished, Qt.QueuedConnection)
+        self.pool.start(task)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+    def _on_progress(self, job_id: int, done: int, total: int) -> None:
+        if job_id in self._jobs:
+            self.progress.emit(self._jobs[job_id], done, total)
+
+    def _on_finished(self, job_id: int, error: str) -> None:
+        description = self._jobs.pop(job_id, "")
+        callback = self._callbacks.pop(job_id, None)
+        if not error and callback is not None:
+            callback()
+        self.finished.emit(description, error)
@@ -0,0 +1,1946 @@
+import re
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QEvent,
+    QModelIndex,
+    QPoint,
+    QSettings,
+    QSortFilterProxyModel,
+    QStandardPaths,
+    Qt,
+    QTimer,
+    Signal,
+)
+from PySide6.QtGui import QAction, QFont, QKeySequence, QTextBlock, QTextCursor, QTextDocument
+from PySide6.QtWidgets import (
+    QApplication,
+    QCheckBox,
+    QComboBox,
+    QFileDialog,
+    QFormLayout,
+    QFrame,
+    QHBoxLayout,
+    QInputDialog,
+    QLabel,
+    QLineEdit,
+    QListView,
+    QMainWindow,
+    QMessageBox,
+    QPushButton,
+    QPlainTextDocumentLayout,
+    QPlainTextEdit,
+    QProgressBar,
+    QSplitter,
+    QStackedWidget,
+    QStatusBar,
+    QTabBar,
+    QTabWidget,
+    QToolBar,
+    QVBoxLayout,
+    QWidget,
+)
+
+from .core import (
+    DEFAULT_MODULES,
+    ModuleCollection,
+    ModuleItem,
+    compose_prompt,
+    load_preset,
+    parse_sections,
+    render_section,
+    save_preset,
+    utf16_length,
+)
+from .highlight import MarkerHighlighter
+from .history import (
+    Change,
+    CollectionReplace,
+    ContentDelta,
+    EnabledChange,
+    History,
+    ModuleInsert,
+    ModuleRemove,
+    TitleChange,
+    content_delta,
+    replace_changes,
+)
+from .packfile import PACK_SUFFIX, PresetPack, copy_module, module_packs
+from .profiles import ComposeCache, composition_key
+from .includes import IncludeResolver
+from .issues import IssuesPanel, ValidationRunner
+from .metrics import METRICS, timed
+from .sections import SectionIndex, common_prefix_length, common_suffix_length
+from .startup import StartupProfile
+from .templates import MarkerIndex, Span, scan_line
+from .tokens import TokenCounter, Tokenizer, load_tokenizer
+from .validation import RULES, ValidationSnapshot
+from .workspace import PresetDocument, Workspace
+
+# 诊断、比较、导出、自动保存与预设库的模块在第一次用到时才导入，不拖慢首次绘制
+if TYPE_CHECKING:
+    from .diagnostics_panel import DiagnosticsPanel
+    from .export_runner import ExportRunner
+    from .journal import Journal, JournalSet
+    from .library_panel import LibrarySearchPanel
+
+LEADING_SPACE = re.compile(r"\s*")
+
+# 已启用模块的总长度超过此值时进入大文本模式：预览只渲染视口附近约
+# PREVIEW_WINDOW_CHARS 个字符的段落，滚动到窗口边缘时换页
+LARGE_PROMPT_CHARS = 1_000_000
+PREVIEW_WINDOW_CHARS = 120_000
+PAGE_MARGIN_LINES = 3
+
+
+def modern_stylesheet(dark: bool = True) -> str:
+    if dark:
+        return """
+        QMainWindow { background: #161B22; }
+        QWidget { color: #E6EDF3; font-size: 13px; }
+        QTabWidget::pane { border: 1px solid #30363D; border-radius: 10px; background: #0D1117; }
+        QTabBar::tab { background: #21262D; border: 1px solid #30363D; padding: 10px 16px; border-top-left-radius: 8px; border-top-right-radius: 8px; margin-right: 5px; }
+        QTabBar::tab:selected { background: #2F81F7; color: white; border-color: #2F81F7; }
+        QPlainTextEdit, QListView, QLineEdit { background: #0D1117; border: 1px solid #30363D; border-radius: 8px; padding: 8px; selection-background-color: #2F81F7; }
+        QPushButton { background: #238636; border: none; border-radius: 8px; padding: 8px 14px; color: white; }
+        QPushButton:hover { background: #2EA043; }
+        QPushButton:pressed { background: #1A7F37; }
+        QStatusBar { background: #0D1117; border-top: 1px solid #30363D; }
+        QToolBar { background: #0D1117; border-bottom: 1px solid #30363D; spacing: 8px; }
+        QFrame#Card { background: #0D1117; border: 1px solid #30363D; border-radius: 10px; }
+        """
+    return """
+    QMainWindow { background: #F6F8FA; }
+    QWidget { color: #24292F; font-size: 13px; }
+    QTabWidget::pane { border: 1px solid #D0D7DE; border-radius: 10px; background: white; }
+    QTabBar::tab { background: #EAEEF2; border: 1px solid #D0D7DE; padding: 10px 16px; border-top-left-radius: 8px; border-top-right-radius: 8px; margin-right: 5px; }
+    QTabBar::tab:selected { background: #0969DA; color: white; border-color: #0969DA; }
+    QPlainTextEdit, QListView, QLineEdit { background: white; border: 1px solid #D0D7DE; border-radius: 8px; padding: 8px; selection-background-color: #0969DA; }
+    QPushButton { background: #1A7F37; border: none; border-radius: 8px; padding: 8px 14px; color: white; }
+    QPushButton:hover { background: #2DA44E; }
+    QStatusBar { background: white; border-top: 1px solid #D0D7DE; }
+    QToolBar { background: white; border-bottom: 1px solid #D0D7DE; spacing: 8px; }
+    QFrame#Card { background: white; border: 1px solid #D0D7DE; border-radius: 10px; }
+    """
+
+
+class ModuleListModel(QAbstractListModel):
+    KeyRole = Qt.UserRole
+    FilterRole = Qt.UserRole + 1
+
+    enabledChanged = Signal(str)
+
+    def __init__(self, modules: ModuleCollection, tokens: Optional[TokenCounter] = None, parent=None) -> None:
+        super().__init__(parent)
+        self._modules = modules
+        self._tokens = tokens
+
+    def set_tokens(self, tokens: Optional[TokenCounter]) -> None:
+        self._tokens = tokens
+
+    def set_modules(self, modules: ModuleCollection) -> None:
+        if modules.keys() == self._modules.keys():
+            # 键与顺序未变：原地通知，视图保留勾选与当前项
+            self._modules = modules
+            if modules:
+                self.dataChanged.emit(self.index(0), self.index(len(modules) - 1))
+            return
+        self.beginResetModel()
+        self._modules = modules
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._modules)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        module = self._modules[index.row()]
+        if role == Qt.DisplayRole:
+            count = self._tokens.count(module.key) if self._tokens is not None else None
+            if count is None:
+                return f"[{module.key}] {module.title}"
+            return f"[{module.key}] {module.title}  · {count} tokens"
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if module.enabled else Qt.Unchecked
+        if role == self.KeyRole:
+            return module.key
+        if role == self.FilterRole:
+            return f"{module.key}\n{module.title}"
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        module = self._modules[index.row()]
+        if not self._modules.set_enabled(module.key, Qt.CheckState(value) == Qt.Checked):
+            return False
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.enabledChanged.emit(module.key)
+        return True
+
+    def row_of(self, key: str) -> int:
+        return self._modules.row_of(key)
+
+    def module_changed(self, key: str) -> None:
+        row = self.row_of(key)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.CheckStateRole, self.FilterRole])
+
+    def tokens_changed(self, keys: Sequence[str]) -> None:
+        self._rows_changed(keys, [Qt.DisplayRole])
+
+    def checks_changed(self, keys: Sequence[str]) -> None:
+        self._rows_changed(keys, [Qt.CheckStateRole])
+
+    def _rows_changed(self, keys: Sequence[str], roles: List[int]) -> None:
+        if len(keys) > 64:
+            # 大批量更新时整体通知一次，避免逐行发信号
+            if self._modules:
+                self.dataChanged.emit(self.index(0), self.index(len(self._modules) - 1), roles)
+            return
+        for key in keys:
+            row = self.row_of(key)
+            if row >= 0:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, roles)
+
+    def insert_module(self, row: int, module: ModuleItem) -> None:
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._modules.insert(row, module)
+        self.endInsertRows()
+
+    def remove_module(self, key: str) -> None:
+        row = self._modules.row_of(key)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._modules.remove(key)
+        self.endRemoveRows()
+
+
+class OutlineModel(QAbstractListModel):
+    """大文本模式下预览旁的段落大纲，列出全部已启用模块。"""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._modules = ModuleCollection()
+        self._keys: List[str] = []
+
+    def set_order(self, modules: ModuleCollection, keys: List[str]) -> None:
+        self.beginResetModel()
+        self._modules = modules
+        self._keys = keys
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._keys)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self._keys[index.row()]
+        if role == Qt.DisplayRole:
+            module = self._modules.get(key)
+            return f"[{key}] {module.title}" if module is not None else f"[{key}]"
+        if role == ModuleListModel.KeyRole:
+            return key
+        return None
+
+
+# 随文档切换换入换出的窗口属性，见 DocumentView
+VIEW_STATE = (
+    "markers",
+    "includes",
+    "tokens",
+    "_token_dirty",
+    "_section_cache",
+    "_sections",
+    "large_mode",
+    "_order",
+    "_order_index",
+    "_outside_chars",
+    "_window",
+)
+
+
+class DocumentView:
+    """文档激活期间的派生状态：标记与段落索引、token 统计和预览文档。
+
+    属性名与窗口上的同名属性一一对应（VIEW_STATE），切换文档时整体换入换出；
+    闲置的文档释放整个 DocumentView，再次激活时由模块重建。
+    """
+
+    def __init__(self, modules: ModuleCollection, tokenizer: Optional[Tokenizer]) -> None:
+        self.markers = MarkerIndex()
+        self.markers.rebuild(modules)
+        self.includes = IncludeResolver(modules)
+        self.tokens = TokenCounter(tokenizer)
+        # 预设包中尚未读取的模块不在此时统计，编辑或改名后才计入
+        self._token_dirty: Dict[str, None] = dict.fromkeys(m.key for m in modules if m.loaded)
+        self._section_cache: Dict[str, str] = {}
+        self._sections = SectionIndex()
+        self.large_mode = False
+        self._order: Optional[List[str]] = None
+        self._order_index: Dict[str, int] = {}
+        self._outside_chars = 0
+        self._window: Optional[Tuple[str, str]] = None
+        self.preview: Optional[QTextDocument] = None
+        self.highlighter: Optional[MarkerHighlighter] = None
+
+
+class PromptBuilderWindow(QMainWindow):
+    def __init__(self, profile: Optional[StartupProfile] = None, journals: Optional["JournalSet"] = None) -> None:
+        super().__init__()
+        self.setWindowTitle("Prompt 模板生成器 Pro")
+        self.resize(1280, 820)
+        self.profile = profile
+        self.journals = journals
+        self.workspace = Workspace()
+        # 组合结果按内容摘要缓存，各文档共用
+        self.compose_cache = ComposeCache()
+        self.tokenizer: Optional[Tokenizer] = None
+        self.history_limit = QSettings().value("history/limit_mb", 32, type=int) << 20
+        self.syncing = False
+        self.dark_theme = True
+        self._replaying = False
+        self._keystroke_start: Optional[float] = None
+        self._editor_key: Optional[str] = None
+        self._editor_lines = 1
+        self.preview_editor: Optional[QPlainTextEdit] = None
+        self._manual_validation = False
+        self._journal_errors: Dict["Journal", str] = {}
+
+        restored: List[Tuple["Journal", ModuleCollection]] = []
+        restore_errors: List[str] = []
+        if journals is not None:
+            with self._phase("恢复上次会话"):
+                restored, restore_errors = journals.restore()
+        for journal, modules in restored:
+            name = journal.meta.get("name") or self.workspace.untitled_name()
+            self.workspace.add(PresetDocument(modules, name, self.new_history(), journal.meta.get("path"), journal))
+        if not len(self.workspace):
+            self.workspace.add(self.new_document(ModuleCollection(m.copy() for m in DEFAULT_MODULES)))
+        self.load_document(self.workspace.documents[0])
+
+        with self._phase("构建模块页"):
+            self._build_ui()
+            self._connect_signals()
+        with self._phase("应用主题"):
+            self.apply_theme()
+        with self._phase("加载首个模块"):
+            self.select_first_module()
+        self.update_document_tab(self.workspace.active)
+        self.mark_tokens_dirty()
+        for document in self.workspace:
+            if document.journal is not None:
+                document.journal.start(document.modules)
+        if restore_errors:
+            QMessageBox.warning(self, "恢复失败", f"部分会话无法恢复：{'；'.join(restore_errors)}")
+        elif restored:
+            count = sum(len(m) for _, m in restored)
+            self.statusBar().showMessage(f"已恢复上次会话（{len(restored)} 个预设，{count} 个模块）", 2500)
+
+    def _phase(self, name: str):
+        return self.profile.phase(name) if self.profile is not None else nullcontext()
+
+    def _build_ui(self) -> None:
+        toolbar = QToolBar("Main Toolbar")
+        toolbar.setMovable(False)
+        self.addToolBar(toolbar)
+
+        self.new_action = QAction("新建预设", self)
+        self.import_action = QAction("导入预设", self)
+        self.export_preset_action = QAction("导出预设", self)
+        self.batch_export_action = QAction("批量导出", self)
+        self.compare_action = QAction("比较预设", self)
+        self.theme_action = QAction("切换主题", self)
+        self.theme_action.setCheckable(True)
+        self.theme_action.setChecked(True)
+        self.vocab_action = QAction("载入词表", self)
+        self.undo_action = QAction("撤销", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.setEnabled(False)
+        self.redo_action = QAction("重做", self)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.redo_action.setEnabled(False)
+        self.library_action = QAction("预设库目录", self)
+        # 诊断面板不放在工具栏上，只能用快捷键打开
+        self.diagnostics_action = QAction("诊断", self)
+        self.diagnostics_action.setShortcut(QKeySequence("Ctrl+Shift+D"))
+        self.addAction(self.diagnostics_action)
+        self.diagnostics_panel: Optional["DiagnosticsPanel"] = None
+
+        toolbar.addAction(self.new_action)
+        toolbar.addAction(self.import_action)
+        toolbar.addAction(self.export_preset_action)
+        toolbar.addAction(self.batch_export_action)
+        toolbar.addAction(self.compare_action)
+        toolbar.addSeparator()
+        toolbar.addAction(self.undo_action)
+        toolbar.addAction(self.redo_action)
+        toolbar.addSeparator()
+        toolbar.addAction(self.theme_action)
+        toolbar.addAction(self.vocab_action)
+        toolbar.addAction(self.library_action)
+
+        central = QWidget()
+        central_layout = QVBoxLayout(central)
+        central_layout.setContentsMargins(0, 0, 0, 0)
+        central_layout.setSpacing(0)
+        # 打开的每份预设占一个标签，只有一份时不显示
+        self.document_tabs = QTabBar()
+        self.document_tabs.setDocumentMode(True)
+        self.document_tabs.setTabsClosable(True)
+        self.document_tabs.setExpanding(False)
+        self.document_tabs.setAutoHide(True)
+        for document in self.workspace:
+            self.add_document_tab(document)
+        central_layout.addWidget(self.document_tabs)
+        self.tabs = tabs = QTabWidget()
+        tabs.setDocumentMode(True)
+        central_layout.addWidget(tabs)
+        self.setCentralWidget(central)
+
+        tab1 = QWidget()
+        tab1_layout = QVBoxLayout(tab1)
+        splitter = QSplitter(Qt.Horizontal)
+        tab1_layout.addWidget(splitter)
+
+        left_card = QFrame()
+        left_card.setObjectName("Card")
+        left_layout = QVBoxLayout(left_card)
+        left_layout.addWidget(QLabel("模块中心"))
+        filter_row = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("筛选模块（按名称）...")
+        self.search_mode_check = QCheckBox("全文搜索")
+        self.search_mode_check.setToolTip("在预设库目录的全部预设中检索模块内容")
+        filter_row.addWidget(self.filter_input)
+        filter_row.addWidget(self.search_mode_check)
+        left_layout.addLayout(filter_row)
+
+        profile_row = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        self.profile_combo.setToolTip("启用方案：一次切换一组模块的勾选状态")
+        self.save_profile_btn = QPushButton("保存方案")
+        self.delete_profile_btn = QPushButton("删除方案")
+        profile_row.addWidget(self.profile_combo, 1)
+        profile_row.addWidget(self.save_profile_btn)
+        profile_row.addWidget(self.delete_profile_btn)
+        left_layout.addLayout(profile_row)
+
+        self.module_model = ModuleListModel(self.modules, self.tokens, self)
+        self.module_proxy = QSortFilterProxyModel(self)
+        self.module_proxy.setSourceModel(self.module_model)
+        self.module_proxy.setFilterRole(ModuleListModel.FilterRole)
+        self.module_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.module_list = QListView()
+        self.module_list.setUniformItemSizes(True)
+        self.module_list.setModel(self.module_proxy)
+        # 预设库面板在第一次切换到全文搜索时才创建，见 ensure_library_panel
+        self.library_panel: Optional["LibrarySearchPanel"] = None
+        self.module_stack = QStackedWidget()
+        self.module_stack.addWidget(self.module_list)
+        left_layout.addWidget(self.module_stack)
+
+        left_buttons = QHBoxLayout()
+        self.add_btn = QPushButton("新增")
+        self.delete_btn = QPushButton("删除")
+        left_buttons.addWidget(self.add_btn)
+        left_buttons.addWidget(self.delete_btn)
+        left_layout.addLayout(left_buttons)
+
+        right_card = QFrame()
+        right_card.setObjectName("Card")
+        right_layout = QVBoxLayout(right_card)
+
+        self.current_module_label = QLabel("当前模块")
+        label_font = QFont()
+        label_font.setPointSize(14)
+        label_font.setBold(True)
+        self.current_module_label.setFont(label_font)
+        right_layout.addWidget(self.current_module_label)
+
+        rename_row = QHBoxLayout()
+        self.rename_input = QLineEdit()
+        self.rename_input.setPlaceholderText("修改模块标题...")
+        self.apply_rename_btn = QPushButton("保存标题")
+        rename_row.addWidget(self.rename_input)
+        rename_row.addWidget(self.apply_rename_btn)
+        right_layout.addLayout(rename_row)
+
+        self.module_editor = QPlainTextEdit()
+        self.module_editor.setPlaceholderText("编辑模块内容...")
+        # 撤销由应用级历史负责，文档自身不保留撤销记录
+        self.module_editor.setUndoRedoEnabled(False)
+        self.module_editor.installEventFilter(self)
+        right_layout.addWidget(self.module_editor)
+
+        row = QHBoxLayout()
+        self.reset_current_btn = QPushButton("重置当前模块")
+        self.sync_preview_btn = QPushButton("同步到预览")
+        row.addWidget(self.reset_current_btn)
+        row.addStretch(1)
+        row.addWidget(self.sync_preview_btn)
+        right_layout.addLayout(row)
+
+        splitter.addWidget(left_card)
+        splitter.addWidget(right_card)
+        splitter.setSizes([360, 880])
+        tabs.addTab(tab1, "模块查看与编辑")
+
+        # 预览页首次切换到时才构建，见 ensure_preview_tab
+        self.preview_tab = QWidget()
+        tabs.addTab(self.preview_tab, "检查、预览与导出")
+
+        self.setStatusBar(QStatusBar())
+        self.token_label = QLabel()
+        self.statusBar().addPermanentWidget(self.token_label)
+        # 导出在后台进行，进度条只在有导出任务时显示；导出线程第一次导出时才创建
+        self.exporter: Optional["ExportRunner"] = None
+        self.export_progress = QProgressBar()
+        self.export_progress.setMaximumWidth(180)
+        self.export_progress.setFormat("导出 %p%")
+        self.export_progress.hide()
+        self.statusBar().addPermanentWidget(self.export_progress)
+        self.token_timer = QTimer(self)
+        self.token_timer.setSingleShot(True)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(30_000)
+        self.idle_timer.start()
+        # 自动保存日志在后台线程写入，失败时只记下原因，这里定期检查
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setInterval(2000)
+        self.journal_timer.start()
+
+    def _build_preview_tab(self) -> None:
+        tab2_layout = QVBoxLayout(self.preview_tab)
+
+        check_card = QFrame()
+        check_card.setObjectName("Card")
+        check_layout = QFormLayout(check_card)
+        self.rule_checks: Dict[str, QCheckBox] = {}
+        for index, rule in enumerate(RULES.values()):
+            check = QCheckBox(rule.label)
+            check.setChecked(rule.default)
+            self.rule_checks[rule.name] = check
+            check_layout.addRow("检查规则" if index == 0 else "", check)
+        tab2_layout.addWidget(check_card)
+
+        self.preview_editor = QPlainTextEdit()
+        self.preview_editor.setPlaceholderText("预览 / 即时修改最终 Prompt（可回写）")
+        self.preview_editor.setUndoRedoEnabled(False)
+        self.preview_editor.installEventFilter(self)
+        self.outline_model = OutlineModel(self)
+        self.outline = QListView()
+        self.outline.setUniformItemSizes(True)
+        self.outline.setModel(self.outline_model)
+        self.outline.hide()
+        preview_splitter = QSplitter(Qt.Horizontal)
+        preview_splitter.addWidget(self.outline)
+        preview_splitter.addWidget(self.preview_editor)
+        preview_splitter.setSizes([260, 1000])
+        tab2_layout.addWidget(preview_splitter)
+        self.page_timer = QTimer(self)
+        self.page_timer.setSingleShot(True)
+        self.page_timer.setInterval(0)
+
+        self.issues_panel = IssuesPanel()
+        tab2_layout.addWidget(self.issues_panel)
+
+        bottom = QHBoxLayout()
+        self.validate_btn = QPushButton("执行检查")
+        self.copy_btn = QPushButton("复制")
+        self.export_txt_btn = QPushButton("导出TXT")
+        self.word_count_label = QLabel("字符数: 0")
+        bottom.addWidget(self.validate_btn)
+        bottom.addWidget(self.copy_btn)
+        bottom.addWidget(self.export_txt_btn)
+        bottom.addStretch(1)
+        bottom.addWidget(self.word_count_label)
+        tab2_layout.addLayout(bottom)
+
+    def _connect_signals(self) -> None:
+        self.new_action.triggered.connect(self.new_preset)
+        self.document_tabs.currentChanged.connect(self.on_document_tab_changed)
+        self.document_tabs.tabCloseRequested.connect(self.close_document)
+        self.idle_timer.timeout.connect(self.release_idle_views)
+        self.journal_timer.timeout.connect(self.check_journal_errors)
+        self.import_action.triggered.connect(self.import_preset)
+        self.export_preset_action.triggered.connect(self.export_preset)
+        self.batch_export_action.triggered.connect(self.batch_export)
+        self.compare_action.triggered.connect(self.compare_presets)
+        self.theme_action.triggered.connect(self.toggle_theme)
+        self.vocab_action.triggered.connect(self.load_vocab)
+        self.undo_action.triggered.connect(self.undo)
+        self.redo_action.triggered.connect(self.redo)
+        self.diagnostics_action.triggered.connect(self.show_diagnostics)
+        self.token_timer.timeout.connect(self.flush_token_counts)
+
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.filter_input.textChanged.connect(self.on_filter_changed)
+        self.search_mode_check.toggled.connect(self.on_search_mode_toggled)
+        self.library_action.triggered.connect(self.choose_library_dir)
+        self.module_list.selectionModel().currentChanged.connect(self.load_current_module)
+        self.module_model.enabledChanged.connect(self.on_checked_changed)
+
+        # 索引须先于高亮器收到改动通知，高亮时才能直接读取最新的行索引
+        self.module_editor.document().contentsChange.connect(self.on_module_contents_change)
+        self.module_editor.textChanged.connect(self.on_module_text_changed)
+        self.module_highlighter = MarkerHighlighter(self.module_editor, self.module_line_spans)
+
+        self.apply_rename_btn.clicked.connect(self.rename_current_module)
+        self.add_btn.clicked.connect(self.add_module)
+        self.profile_combo.activated.connect(self.on_profile_activated)
+        self.save_profile_btn.clicked.connect(self.save_profile)
+        self.delete_profile_btn.clicked.connect(self.delete_profile)
+        self.delete_btn.clicked.connect(self.delete_current_module)
+        self.reset_current_btn.clicked.connect(self.reset_current_module)
+        self.sync_preview_btn.clicked.connect(self.refresh_preview_from_modules)
+
+    def _connect_preview_signals(self) -> None:
+        self.preview_editor.verticalScrollBar().valueChanged.connect(self.on_preview_scrolled)
+        self.page_timer.timeout.connect(self.page_preview)
+        self.outline.clicked.connect(self.on_outline_clicked)
+        self.validate_btn.clicked.connect(self.validate_preview)
+        for check in self.rule_checks.values():
+            check.toggled.connect(self.schedule_validation)
+        self.validator = ValidationRunner(self)
+        self.validator.started.connect(self.issues_panel.begin)
+        self.validator.issuesFound.connect(self.issues_panel.add_issues)
+        self.validator.finished.connect(self.on_validation_finished)
+        self.validation_timer = QTimer(self)
+        self.validation_timer.setSingleShot(True)
+        self.validation_timer.setInterval(500)
+        self.validation_timer.timeout.connect(self.run_validation)
+        self.issues_panel.moduleActivated.connect(self.show_module)
+        self.copy_btn.clicked.connect(self.copy_to_clipboard)
+        self.export_txt_btn.clicked.connect(self.export_prompt_txt)
+
+    def ensure_preview_tab(self) -> None:
+        if self.preview_editor is not None:
+            return
+        with self._phase("构建预览页"):
+            self._build_preview_tab()
+            self._connect_preview_signals()
+            self.attach_preview()
+        if self.profile is not None:
+            self.profile.report()
+
+    def on_tab_changed(self, index: int) -> None:
+        if self.tabs.widget(index) is self.preview_tab:
+            self.ensure_preview_tab()
+
+    def apply_theme(self) -> None:
+        self.setStyleSheet(modern_stylesheet(self.dark_theme))
+
+    def toggle_theme(self) -> None:
+        self.dark_theme = self.theme_action.isChecked()
+        self.apply_theme()
+
+    @timed("filter_module_list")
+    def on_filter_changed(self, text: str) -> None:
+        if self.search_mode_check.isChecked() and self.library_panel is not None:
+            self.library_panel.search(text)
+            return
+        self.module_proxy.setFilterFixedString(text.strip())
+        if not self.module_list.currentIndex().isValid():
+            self.select_first_module()
+
+    @timed()
+    def set_modules(self, modules: ModuleCollection) -> None:
+        selected_key = self.active_key()
+        self.record_history(*replace_changes(self.modules, modules))
+        self.modules = modules
+        self.invalidate_order()
+        self.markers.rebuild(modules)
+        self.includes = IncludeResolver(modules)
+        self.tokens.retain(modules.keys())
+        # 预设包中尚未读取的模块不在此时统计，编辑或改名后才计入
+        self.mark_tokens_dirty(*(m.key for m in modules if m.loaded))
+        self.module_model.set_modules(modules)
+        self.refresh_profile_combo()
+        if self.journal is not None:
+            self.journal.import_modules(modules)
+        if not self.module_list.currentIndex().isValid():
+            if not (selected_key and self.select_module(selected_key)):
+                self.select_first_module()
+
+    def select_module(self, key: str) -> bool:
+        row = self.module_model.row_of(key)
+        if row < 0:
+            return False
+        index = self.module_proxy.mapFromSource(self.module_model.index(row))
+        if not index.isValid():
+            return False
+        self.module_list.setCurrentIndex(index)
+        return True
+
+    def select_first_module(self) -> None:
+        if self.module_proxy.rowCount() > 0:
+            self.module_list.setCurrentIndex(self.module_proxy.index(0, 0))
+
+    def active_key(self) -> Optional[str]:
+        index = self.module_list.currentIndex()
+        return index.data(ModuleListModel.KeyRole) if index.isValid() else None
+
+    def get_module(self, key: str) -> Optional[ModuleItem]:
+        return self.modules.get(key)
+
+    def load_current_module(self) -> None:
+        key = self.active_key()
+        if not key:
+            return
+        module = self.get_module(key)
+        if not module:
+            return
+        self.syncing = True
+        self.current_module_label.setText(f"当前模块: [{module.key}] {module.title}")
+        self.rename_input.setText(module.title)
+        self._editor_key = module.key
+        self.module_editor.setPlainText(module.content)
+        self._editor_lines = self.module_editor.document().blockCount()
+        self.syncing = False
+
+    def on_module_contents_change(self, position: int, removed: int, added: int) -> None:
+        if self.syncing or self._editor_key is None:
+            return
+        document = self.module_editor.document()
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + added).blockNumber()
+        line_count = document.blockCount()
+        removed_lines = (last - first + 1) - (line_count - self._editor_lines)
+        self._editor_lines = line_count
+        texts = [document.findBlockByNumber(n).text() for n in range(first, last + 1)]
+        self.markers.splice(self._editor_key, first, removed_lines, texts)
+
+    def module_line_spans(self, block: QTextBlock, text: str) -> Sequence[Span]:
+        spans = self.markers.line_spans(self._editor_key, block.blockNumber(), text)
+        return spans if spans is not None else scan_line(text)
+
+    def preview_line_spans(self, block: QTextBlock, text: str) -> Sequence[Span]:
+        if len(self._sections):
+            row = self._sections.find(block.position())
+            module = self.get_module(self._sections.key_at(row))
+            if module is not None:
+                header = self.preview_editor.document().findBlock(self._sections.offset(row))
+                line = block.blockNumber() - header.blockNumber() - 1
+                if line >= 0:
+                    # 预览中的正文去掉了首尾空白，行号需补上被去掉的前导空行
+                    line += module.content.count("\n", 0, LEADING_SPACE.match(module.content).end())
+                    spans = self.markers.line_spans(module.key, line, text)
+                    if spans is not None:
+                        return spans
+        return scan_line(text)
+
+    def on_checked_changed(self, key: str) -> None:
+        module = self.get_module(key)
+        if module:
+            self.record_history(EnabledChange(key, not module.enabled, module.enabled))
+            self.invalidate_order()
+            self.markers.set_enabled(key, module.enabled)
+            self.tokens.set_enabled(key, module.enabled)
+            self.update_token_total()
+            if self.journal is not None:
+                self.journal.toggle(key, module.enabled)
+        if self.syncing:
+            return
+        # 手动勾选后不再对应某个方案
+        self.profile_combo.setCurrentIndex(0)
+        if module:
+            if module.enabled:
+                self.insert_preview_section(module)
+            else:
+                self.remove_preview_section(key)
+
+    def refresh_profile_combo(self) -> None:
+        """按当前预设的启用方案重建下拉框；第 0 项表示未对应任何方案的手动勾选。"""
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItem("（手动勾选）")
+        self.profile_combo.addItems(list(self.modules.profiles))
+        self.profile_combo.blockSignals(False)
+        self.delete_profile_btn.setEnabled(bool(self.modules.profiles))
+
+    def on_profile_activated(self, index: int) -> None:
+        if index > 0:
+            self.apply_profile(self.profile_combo.itemText(index))
+
+    def apply_profile(self, name: str) -> None:
+        changes = self.modules.profile_changes(name)
+        if changes:
+            self.record_history(*(EnabledChange(key, not enabled, enabled) for key, enabled in changes))
+            self.apply_enabled_states(changes)
+        self.profile_combo.setCurrentIndex(self.profile_combo.findText(name))
+        self.statusBar().showMessage(f"已切换到方案：{name}", 1500)
+
+    def apply_enabled_states(self, changes: Sequence[Tuple[str, bool]]) -> None:
+        """一次改变多个模块的勾选状态：逐个更新索引与统计，最后只刷新一次列表与预览。"""
+        for key, enabled in changes:
+            if not self.modules.set_enabled(key, enabled):
+                continue
+            self.markers.set_enabled(key, enabled)
+            self.tokens.set_enabled(key, enabled)
+            if self.journal is not None:
+                self.journal.toggle(key, enabled)
+        self.invalidate_order()
+        self.module_model.checks_changed([key for key, _ in changes])
+        self.update_token_total()
+        self.refresh_preview_from_modules()
+
+    def save_profile(self) -> None:
+        current = self.profile_combo.currentText() if self.profile_combo.currentIndex() > 0 else ""
+        name, ok = QInputDialog.getText(self, "保存方案", "方案名称（同名方案将被覆盖）：", text=current)
+        name = name.strip()
+        if not ok or not name:
+            return
+        self.modules.profiles[name] = self.modules.enabled_keys()
+        if self.journal is not None:
+            self.journal.set_profiles(self.modules.profiles)
+        self.refresh_profile_combo()
+        self.profile_combo.setCurrentIndex(self.profile_combo.findText(name))
+        self.statusBar().showMessage(f"已保存方案：{name}", 1500)
+
+    def delete_profile(self) -> None:
+        index = self.profile_combo.currentIndex()
+        if index <= 0:
+            self.statusBar().showMessage("请先在下拉框中选择要删除的方案", 2000)
+            return
+        name = self.profile_combo.itemText(index)
+        del self.modules.profiles[name]
+        if self.journal is not None:
+            self.journal.set_profiles(self.modules.profiles)
+        self.refresh_profile_combo()
+        self.statusBar().showMessage(f"已删除方案：{name}", 1500)
+
+    @timed()
+    def on_module_text_changed(self) -> None:
+        if self.syncing:
+            return
+        key = self.active_key()
+        if not key:
+            return
+        module = self.get_module(key)
+        if module:
+            old = module.content
+            module.content = self.module_editor.toPlainText()
+            self.record_edit(key, old, module.content)
+            if self.journal is not None:
+                self.journal.edit(key, module.content)
+            self.mark_tokens_dirty(key)
+            self.patch_preview_section(module)
+
+    def rename_current_module(self) -> None:
+        key = self.active_key()
+        title = self.rename_input.text().strip()
+        if not key or not title:
+            return
+        module = self.get_module(key)
+        if module:
+            if title != module.title:
+                self.record_history(TitleChange(key, module.title, title))
+            self.set_module_title(module, title)
+            self.statusBar().showMessage("模块标题已更新", 1800)
+
+    def next_key(self) -> str:
+        return self.modules.allocate_key()
+
+    def set_module_title(self, module: ModuleItem, title: str) -> None:
+        module.title = title
+        if self.journal is not None:
+            self.journal.rename(module.key, title)
+        self.mark_tokens_dirty(module.key)
+        self.module_model.module_changed(module.key)
+        self.patch_preview_section(module)
+
+    def set_module_content(self, module: ModuleItem, content: str) -> None:
+        """从编辑器以外改写模块内容，同步索引、统计、预览与编辑器。"""
+        module.content = content
+        if self.journal is not None:
+            self.journal.edit(module.key, content)
+        self.markers.set_content(module.key, content)
+        self.mark_tokens_dirty(module.key)
+        self.patch_preview_section(module)
+        if module.key == self.active_key():
+            self.load_current_module()
+
+    def append_module(self, module: ModuleItem) -> None:
+        self.insert_module(len(self.modules), module)
+
+    def insert_module(self, row: int, module: ModuleItem) -> None:
+        self.record_history(ModuleInsert(row, copy_module(module)))
+        self.module_model.insert_module(row, module)
+        self.invalidate_order()
+        if self.journal is not None:
+            self.journal.add(row, module)
+        self.markers.set_content(module.key, module.content, module.enabled)
+        self.mark_tokens_dirty(module.key)
+        self.insert_preview_section(module)
+
+    def add_module(self) -> None:
+        key = self.next_key()
+        self.append_module(ModuleItem(key=key, title=f"新模块 {key}", content="请输入模块内容...", enabled=True))
+        self.filter_input.clear()
+        self.select_module(key)
+
+    def library_root(self) -> Optional[Path]:
+        root = QSettings().value("library/root")
+        return Path(root) if root and Path(root).is_dir() else None
+
+    def choose_library_dir(self) -> bool:
+        start = str(self.library_root() or "")
+        path = QFileDialog.getExistingDirectory(self, "选择预设库目录", start)
+        if not path:
+            return False
+        QSettings().setValue("library/root", path)
+        self.ensure_library_panel().set_root(Path(path))
+        return True
+
+    def ensure_library_panel(self) -> "LibrarySearchPanel":
+        if self.library_panel is None:
+            from .library_panel import LibrarySearchPanel
+
+            self.library_panel = LibrarySearchPanel()
+            self.module_stack.addWidget(self.library_panel)
+            self.library_panel.moduleChosen.connect(self.import_library_module)
+        return self.library_panel
+
+    def on_search_mode_toggled(self, checked: bool) -> None:
+        if checked and self.ensure_library_panel().library is None:
+            root = self.library_root()
+            if root is not None:
+                self.library_panel.set_root(root)
+            elif not self.choose_library_dir():
+                self.search_mode_check.setChecked(False)
+                return
+        self.module_stack.setCurrentWidget(self.library_panel if checked else self.module_list)
+        self.filter_input.setPlaceholderText("搜索预设库中的模块内容..." if checked else "筛选模块（按名称）...")
+        self.on_filter_changed(self.filter_input.text())
+
+    def import_library_module(self, module: ModuleItem, path: str) -> None:
+        if module.key in self.modules:
+            module.key = self.next_key()
+        self.append_module(module)
+        self.statusBar().showMessage(f"已从预设库导入：[{module.key}] {module.title}（{path}）", 2500)
+
+    def delete_current_module(self) -> None:
+        key = self.active_key()
+        if not key:
+            return
+        if len(self.modules) <= 1:
+            QMessageBox.warning(self, "提示", "至少保留一个模块。")
+            return
+        self.remove_module(key)
+
+    def remove_module(self, key: str) -> None:
+        self.record_history(ModuleRemove(self.modules.row_of(key), copy_module(self.modules.get(key))))
+        self.remove_preview_section(key)
+        self.module_model.remove_module(key)
+        self.invalidate_order()
+        if self.journal is not None:
+            self.journal.delete(key)
+        self.markers.remove(key)
+        self.tokens.remove(key)
+        self._token_dirty.pop(key, None)
+        self.update_token_total()
+
+    def reset_current_module(self) -> None:
+        key = self.active_key()
+        if not key:
+            return
+        default = next((m for m in DEFAULT_MODULES if m.key == key), None)
+        module = self.get_module(key)
+        if module:
+            content = default.content if default else ""
+            title = default.title if default else module.title
+            changes: List[Change] = []
+            delta = content_delta(key, module.content, content)
+            if delta is not None:
+                changes.append(delta)
+            if title != module.title:
+                changes.append(TitleChange(key, module.title, title))
+            self.record_history(*changes)
+            self.set_module_title(module, title)
+            self.set_module_content(module, content)
+
+    # ---- 工作区 ----
+
+    def new_history(self) -> History:
+        return History(self.history_limit)
+
+    def new_document(
+        self, modules: ModuleCollection, name: Optional[str] = None, path: Optional[str] = None
+    ) -> PresetDocument:
+        journal = self.journals.create() if self.journals is not None else None
+        document = PresetDocument(modules, name or self.workspace.untitled_name(), self.new_history(), path, journal)
+        document.save_meta()
+        return document
+
+    def add_document_tab(self, document: PresetDocument) -> None:
+        index = self.document_tabs.addTab(document.name)
+        self.document_tabs.setTabToolTip(index, document.path or document.name)
+
+    def update_document_tab(self, document: PresetDocument) -> None:
+        index = self.workspace.index(document)
+        self.document_tabs.setTabText(index, document.name)
+        self.document_tabs.setTabToolTip(index, document.path or document.name)
+        if document is self.workspace.active:
+            self.setWindowTitle(f"{document.name} - Prompt 模板生成器 Pro")
+        document.save_meta()
+
+    def open_document(self, document: PresetDocument) -> None:
+        self.workspace.add(document)
+        if document.journal is not None:
+            document.journal.start(document.modules)
+        self.add_document_tab(document)
+        self.switch_document(document)
+
+    def new_preset(self) -> None:
+        self.open_document(self.new_document(ModuleCollection(m.copy() for m in DEFAULT_MODULES)))
+        self.statusBar().showMessage("已新建预设", 1800)
+
+    def load_document(self, document: PresetDocument) -> None:
+        """把文档的模块、历史与派生状态换入窗口；派生状态已释放时重建。"""
+        if document.view is None:
+            document.view = DocumentView(document.modules, self.tokenizer)
+        self.modules = document.modules
+        self.history = document.history
+        self.journal = document.journal
+        for name in VIEW_STATE:
+            setattr(self, name, getattr(document.view, name))
+        self.workspace.activate(document)
+
+    def stash_document(self) -> None:
+        document = self.workspace.active
+        # set_modules 会整体替换模块集合，换出时写回
+        document.modules = self.modules
+        document.selected_key = self.active_key()
+        for name in VIEW_STATE:
+            setattr(document.view, name, getattr(self, name))
+
+    def switch_document(self, document: PresetDocument) -> None:
+        if document is self.workspace.active:
+            return
+        self.token_timer.stop()
+        if self.preview_editor is not None:
+            self.page_timer.stop()
+            self.validation_timer.stop()
+            self.validator.cancel()
+        self.stash_document()
+        self.load_document(document)
+        self.show_document()
+        self.release_idle_views()
+
+    def show_document(self) -> None:
+        """切换文档后刷新界面：模块列表、编辑器、撤销按钮、统计与预览。"""
+        document = self.workspace.active
+        index = self.workspace.index(document)
+        if self.document_tabs.currentIndex() != index:
+            self.document_tabs.blockSignals(True)
+            self.document_tabs.setCurrentIndex(index)
+            self.document_tabs.blockSignals(False)
+        self.update_document_tab(document)
+        self.syncing = True
+        self._editor_key = None
+        self.module_editor.clear()
+        self.rename_input.clear()
+        self.current_module_label.setText("当前模块")
+        self.syncing = False
+        self.module_model.set_tokens(self.tokens)
+        self.module_model.set_modules(self.modules)
+        before = self.module_list.currentIndex()
+        if not (document.selected_key and self.select_module(document.selected_key)):
+            self.select_first_module()
+        if self.module_list.currentIndex() == before:
+            # 两份预设的键相同时当前行不变，不会触发 currentChanged
+            self.load_current_module()
+        self.update_history_actions()
+        self.refresh_profile_combo()
+        self.mark_tokens_dirty()
+        self.update_token_total()
+        if self.preview_editor is not None:
+            self.attach_preview()
+
+    def create_preview_document(self) -> QTextDocument:
+        document = QTextDocument(self)
+        document.setDocumentLayout(QPlainTextDocumentLayout(document))
+        document.setDefaultFont(self.preview_editor.font())
+        document.setUndoRedoEnabled(False)
+        document.contentsChange.connect(self.on_preview_text_changed)
+        return document
+
+    def attach_preview(self) -> None:
+        """把当前文档的预览文档放进预览编辑框；首次激活或已释放时新建并渲染。"""
+        view = self.workspace.active.view
+        created = view.preview is None
+        if created:
+            view.preview = self.create_preview_document()
+        self.preview_editor.setDocument(view.preview)
+        if created:
+            # 每份预览文档有自己的高亮器，换回时已有的高亮格式原样保留
+            view.highlighter = MarkerHighlighter(self.preview_editor, self.preview_line_spans)
+        self.outline.setVisible(self.large_mode)
+        if created:
+            self.refresh_preview_from_modules()
+        else:
+            self.invalidate_order()
+            self.update_word_count()
+        self.run_validation()
+
+    def release_view(self, document: PresetDocument) -> None:
+        if document.view is not None and document.view.preview is not None:
+            document.view.preview.deleteLater()
+        document.view = None
+
+    def release_idle_views(self) -> None:
+        for document in self.workspace.idle_views():
+            self.release_view(document)
+
+    def document_packs(self, history: bool = False) -> List[PresetPack]:
+        """打开的文档引用的预设包；history 为真时也包括撤销历史中的模块引用的包。"""
+        modules: List[ModuleItem] = []
+        for document in self.workspace:
+            modules.extend(self.modules if document is self.workspace.active else document.modules)
+            if history:
+                modules.extend(document.history.modules())
+        return module_packs(modules)
+
+    def release_packs(self, packs: Iterable[PresetPack]) -> None:
+        """释放文档不再显示的预设包。
+
+        仍有文档在用的保持映射；撤销历史或后台任务可能还会读取的读入内存后
+        关闭文件；其余直接关闭。
+        """
+        live = {id(pack) for pack in self.document_packs()}
+        held = {id(pack) for pack in self.document_packs(history=True)}
+        busy = (self.exporter is not None and self.exporter.is_running()) or (
+            self.preview_editor is not None and self.validator.is_running()
+        )
+        for pack in packs:
+            if id(pack) in live:
+                continue
+            if busy or id(pack) in held:
+                pack.detach()
+            else:
+                pack.close()
+
+    def check_journal_errors(self) -> None:
+        # 同一个错误只提示一次
+        for document in self.workspace:
+            journal = document.journal
+            error = journal.error if journal is not None else None
+            if error is None or self._journal_errors.get(journal) == error:
+                continue
+            self._journal_errors[journal] = error
+            self.statusBar().showMessage(f"自动保存失败：{error}")
+            QMessageBox.warning(
+                self, "自动保存失败", f"「{document.name}」的修改未能写入自动保存，程序崩溃时可能无法恢复：{error}"
+            )
+
+    def on_document_tab_changed(self, index: int) -> None:
+        if 0 <= index < len(self.workspace):
+            self.switch_document(self.workspace.documents[index])
+
+    def close_document(self, index: int) -> None:
+        if len(self.workspace) <= 1:
+            QMessageBox.warning(self, "提示", "至少保留一份预设。")
+            return
+        document = self.workspace.documents[index]
+        if document.history.can_undo():
+            answer = QMessageBox.question(self, "关闭预设", f"关闭“{document.name}”？未导出的修改将丢失。")
+            if answer != QMessageBox.Yes:
+                return
+        if document is self.workspace.active:
+            self.switch_document(self.workspace.documents[index - 1 if index else 1])
+        self.release_view(document)
+        self.workspace.remove(document)
+        if document.journal is not None:
+            self.journals.discard(document.journal)
+        self.release_packs(module_packs(document.modules))
+        self.document_tabs.blockSignals(True)
+        self.document_tabs.removeTab(index)
+        self.document_tabs.setCurrentIndex(self.workspace.index(self.workspace.active))
+        self.document_tabs.blockSignals(False)
+
+    def section_text(self, module: ModuleItem) -> str:
+        block = self._section_cache.get(module.key)
+        if block is None:
+            block = render_section(module)
+            self._section_cache[module.key] = block
+        return block
+
+    def compose_prompt(self) -> str:
+        return "\n".join(self.section_text(m) for m in self.modules if m.enabled)
+
+    @timed("compose_prompt")
+    def compose_preview(self) -> Tuple[str, List[Tuple[str, int]]]:
+        """预览全文与各段长度。切回最近用过的启用组合时直接取缓存。"""
+        cache_key = composition_key(self.modules)
+        composed = self.compose_cache.get(cache_key)
+        if composed is None:
+            blocks = [(m.key, self.section_text(m)) for m in self.modules if m.enabled]
+            text = "\n".join(block for _, block in blocks)
+            composed = (text, [(key, utf16_length(block) + 1) for key, block in blocks])
+            self.compose_cache.put(cache_key, composed, text)
+        return composed
+
+    @timed()
+    def refresh_preview_from_modules(self) -> None:
+        if self.syncing or self.preview_editor is None:
+            return
+        size = sum(len(m.title) + len(m.key) + 8 + m.size_hint for m in self.modules if m.enabled)
+        large = size >= LARGE_PROMPT_CHARS
+        if large != self.large_mode:
+            self.large_mode = large
+            self.outline.setVisible(large)
+            self.invalidate_order()
+        if large:
+            key = self._sections.key_at(0) if len(self._sections) else None
+            self.render_preview_window(self._order_index.get(key, 0) if key in self.modules else 0)
+            return
+        self.syncing = True
+        self._section_cache.clear()
+        text, spans = self.compose_preview()
+        self._sections.rebuild(spans)
+        self.preview_editor.setPlainText(text)
+        self.update_word_count()
+        self.syncing = False
+
+    def update_word_count(self) -> None:
+        count = self.preview_editor.document().characterCount() - 1
+        if self.large_mode:
+            self.word_count_label.setText(
+                f"字符数: 约 {self._outside_chars + count}（大文本模式，显示 {len(self._sections)}"
+                f"/{len(self.enabled_order())} 段）"
+            )
+            return
+        self.word_count_label.setText(f"字符数: {count}")
+
+    def enabled_order(self) -> List[str]:
+        """已启用模块的键，按预览顺序排列；结构变化后惰性重建。"""
+        if self._order is None:
+            self._order = [m.key for m in self.modules if m.enabled]
+            self._order_index = {key: i for i, key in enumerate(self._order)}
+            if self.large_mode:
+                self.outline_model.set_order(self.modules, self._order)
+        return self._order
+
+    def invalidate_order(self) -> None:
+        self._order = None
+        if self.large_mode:
+            self.enabled_order()
+
+    def section_size(self, key: str) -> int:
+        module = self.modules.get(key)
+        return len(module.title) + len(key) + 8 + module.size_hint
+
+    def render_preview_window(self, anchor: int, offset: int = 0) -> None:
+        """大文本模式下只渲染第 anchor 段附近的段落，并把该段偏移 offset 处滚到视口顶端。
+
+        窗口向前取约三分之一、向后取约全部的字符预算，两侧至少各多带一段，
+        滚动到窗口边缘时总有下一段可以换入。
+        """
+        order = self.enabled_order()
+        anchor = max(0, min(anchor, len(order) - 1))
+        start = end = anchor
+        budget = PREVIEW_WINDOW_CHARS // 3
+        while start > 0 and (budget > 0 or start == anchor):
+            start -= 1
+            budget -= self.section_size(order[start])
+        budget = PREVIEW_WINDOW_CHARS
+        while end < len(order) and (budget > 0 or end <= anchor + 1):
+            budget -= self.section_size(order[end])
+            end += 1
+
+        self.syncing = True
+        self._section_cache.clear()
+        blocks = [(key, self.section_text(self.modules.get(key))) for key in order[start:end]]
+        self._sections.rebuild([(key, utf16_length(block) + 1) for key, block in blocks])
+        self.preview_editor.setPlainText("\n".join(block for _, block in blocks))
+        self._window = (order[start], order[end - 1]) if order else None
+        total = sum(self.section_size(key) for key in order)
+        self._outside_chars = max(0, total - sum(self.section_size(key) for key in order[start:end]))
+        if order:
+            row = anchor - start
+            self.scroll_preview_to(self._sections.offset(row) + min(offset, self._sections.span(row) - 1))
+        self.update_word_count()
+        self.syncing = False
+
+    def scroll_preview_to(self, position: int) -> None:
+        cursor = QTextCursor(self.preview_editor.document())
+        cursor.setPosition(min(position, self.preview_editor.document().characterCount() - 1))
+        self.preview_editor.setTextCursor(cursor)
+        # 先滚到底再让光标可见，光标所在行就停在视口顶端
+        bar = self.preview_editor.verticalScrollBar()
+        bar.setValue(bar.maximum())
+        self.preview_editor.ensureCursorVisible()
+
+    def preview_top(self) -> Optional[Tuple[str, int]]:
+        """视口顶端所在段落的键，以及顶端在该段中的偏移。"""
+        if not len(self._sections) or self._sections.has_preamble():
+            return None
+        position = self.preview_editor.cursorForPosition(QPoint(0, 0)).position()
+        row = self._sections.find(position)
+        return self._sections.key_at(row), position - self._sections.offset(row)
+
+    def on_preview_scrolled(self, value: int) -> None:
+        if not self.large_mode or self.syncing or not len(self._sections):
+            return
+        order = self.enabled_order()
+        bar = self.preview_editor.verticalScrollBar()
+        first = self._order_index.get(self._sections.key_at(0), 0)
+        last = self._order_index.get(self._sections.key_at(len(self._sections) - 1), len(order) - 1)
+        if (value <= bar.minimum() + PAGE_MARGIN_LINES and first > 0) or (
+            value >= bar.maximum() - PAGE_MARGIN_LINES and last < len(order) - 1
+        ):
+            self.page_timer.start()
+
+    def page_preview(self) -> None:
+        """以视口顶端的段落为中心重新渲染窗口。"""
+        order = self.enabled_order()
+        top = self.preview_top()
+        if top is None:
+            if self._window is not None and self._window[0] in self._order_index:
+                self.render_preview_window(self._order_index[self._window[0]])
+            return
+        key, offset = top
+        if key not in self._order_index:
+            # 顶端段落已删除或停用：取窗口中其后第一个仍在预览里的段落
+            row = self._sections.row_of(key)
+            offset = 0
+            for later in range(row + 1, len(self._sections)):
+                if self._sections.key_at(later) in self._order_index:
+                    key = self._sections.key_at(later)
+                    break
+        self.render_preview_window(self._order_index.get(key, len(order)), offset)
+
+    def on_outline_clicked(self, index: QModelIndex) -> None:
+        key = index.data(ModuleListModel.KeyRole)
+        row = self._sections.row_of(key) if not self._sections.has_preamble() else None
+        if row is not None:
+            self.scroll_preview_to(self._sections.offset(row))
+        else:
+            self.enabled_order()
+            self.render_preview_window(self._order_index.get(key, 0))
+        self.preview_editor.setFocus()
+
+    def in_preview_window(self, key: str) -> bool:
+        lo, hi = self.preview_rows()
+        return lo <= self.modules.row_of(key) < hi
+
+    def preview_rows(self) -> Tuple[int, int]:
+        """预览覆盖的模块行范围；大文本模式下为窗口首尾段落之间（含其后未启用的模块）。"""
+        if not self.large_mode or self._window is None:
+            return 0, len(self.modules)
+        lo = max(0, self.modules.row_of(self._window[0]))
+        hi = max(lo, self.modules.row_of(self._window[1]) + 1)
+        while hi < len(self.modules) and not self.modules[hi].enabled:
+            hi += 1
+        return lo, hi
+
+    def mark_tokens_dirty(self, *keys: str) -> None:
+        self._token_dirty.update(dict.fromkeys(keys))
+        if not self.token_timer.isActive():
+            self.token_timer.start(300)
+
+    def flush_token_counts(self) -> None:
+        # 每次只占用界面线程一小段时间，剩余模块留到下一轮事件循环
+        deadline = time.perf_counter() + 0.015
+        changed: List[str] = []
+        while self._token_dirty and time.perf_counter() < deadline:
+            key = next(iter(self._token_dirty))
+            del self._token_dirty[key]
+            module = self.get_module(key)
+            if module is not None and self.tokens.update(module):
+                changed.append(key)
+        if changed:
+            self.module_model.tokens_changed(changed)
+        if self._token_dirty:
+            self.token_timer.start(0)
+        self.update_token_total()
+
+    def update_token_total(self) -> None:
+        if self._token_dirty:
+            pending = "（统计中…）"
+        elif len(self.tokens) < len(self.modules):
+            pending = f"（{len(self.modules) - len(self.tokens)} 个模块未读取）"
+        else:
+            pending = ""
+        self.token_label.setText(f"Tokens: {self.tokens.total()}{pending}  [{self.tokens.tokenizer.name}]")
+
+    def load_vocab(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(
+            self, "载入词表", "", "词表文件 (*.txt *.tiktoken);;所有文件 (*)"
+        )
+        if not path:
+            return
+        try:
+            tokenizer = load_tokenizer(path)
+        except (OSError, UnicodeDecodeError, ValueError) as exc:
+            QMessageBox.critical(self, "载入失败", f"载入词表失败：{exc}")
+            return
+        self.tokenizer = tokenizer
+        for document in self.workspace:
+            # 其他文档保留的统计一并换用新词表，激活时再重新计数
+            if document.view is not None and document is not self.workspace.active:
+                document.view.tokens.set_tokenizer(tokenizer, [])
+                document.view._token_dirty.update(dict.fromkeys(document.modules.keys()))
+        self.tokens.set_tokenizer(tokenizer, [])
+        self.mark_tokens_dirty(*self.modules.keys())
+        self.update_token_total()
+        self.statusBar().showMessage(f"已载入词表：{path}", 2200)
+
+    def enabled_row(self, key: str) -> int:
+        # 预览段落与模块集合同序，按集合行号二分
+        target = self.modules.row_of(key)
+        lo, hi = 0, len(self._sections)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.modules.row_of(self._sections.key_at(mid)) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def preview_slice(self, start: int, length: int) -> str:
+        cursor = QTextCursor(self.preview_editor.document())
+        cursor.setPosition(start)
+        cursor.setPosition(start + length, QTextCursor.KeepAnchor)
+        return cursor.selectedText().replace("\u2029", "\n")
+
+    def splice_preview(self, start: int, length: int, text: str) -> None:
+        was_syncing = self.syncing
+        self.syncing = True
+        cursor = QTextCursor(self.preview_editor.document())
+        cursor.setPosition(start)
+        cursor.setPosition(start + length, QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+        self.syncing = was_syncing
+
+    def patch_preview_section(self, module: ModuleItem) -> None:
+        if self.syncing or self.preview_editor is None:
+            return
+        row = self._sections.row_of(module.key)
+        if row is None:
+            # 大文本模式下不在窗口中的段落没有渲染，无需更新
+            if not self.large_mode:
+                self.refresh_preview_from_modules()
+            return
+        old = self._section_cache.pop(module.key, None)
+        start = self._sections.offset(row)
+        old_len = self._sections.span(row) - 1
+        if old is None:
+            old = self.preview_slice(start, old_len)
+        new = self.section_text(module)
+        # 只替换新旧段落之间真正不同的那一段，光标与撤销栈保持不动
+        head = common_prefix_length(old, new)
+        tail = common_suffix_length(old[head:], new[head:])
+        removed = old[head:len(old) - tail]
+        inserted = new[head:len(new) - tail]
+        if removed or inserted:
+            self.splice_preview(start + utf16_length(old[:head]), utf16_length(removed), inserted)
+        self._sections.set_span(row, utf16_length(new) + 1)
+        self.update_word_count()
+
+    def insert_preview_section(self, module: ModuleItem) -> None:
+        if self.syncing or self.preview_editor is None or self._sections.row_of(module.key) is not None:
+            return
+        if self.large_mode:
+            if self.in_preview_window(module.key):
+                self.page_timer.start()
+            return
+        if self._sections.has_preamble():
+            self.refresh_preview_from_modules()
+            return
+        row = self.enabled_row(module.key)
+        block = self.section_text(module)
+        count = len(self._sections)
+        if row < count:
+            self.splice_preview(self._sections.offset(row), 0, block + "\n")
+        elif count:
+            self.splice_preview(self._sections.total() - 1, 0, "\n" + block)
+        else:
+            self.splice_preview(0, self.preview_editor.document().characterCount() - 1, block)
+        self._sections.insert(row, module.key, utf16_length(block) + 1)
+        self.update_word_count()
+
+    def remove_preview_section(self, key: str) -> None:
+        row = self._sections.row_of(key)
+        if self.syncing or row is None:
+            return
+        if self.large_mode:
+            # 模块此时可能还在集合中，待本次操作完成后再重新渲染窗口
+            self.page_timer.start()
+            return
+        if self._sections.has_preamble():
+            self.refresh_preview_from_modules()
+            return
+        start = self._sections.offset(row)
+        span = self._sections.span(row)
+        if len(self._sections) == 1:
+            self.splice_preview(0, self.preview_editor.document().characterCount() - 1, "")
+        elif row < len(self._sections) - 1:
+            self.splice_preview(start, span, "")
+        else:
+            self.splice_preview(start - 1, span, "")
+        self._sections.remove(row)
+        self._section_cache.pop(key, None)
+        self.update_word_count()
+
+    @timed()
+    def parse_preview_back(self, text: str) -> bool:
+        preamble, parsed = parse_sections(text)
+        keys = [module.key for module, _ in parsed]
+        # 大文本模式下预览只含窗口内的段落，窗口外的模块保持不动，其键不能在预览中再次出现
+        lo, hi = self.preview_rows()
+        clash = self.large_mode and any(
+            key in self.modules and not lo <= self.modules.row_of(key) < hi for key in keys
+        )
+        if not parsed or len(set(keys)) < len(keys) or clash or (preamble and self.large_mode):
+            # 无标题或键重复：整篇视为前言，下次编辑重新全量解析
+            self._sections.rebuild([(None, utf16_length(text) + 1)])
+            return False
+
+        # 预览中出现的模块按预览顺序排列；未启用的模块不在预览里，保留在原先的相邻位置
+        parsed_keys = set(keys)
+        followers: Dict[Optional[str], List[ModuleItem]] = {}
+        anchor: Optional[str] = None
+        for row in range(lo, hi):
+            module = self.modules[row]
+            if module.key in parsed_keys:
+                anchor = module.key
+            elif not module.enabled:
+                followers.setdefault(anchor, []).append(module)
+
+        new_modules = ModuleCollection(self.modules[row] for row in range(lo))
+        for follower in followers.get(None, []):
+            new_modules.append(follower)
+        for module, _ in parsed:
+            new_modules.append(module)
+            for follower in followers.get(module.key, []):
+                new_modules.append(follower)
+        for row in range(hi, len(self.modules)):
+            new_modules.append(self.modules[row])
+
+        self._section_cache.clear()
+        entries: List[Tuple[Optional[str], int]] = [(None, preamble)] if preamble else []
+        entries.extend((module.key, span) for module, span in parsed)
+        self._sections.rebuild(entries)
+        if self.large_mode:
+            self._window = (keys[0], keys[-1])
+        new_modules.profiles = self.modules.profiles
+        self.set_modules(new_modules)
+        return True
+
+    def sync_preview_range(self, position: int, removed: int, added: int) -> bool:
+        if not len(self._sections):
+            return False
+        row = self._sections.find(position)
+        key = self._sections.key_at(row)
+        if key is None or self._sections.find(position + removed) != row:
+            return False
+        module = self.get_module(key)
+        if module is None:
+            return False
+
+        start = self._sections.offset(row)
+        header = self.preview_editor.document().findBlock(start)
+        if header.position() != start or position < start + header.length():
+            return False
+
+        span = self._sections.span(row) + added - removed
+        self._sections.set_span(row, span)
+        block = self.preview_slice(start, span - 1)
+        body = block.split("\n", 1)[1] if "\n" in block else ""
+        if "\n### [" in "\n" + body:
+            return False
+
+        self.record_edit(key, module.content, body.strip())
+        module.content = body.strip()
+        if self.journal is not None:
+            self.journal.edit(key, module.content)
+        self.markers.set_content(key, module.content)
+        self.mark_tokens_dirty(key)
+        self._section_cache.pop(key, None)
+        if key == self.active_key():
+            self.syncing = True
+            self.module_editor.setPlainText(module.content)
+            self.syncing = False
+        return True
+
+    def record_history(self, *changes: Change) -> None:
+        if self._replaying or not changes:
+            return
+        self.history.record(changes)
+        self.update_history_actions()
+
+    def record_edit(self, key: str, old: str, new: str) -> None:
+        if self._replaying:
+            return
+        self.history.record_edit(key, old, new)
+        self.update_history_actions()
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.KeyPress and METRICS.enabled and self._keystroke_start is None:
+            # 从按键到事件队列空闲：包括回写、索引、高亮与排版，不含绘制
+            self._keystroke_start = time.perf_counter()
+            QTimer.singleShot(0, self.record_keystroke)
+        # 编辑器默认占用撤销快捷键，放行给窗口的撤销/重做动作
+        if event.type() == QEvent.ShortcutOverride and (
+            event.matches(QKeySequence.Undo) or event.matches(QKeySequence.Redo)
+        ):
+            event.ignore()
+            return True
+        return super().eventFilter(watched, event)
+
+    def record_keystroke(self) -> None:
+        if self._keystroke_start is not None:
+            METRICS.record("keystroke", time.perf_counter() - self._keystroke_start)
+            self._keystroke_start = None
+
+    def show_diagnostics(self) -> None:
+        if self.diagnostics_panel is None:
+            from .diagnostics_panel import DiagnosticsPanel
+
+            self.diagnostics_panel = DiagnosticsPanel(parent=self)
+        self.diagnostics_panel.show()
+        self.diagnostics_panel.raise_()
+
+    def update_history_actions(self) -> None:
+        self.undo_action.setEnabled(self.history.can_undo())
+        self.redo_action.setEnabled(self.history.can_redo())
+
+    def undo(self) -> None:
+        self.replay_history(self.history.undo(), "已撤销")
+
+    def redo(self) -> None:
+        self.replay_history(self.history.redo(), "已重做")
+
+    def replay_history(self, changes: Sequence[Change], message: str) -> None:
+        if not changes:
+            return
+        self._replaying = True
+        try:
+            if len(changes) > 1 and all(isinstance(c, EnabledChange) for c in changes):
+                # 切换方案产生的批量勾选，整体应用后只刷新一次预览
+                self.apply_enabled_states([(c.key, c.new) for c in changes])
+            else:
+                for change in changes:
+                    self.apply_change(change)
+        finally:
+            self._replaying = False
+        self.update_history_actions()
+        self.statusBar().showMessage(message, 1500)
+
+    def apply_change(self, change: Change) -> None:
+        if isinstance(change, CollectionReplace):
+            modules = ModuleCollection(copy_module(m) for m in change.new)
+            modules.profiles = self.modules.profiles
+            self.set_modules(modules)
+            self.refresh_preview_from_modules()
+            return
+        if isinstance(change, ModuleRemove):
+            self.remove_module(change.module.key)
+            return
+        if isinstance(change, ModuleInsert):
+            self.insert_module(change.row, copy_module(change.module))
+            self.select_module(change.module.key)
+            return
+        module = self.get_module(change.key)
+        if module is None:
+            return
+        self.select_module(change.key)
+        if isinstance(change, EnabledChange):
+            self.modules.set_enabled(change.key, change.new)
+            self.module_model.module_changed(change.key)
+            self.on_checked_changed(change.key)
+        elif isinstance(change, TitleChange):
+            self.set_module_title(module, change.new)
+            self.load_current_module()
+        elif isinstance(change, ContentDelta):
+            self.set_module_content(module, change.apply(module.content))
+            if module.key == self.active_key():
+                cursor = self.module_editor.textCursor()
+                cursor.setPosition(utf16_length(module.content[: change.start + len(change.inserted)]))
+                self.module_editor.setTextCursor(cursor)
+
+    @timed()
+    def on_preview_text_changed(self, position: int, removed: int, added: int) -> None:
+        self.schedule_validation()
+        if self.syncing:
+            return
+        ok = self.sync_preview_range(position, removed, added)
+        if not ok:
+            ok = self.parse_preview_back(self.preview_editor.toPlainText())
+            if ok:
+                self.load_current_module()
+        self.update_word_count()
+        if ok:
+            self.statusBar().showMessage("预览修改已同步回模块", 1800)
+        else:
+            self.statusBar().showMessage("预览格式未匹配，暂未同步", 2200)
+
+    def schedule_validation(self) -> None:
+        # 文本变化时取消进行中的检查，停止输入一段时间后重新检查
+        self.validator.cancel()
+        self.validation_timer.start()
+
+    def run_validation(self, manual: bool = False) -> None:
+        self.validation_timer.stop()
+        self._manual_validation = manual
+        names = [name for name, check in self.rule_checks.items() if check.isChecked()]
+        # 已索引段落的标题在同步时校验过，只有未索引的前言需要交给后台扫描
+        headings = []
+        # 大文本模式下窗口外的段落直接由模块渲染，标题必然存在
+        keys = self.enabled_order() if self.large_mode else self._sections.keys()
+        for key in keys:
+            module = self.get_module(key) if key is not None else None
+            if module is not None:
+                headings.append(f"### [{module.key}] {module.title}")
+        preamble = self.preview_slice(0, self._sections.span(0) - 1) if self._sections.has_preamble() else ""
+        snapshot = ValidationSnapshot.capture(
+            self.modules, preamble, headings, self.markers.placeholder_counts(), resolver=self.includes
+        )
+        self.validator.start(snapshot, names)
+
+    def validate_preview(self) -> None:
+        self.run_validation(manual=True)
+        self.statusBar().showMessage("正在检查…", 1500)
+
+    def on_validation_finished(self) -> None:
+        self.issues_panel.finish()
+        if not self._manual_validation:
+            return
+        if self.issues_panel.count:
+            self.statusBar().showMessage("检查完成：有待处理项", 2500)
+        else:
+            self.statusBar().showMessage("检查通过", 1500)
+
+    def show_module(self, key: str) -> None:
+        self.tabs.setCurrentIndex(0)
+        self.select_module(key)
+
+    def closeEvent(self, event) -> None:
+        if self.library_panel is not None:
+            self.library_panel.close_library()
+        if self.journals is not None:
+            self.stash_document()
+            for document in self.workspace:
+                document.save_meta()
+            self.journals.close()
+        if self.preview_editor is not None:
+            self.validator.cancel()
+            self.validator.wait()
+        # 等待排队中的导出写完，避免留下未替换的临时文件
+        if self.exporter is not None:
+            self.exporter.wait()
+        super().closeEvent(event)
+
+    def ensure_exporter(self) -> "ExportRunner":
+        if self.exporter is None:
+            from .export_runner import ExportRunner
+
+            self.exporter = ExportRunner(self)
+            self.exporter.progress.connect(self.on_export_progress)
+            self.exporter.finished.connect(self.on_export_finished)
+        return self.exporter
+
+    def export_prompt_txt(self) -> None:
+        from .export import export_prompt, export_text, snapshot_modules
+
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Prompt", "prompt_template.txt", "Text Files (*.txt)")
+        if not path:
+            return
+        if self.large_mode:
+            # 预览只有窗口内的段落，全文在后台从模块副本逐段写出
+            snapshot = snapshot_modules(self.modules)
+            self.ensure_exporter().start(f"TXT：{path}", lambda progress: export_prompt(path, snapshot, progress))
+        else:
+            text = self.expanded_preview().strip() + "\n"
+            self.ensure_exporter().start(f"TXT：{path}", lambda progress: export_text(path, text))
+        self.statusBar().showMessage(f"正在导出 TXT：{path}")
+
+    def export_preset(self) -> None:
+        from .export import snapshot_modules
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出预设", "prompt_preset.json", f"JSON Files (*.json);;预设包 (*{PACK_SUFFIX})"
+        )
+        if not path:
+            return
+        document = self.workspace.active
+        # 存回打开着的预设包时先把它读入内存：Windows 上不能替换仍被映射的文件
+        target = Path(path).resolve()
+        for pack in self.document_packs(history=True):
+            if pack.path == target:
+                pack.detach()
+        snapshot = snapshot_modules(self.modules)
+
+        def on_success() -> None:
+            document.path = path
+            document.name = Path(path).stem
+            if document in self.workspace:
+                self.update_document_tab(document)
+
+        self.ensure_exporter().start(f"预设：{path}", lambda progress: save_preset(path, snapshot, progress), on_success)
+        self.statusBar().showMessage(f"正在导出预设：{path}")
+
+    def batch_export(self) -> None:
+        """把所有打开的预设一次写进一个 zip / tar 归档：每份预设的 Prompt、预设文件或两者。"""
+        from .export import ARCHIVE_SUFFIXES, export_archive, preset_text, snapshot_modules
+
+        kinds = ["Prompt（.txt）", "预设（.json）", "Prompt 与预设"]
+        kind, ok = QInputDialog.getItem(self, "批量导出", "导出所有打开的预设：", kinds, 0, False)
+        if not ok:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "批量导出", "prompts.zip", "归档 (" + " ".join(f"*{s}" for s in ARCHIVE_SUFFIXES) + ")"
+        )
+        if not path:
+            return
+        if not path.lower().endswith(ARCHIVE_SUFFIXES):
+            path += ".zip"
+        self.stash_document()
+        snapshots = [(document.name, snapshot_modules(document.modules)) for document in self.workspace]
+        with_prompt = kind != kinds[1]
+        with_preset = kind != kinds[0]
+
+        def members():
+            # 成员在后台线程中逐个生成、逐个写出，同一时刻只有一份预设的全文在内存中
+            for name, modules in snapshots:
+                if with_prompt:
+                    yield {"name": f"{name}.txt", "text": compose_prompt(modules).strip() + "\n"}
+                if with_preset:
+                    yield {"name": f"{name}.json", "text": preset_text(modules)}
+
+        total = len(snapshots) * (with_prompt + with_preset)
+        self.ensure_exporter().start(f"归档：{path}", lambda progress: export_archive(path, members(), total, progress))
+        self.statusBar().showMessage(f"正在批量导出 {len(snapshots)} 个预设：{path}")
+
+    def on_export_progress(self, description: str, done: int, total: int) -> None:
+        self.export_progress.setRange(0, max(total, 1))
+        self.export_progress.setValue(done)
+        self.export_progress.setToolTip(description)
+        self.export_progress.show()
+
+    def on_export_finished(self, description: str, error: str) -> None:
+        if not self.exporter.is_running():
+            self.export_progress.hide()
+        if error:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, "导出失败", f"导出 {description} 失败：{error}")
+            return
+        self.statusBar().showMessage(f"已导出 {description}", 2200)
+
+    def import_preset(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "导入预设", "", f"预设 (*.json *{PACK_SUFFIX})")
+        if not path:
+            return
+        try:
+            modules = load_preset(path)
+        except Exception as exc:
+            QMessageBox.critical(self, "导入失败", f"导入预设失败：{exc}")
+            return
+
+        document = self.workspace.active
+        if not document.pristine:
+            # 已有修改的预设保持不动，导入的预设在新标签中打开
+            self.open_document(self.new_document(modules, Path(path).stem, path))
+            self.statusBar().showMessage(f"已打开预设：{path}", 2200)
+            return
+        replaced = module_packs(self.modules)
+        self.set_modules(modules)
+        self.release_packs(replaced)
+        self.select_first_module()
+        self.refresh_preview_from_modules()
+        document.path = path
+        document.name = Path(path).stem
+        self.update_document_tab(document)
+        self.statusBar().showMessage(f"已导入预设：{path}", 2200)
+
+    def compare_presets(self) -> None:
+        """把另一个已打开的预设或文件（旧）与当前预设（新）左右对照比较。"""
+        from .diff import diff_presets, load_modules
+        from .diff_panel import DiffPanel
+
+        current = self.workspace.active
+        others = [d for d in self.workspace if d is not current]
+        choices = [d.name for d in others] + ["从文件选择…"]
+        index = len(others)
+        if others:
+            choice, ok = QInputDialog.getItem(self, "比较预设", "与当前预设比较：", choices, 0, False)
+            if not ok:
+                return
+            index = choices.index(choice)
+        if index < len(others):
+            old_name, old_modules = others[index].name, others[index].modules
+        else:
+            path, _ = QFileDialog.getOpenFileName(self, "比较预设", "", f"预设 (*.json *{PACK_SUFFIX})")
+            if not path:
+                return
+            try:
+                old_modules = load_modules(path)
+            except Exception as exc:
+                QMessageBox.critical(self, "比较失败", f"读取预设失败：{exc}")
+                return
+            # 对照窗口还会读取这些模块，读入内存后即可关闭文件
+            for pack in module_packs(old_modules):
+                pack.detach()
+            old_name = Path(path).stem
+        result = diff_presets(old_modules, self.modules)
+        if not result:
+            self.statusBar().showMessage(f"与 {old_name} 没有差异", 2200)
+            return
+        panel = DiffPanel(result, old_name, current.name, self)
+        panel.setAttribute(Qt.WA_DeleteOnClose)
+        panel.show()
+
+    def expanded_preview(self) -> str:
+        """预览全文展开 include 后的文本；预览本身保留指令，便于回写模块。"""
+        self.includes.sync()
+        return self.includes.expand_text(self.preview_editor.toPlainText())
+
+    def copy_to_clipboard(self) -> None:
+        if self.large_mode:
+            QApplication.clipboard().setText(compose_prompt(self.modules, self.includes))
+        else:
+            QApplication.clipboard().setText(self.expanded_preview())
+        self.statusBar().showMessage("已复制到剪贴板", 1500)
+
+
+def run(argv: List[str], profile: Optional[StartupProfile] = None) -> int:
+    timing = profile or StartupProfile()
+    with timing.phase("创建 QApplication"):
+        app = QApplication(argv)
+        app.setStyle("Fusion")
+        app.setApplicationName("Prompt 模板生成器 Pro")
+        app.setOrganizationName("PromptBuilder")
+    with timing.phase("打开自动保存目录"):
+        from .journal import JournalSet
+
+        journal_dir = Path(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)) / "journal"
+        journals = JournalSet(journal_dir)
+    with timing.phase("构建主窗口"):
+        window = PromptBuilderWindow(profile, journals)
+    with timing.phase("显示窗口"):
+        window.show()
+    if profile is not None:
+
+        def first_paint() -> None:
+            profile.mark("首次绘制（自启动起累计）")
+            profile.report()
+            window.statusBar().showMessage(f"启动耗时 {profile.elapsed() * 1000:.0f} ms", 5000)
+
+        QTimer.singleShot(0, first_paint)
+    return app.exec()
@@ -0,0 +1,73 @@
+from typing import Callable, Dict, Sequence, Tuple
+
+from PySide6.QtGui import QColor, QFont, QSyntaxHighlighter, QTextBlock, QTextCharFormat
+from PySide6.QtWidgets import QPlainTextEdit
+
+from .core import utf16_length
+from .templates import Span
+
+SpanSource = Callable[[QTextBlock, str], Sequence[Span]]
+
+
+def marker_formats() -> Dict[str, QTextCharFormat]:
+    placeholder = QTextCharFormat()
+    placeholder.setForeground(QColor("#D29922"))
+    placeholder.setBackground(QColor(210, 153, 34, 40))
+    heading = QTextCharFormat()
+    heading.setForeground(QColor("#2F81F7"))
+    heading.setFontWeight(QFont.Bold)
+    return {"placeholder": placeholder, "heading": heading}
+
+
+class MarkerHighlighter(QSyntaxHighlighter):
+    """高亮占位符与模块标题，只处理视口附近的文本块。
+
+    Qt 只对内容发生变化的块调用 highlightBlock；视口外的块在这里直接标记为
+    待处理，滚动到可见范围时再单独重新高亮。
+    """
+
+    PENDING = 1
+    MARGIN = 40
+
+    def __init__(self, editor: QPlainTextEdit, source: SpanSource) -> None:
+        self.editor = editor
+        self.source = source
+        self.formats = marker_formats()
+        self._visible: Tuple[int, int] = (0, self._visible_lines())
+        super().__init__(editor.document())
+        editor.updateRequest.connect(self._on_update_request)
+
+    def _visible_lines(self) -> int:
+        spacing = max(self.editor.fontMetrics().lineSpacing(), 1)
+        return self.editor.viewport().height() // spacing + 1
+
+    def _on_update_request(self, rect, dy: int) -> None:
+        if self.document() is not self.editor.document():
+            # 编辑框当前显示的是另一份文档
+            return
+        first = self.editor.firstVisibleBlock().blockNumber()
+        visible = (first, first + self._visible_lines())
+        if visible == self._visible:
+            return
+        self._visible = visible
+        document = self.document()
+        block = document.findBlockByNumber(max(0, first - self.MARGIN))
+        last = visible[1] + self.MARGIN
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() == self.PENDING:
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def highlightBlock(self, text: str) -> None:
+        block = self.currentBlock()
+        number = block.blockNumber()
+        first, last = self._visible
+        if number < first - self.MARGIN or number > last + self.MARGIN:
+            self.setCurrentBlockState(self.PENDING)
+            return
+        self.setCurrentBlockState(0)
+        ascii_only = text.isascii()
+        for start, end, kind in self.source(block, text):
+            if not ascii_only:
+                start, end = utf16_length(text[:start]), utf16_length(text[:end])
+            self.setFormat(start, end - start, self.formats[kind])
@@ -0,0 +1,271 @@
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .core import ModuleCollection, ModuleItem
+from .packfile import LazyModuleItem, copy_module
+from .sections import common_prefix_length, common_suffix_length
+
+# 每个步骤除字符串外的固定开销估计（对象头、元组、索引等）
+STEP_OVERHEAD = 200
+MODULE_OVERHEAD = 120
+
+
+@dataclass(frozen=True)
+class ContentDelta:
+    """模块内容中的一处替换：从 start 起把 removed 换成 inserted。"""
+
+    key: str
+    start: int
+    removed: str
+    inserted: str
+
+    def apply(self, content: str) -> str:
+        return content[: self.start] + self.inserted + content[self.start + len(self.removed):]
+
+    def inverted(self) -> "ContentDelta":
+        return ContentDelta(self.key, self.start, self.inserted, self.removed)
+
+    @property
+    def size(self) -> int:
+        return sys.getsizeof(self.removed) + sys.getsizeof(self.inserted)
+
+
+@dataclass(frozen=True)
+class TitleChange:
+    key: str
+    old: str
+    new: str
+
+    def inverted(self) -> "TitleChange":
+        return TitleChange(self.key, self.new, self.old)
+
+    @property
+    def size(self) -> int:
+        return sys.getsizeof(self.old) + sys.getsizeof(self.new)
+
+
+@dataclass(frozen=True)
+class EnabledChange:
+    key: str
+    old: bool
+    new: bool
+
+    def inverted(self) -> "EnabledChange":
+        return EnabledChange(self.key, self.new, self.old)
+
+    @property
+    def size(self) -> int:
+        return 0
+
+
+@dataclass(frozen=True)
+class ModuleInsert:
+    """在 row 处插入模块。module 是记录时的副本，应用时须再复制一份。"""
+
+    row: int
+    module: ModuleItem
+
+    def inverted(self) -> "ModuleRemove":
+        return ModuleRemove(self.row, self.module)
+
+    @property
+    def size(self) -> int:
+        return module_size(self.module)
+
+
+@dataclass(frozen=True)
+class ModuleRemove:
+    row: int
+    module: ModuleItem
+
+    def inverted(self) -> ModuleInsert:
+        return ModuleInsert(self.row, self.module)
+
+    @property
+    def size(self) -> int:
+        return module_size(self.module)
+
+
+@dataclass(frozen=True)
+class CollectionReplace:
+    """整体替换模块集合（导入预设、恢复默认、键或顺序变化的预览回写）。"""
+
+    old: Tuple[ModuleItem, ...]
+    new: Tuple[ModuleItem, ...]
+
+    def inverted(self) -> "CollectionReplace":
+        return CollectionReplace(self.new, self.old)
+
+    @property
+    def size(self) -> int:
+        return sum(module_size(m) for m in self.old) + sum(module_size(m) for m in self.new)
+
+
+Change = Union[ContentDelta, TitleChange, EnabledChange, ModuleInsert, ModuleRemove, CollectionReplace]
+
+
+def module_size(module: ModuleItem) -> int:
+    # 未读取的预设包模块只保存位置，不占内容内存
+    if isinstance(module, LazyModuleItem) and not module.loaded:
+        return MODULE_OVERHEAD
+    return MODULE_OVERHEAD + sys.getsizeof(module.content) + sys.getsizeof(module.title)
+
+
+def content_delta(key: str, old: str, new: str) -> Optional[ContentDelta]:
+    """新旧内容之间唯一一处不同的片段；内容相同时返回 None。"""
+    if old == new:
+        return None
+    head = common_prefix_length(old, new)
+    tail = common_suffix_length(old[head:], new[head:])
+    return ContentDelta(key, head, old[head: len(old) - tail], new[head: len(new) - tail])
+
+
+def replace_changes(old: ModuleCollection, new: ModuleCollection) -> List[Change]:
+    """把整体替换拆成逐个模块的差异；键或顺序变化时只能记录整体替换。
+
+    预览回写时常见的情形是键序不变、只有个别模块的内容变化，此时历史里只保存
+    这些模块的改动片段。模块内容按摘要比较，未变化的模块不做逐字比较。
+    """
+    if old.keys() != new.keys():
+        return [CollectionReplace(tuple(copy_module(m) for m in old), tuple(copy_module(m) for m in new))]
+    changes: List[Change] = []
+    for before, after in zip(old, new):
+        if before == after:
+            continue
+        if before.title != after.title:
+            changes.append(TitleChange(before.key, before.title, after.title))
+        if before.enabled != after.enabled:
+            changes.append(EnabledChange(before.key, before.enabled, after.enabled))
+        delta = content_delta(before.key, before.content, after.content)
+        if delta is not None:
+            changes.append(delta)
+    return changes
+
+
+class History:
+    """模块集合的撤销/重做历史。
+
+    每一步保存若干项改动：内容只记改动片段，整体替换时保存模块副本，副本与
+    当时的模块共用内容字符串。历史占用超过 limit_bytes 时从最早的步骤开始丢弃，
+    长时间编辑后内存占用保持在上限之内。连续输入在 merge_interval 秒内、位置
+    相接的内容改动合并为一步，遇到换行另起一步。
+    """
+
+    def __init__(self, limit_bytes: int = 32 << 20, merge_interval: float = 1.0) -> None:
+        self.limit_bytes = limit_bytes
+        self.merge_interval = merge_interval
+        self._undo: Deque[Tuple[Tuple[Change, ...], int]] = deque()
+        self._redo: List[Tuple[Tuple[Change, ...], int]] = []
+        self._bytes = 0
+        self._last_edit = 0.0
+        self._mergeable = False
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    @property
+    def memory(self) -> int:
+        """历史（含重做记录）占用内存的估计值，单位字节。"""
+        return self._bytes
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+        self._mergeable = False
+
+    def record(self, changes: Iterable[Change]) -> None:
+        """记录一个步骤，并清空重做记录。"""
+        step = tuple(changes)
+        if not step:
+            return
+        self._clear_redo()
+        self._push(step)
+        self._mergeable = False
+
+    def record_edit(self, key: str, old: str, new: str) -> None:
+        """记录模块内容从 old 变为 new，与上一步连续输入的改动合并。"""
+        delta = content_delta(key, old, new)
+        if delta is None:
+            return
+        now = time.monotonic()
+        if self._mergeable and self._undo and now - self._last_edit < self.merge_interval:
+            (previous,), size = self._undo[-1]
+            merged = merge_deltas(previous, delta, old)
+            if merged is not None:
+                self._undo.pop()
+                self._bytes -= size
+                self._push((merged,))
+                self._mergeable = "\n" not in delta.inserted
+                self._last_edit = now
+                return
+        self.record((delta,))
+        # 换行后另起一步，一次撤销不会退回整段连续输入
+        self._mergeable = "\n" not in delta.inserted
+        self._last_edit = now
+
+    def modules(self) -> Iterator[ModuleItem]:
+        """历史（含重做记录）中保存的模块副本。"""
+        for step, _ in list(self._undo) + self._redo:
+            for change in step:
+                if isinstance(change, CollectionReplace):
+                    yield from change.old
+                    yield from change.new
+                elif isinstance(change, (ModuleInsert, ModuleRemove)):
+                    yield change.module
+
+    def undo(self) -> Tuple[Change, ...]:
+        """撤销一步，返回需要依次应用的改动；没有可撤销的步骤时返回空元组。"""
+        if not self._undo:
+            return ()
+        step, size = self._undo.pop()
+        self._redo.append((step, size))
+        self._mergeable = False
+        return tuple(change.inverted() for change in reversed(step))
+
+    def redo(self) -> Tuple[Change, ...]:
+        if not self._redo:
+            return ()
+        step, size = self._redo.pop()
+        self._undo.append((step, size))
+        self._mergeable = False
+        return step
+
+    def _push(self, step: Tuple[Change, ...]) -> None:
+        size = STEP_OVERHEAD + sum(change.size for change in step)
+        self._undo.append((step, size))
+        self._bytes += size
+        while self._bytes > self.limit_bytes and self._undo:
+            _, dropped = self._undo.popleft()
+            self._bytes -= dropped
+
+    def _clear_redo(self) -> None:
+        self._bytes -= sum(size for _, size in self._redo)
+        self._redo.clear()
+
+
+def merge_deltas(first: ContentDelta, second: ContentDelta, middle: str) -> Optional[ContentDelta]:
+    """把先后两处相接的改动合并为一处；middle 是两次改动之间的内容。
+
+    两处不相接（光标跳到别处）时返回 None，另起一步。
+    """
+    if first.key != second.key:
+        return None
+    first_end = first.start + len(first.inserted)
+    second_end = second.start + len(second.removed)
+    if second.start > first_end or second_end < first.start:
+        return None
+    start = min(first.start, second.start)
+    end = max(first_end, second_end)
+    removed = middle[start: first.start] + first.removed + middle[first_end: end]
+    inserted = middle[start: second.start] + second.inserted + middle[second_end: end]
+    return ContentDelta(first.key, start, removed, inserted)
@@ -0,0 +1,185 @@
+import re
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from .core import ModuleCollection, ModuleItem
+
+# 模块正文中的 {{include:B}} 在组合时替换为模块 B 解析后的正文
+INCLUDE_RE = re.compile(r"\{\{include:\s*([^{}\n]+?)\s*\}\}")
+INCLUDE_MARK = "{{include:"
+
+
+def include_keys(text: str) -> Tuple[str, ...]:
+    if INCLUDE_MARK not in text:
+        return ()
+    return tuple(dict.fromkeys(match.group(1) for match in INCLUDE_RE.finditer(text)))
+
+
+class IncludeResolver:
+    """按依赖图展开模块间的 include，并缓存展开结果。
+
+    记录每个模块直接引用的键及反向的被引用关系。模块内容变化后只需让它和
+    所有直接、间接引用它的模块失效，其余模块的展开结果继续复用。不含 include
+    的模块不缓存，直接返回原正文。
+
+    被引用的模块即使未启用也会展开，因此可以把公共片段放在未启用的模块里。
+    引用不存在的模块或形成循环时，该处的指令原样保留，由检查规则报告。
+    """
+
+    def __init__(self, modules: ModuleCollection) -> None:
+        self.modules = modules
+        self._resolved: Dict[str, str] = {}
+        self._includes: Dict[str, Tuple[str, ...]] = {}
+        self._included_by: Dict[str, Set[str]] = {}
+        # 解析时模块的副本（与原模块共用正文），sync() 据此判断内容是否变化
+        self._seen: Dict[str, ModuleItem] = {}
+        self.expansions = 0
+
+    # ---- 依赖图 ----
+
+    def _parse(self, key: str, module: ModuleItem) -> Tuple[str, ...]:
+        keys = self._includes.get(key)
+        if keys is None:
+            keys = include_keys(module.content)
+            self._includes[key] = keys
+            self._seen[key] = module.copy()
+            for target in keys:
+                self._included_by.setdefault(target, set()).add(key)
+        return keys
+
+    def parsed(self, key: str) -> bool:
+        """key 的引用关系是否已经解析过（解析过的模块再展开不会读取正文）。"""
+        return key in self._includes
+
+    def dependents(self, key: str) -> Set[str]:
+        """直接或间接引用 key 的全部模块。"""
+        found: Set[str] = set()
+        stack = [key]
+        while stack:
+            for source in self._included_by.get(stack.pop(), ()):
+                if source not in found:
+                    found.add(source)
+                    stack.append(source)
+        return found
+
+    def invalidate(self, key: str) -> Set[str]:
+        """key 的内容已变化：丢弃它的依赖记录，并让它与所有引用它的模块失效。返回失效的键。"""
+        for target in self._includes.pop(key, ()):
+            sources = self._included_by.get(target)
+            if sources is not None:
+                sources.discard(key)
+                if not sources:
+                    del self._included_by[target]
+        self._seen.pop(key, None)
+        stale = self.dependents(key)
+        stale.add(key)
+        for name in stale:
+            self._resolved.pop(name, None)
+        return stale
+
+    def sync(self, modules: Optional[ModuleCollection] = None) -> Set[str]:
+        """与当前模块对照，让内容变化、删除或新出现的模块失效。
+
+        未修改的模块与记录共用正文，比较只是一次身份判断。
+        """
+        if modules is not None:
+            self.modules = modules
+        stale: Set[str] = set()
+        for key, seen in list(self._seen.items()):
+            current = self.modules.get(key)
+            if current is None or not seen.same_content(current):
+                stale |= self.invalidate(key)
+        # 之前引用了不存在的模块，现在该模块出现了
+        for key in [k for k in self._included_by if k not in self._seen and k in self.modules]:
+            stale |= self.invalidate(key)
+        return stale
+
+    # ---- 展开 ----
+
+    def content(self, module: ModuleItem) -> str:
+        """模块展开 include 后的正文。调用前应先 sync()。"""
+        if not self._parse(module.key, module):
+            return module.content
+        text = self._resolved.get(module.key)
+        if text is None:
+            text = self._resolve(module.key)
+        return text
+
+    def _done(self, key: str) -> bool:
+        return key in self._resolved or not self._parse(key, self.modules.get(key))
+
+    def _resolve(self, root: str) -> str:
+        # 显式栈的深度优先遍历，引用链再长也不会触发递归深度限制
+        path = [root]
+        on_path = {root}
+        while path:
+            key = path[-1]
+            pending = None
+            for target in self._includes[key]:
+                if target in self.modules and target not in on_path and not self._done(target):
+                    pending = target
+                    break
+            if pending is not None:
+                path.append(pending)
+                on_path.add(pending)
+                continue
+            self._resolved[key] = self._expand(key, on_path)
+            path.pop()
+            on_path.discard(key)
+        return self._resolved[root]
+
+    def _expand(self, key: str, on_path: Set[str]) -> str:
+        self.expansions += 1
+
+        def replace(match: "re.Match[str]") -> str:
+            target = match.group(1)
+            module = self.modules.get(target)
+            # 引用不存在的模块，或引用了仍在展开路径上的模块（循环）
+            if module is None or target in on_path:
+                return match.group(0)
+            return self.content(module).strip()
+
+        return INCLUDE_RE.sub(replace, self.modules.get(key).content)
+
+    def expand_text(self, text: str) -> str:
+        """展开任意文本（如预览全文）中的 include。"""
+        if INCLUDE_MARK not in text:
+            return text
+
+        def replace(match: "re.Match[str]") -> str:
+            module = self.modules.get(match.group(1))
+            return self.content(module).strip() if module is not None else match.group(0)
+
+        return INCLUDE_RE.sub(replace, text)
+
+    def resolved_modules(self, modules: Optional[Iterable[ModuleItem]] = None) -> Iterator[ModuleItem]:
+        """逐个产出展开后的模块：已启用且含 include 的模块换成带展开正文的副本，其余原样返回。"""
+        for module in self.modules if modules is None else modules:
+            if not module.enabled or not self._parse(module.key, module):
+                yield module
+                continue
+            item = module.copy()
+            item.content = self.content(module)
+            yield item
+
+
+def resolve_includes(
+    modules: Iterable[ModuleItem], resolver: Optional[IncludeResolver] = None
+) -> Iterator[ModuleItem]:
+    """展开 include 后的模块序列。
+
+    不传 resolver 时只在遇到含 include 的模块时才临时建立一个，不含引用的
+    预设只多一次子串查找。
+    """
+    if resolver is not None:
+        resolver.sync()
+        yield from resolver.resolved_modules(modules)
+        return
+    if not isinstance(modules, ModuleCollection):
+        modules = ModuleCollection(modules)
+    for module in modules:
+        if not module.enabled or INCLUDE_MARK not in module.content:
+            yield module
+            continue
+        if resolver is None:
+            resolver = IncludeResolver(modules)
+        yield from resolver.resolved_modules((module,))
@@ -0,0 +1,132 @@
+import threading
+from dataclasses import replace
+from typing import List, Optional, Sequence
+
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, Signal
+from PySide6.QtWidgets import QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QVBoxLayout, QWidget
+
+from .validation import RULES, Issue, ValidationCancelled, ValidationSnapshot, run_rules
+
+
+class ValidationSignals(QObject):
+    # 参数中的 int 为检查批次号，界面据此丢弃过期批次的结果
+    issues = Signal(int, str, list)
+    finished = Signal(int, bool)
+
+
+class ValidationTask(QRunnable):
+    def __init__(self, generation: int, snapshot: ValidationSnapshot, names: Sequence[str]) -> None:
+        super().__init__()
+        self.generation = generation
+        self.snapshot = snapshot
+        self.names = list(names)
+        self.signals = ValidationSignals()
+
+    def run(self) -> None:
+        try:
+            for name, issues in run_rules(self.snapshot, self.names):
+                self.signals.issues.emit(self.generation, name, issues)
+        except ValidationCancelled:
+            self.signals.finished.emit(self.generation, False)
+        else:
+            self.signals.finished.emit(self.generation, True)
+
+
+class ValidationRunner(QObject):
+    """在后台线程执行检查；新的检查开始时取消尚未完成的旧检查。"""
+
+    issuesFound = Signal(str, list)
+    started = Signal()
+    finished = Signal()
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self._cancel = threading.Event()
+        self._running = False
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self, snapshot: ValidationSnapshot, names: Sequence[str]) -> None:
+        self.cancel()
+        self._cancel = threading.Event()
+        self.generation += 1
+        self._running = True
+        snapshot = replace(snapshot, cancelled=self._cancel.is_set)
+        task = ValidationTask(self.generation, snapshot, names)
+        task.signals.issues.connect(self._on_issues, Qt.QueuedConnection)
+        task.signals.finished.connect(self._on_finished, Qt.QueuedConnection)
+        self.started.emit()
+        self.pool.start(task)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self._running:
+            self._running = False
+            self.generation += 1
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+    def _on_issues(self, generation: int, name: str, issues: List[Issue]) -> None:
+        if generation == self.generation:
+            self.issuesFound.emit(name, issues)
+
+    def _on_finished(self, generation: int, completed: bool) -> None:
+        if generation == self.generation and completed:
+            self._running = False
+            self.finished.emit()
+
+
+class IssuesPanel(QWidget):
+    """非模态的检查结果列表，结果按规则逐批追加。双击条目跳转到对应模块。"""
+
+    moduleActivated = Signal(str)
+
+    # 列表最多显示的条目数，超出部分只计入总数
+    MAX_ITEMS = 500
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        header = QHBoxLayout()
+        header.addWidget(QLabel("检查结果"))
+        header.addStretch(1)
+        self.summary_label = QLabel("尚未检查")
+        header.addWidget(self.summary_label)
+        layout.addLayout(header)
+        self.list = QListWidget()
+        self.list.setMaximumHeight(140)
+        layout.addWidget(self.list)
+        self.list.itemActivated.connect(self._on_item_activated)
+        self.count = 0
+
+    def begin(self) -> None:
+        self.list.clear()
+        self.count = 0
+        self.summary_label.setText("检查中…")
+
+    def add_issues(self, rule: str, issues: List[Issue]) -> None:
+        label = RULES[rule].label if rule in RULES else rule
+        for issue in issues[: max(0, self.MAX_ITEMS - self.list.count())]:
+            item = QListWidgetItem(issue.message)
+            item.setToolTip(label)
+            item.setData(Qt.UserRole, issue.key)
+            self.list.addItem(item)
+        self.count += len(issues)
+        self.summary_label.setText(f"检查中… 已发现 {self.count} 项")
+
+    def finish(self) -> None:
+        if self.count:
+            self.summary_label.setText(f"有 {self.count} 项待处理")
+        else:
+            self.summary_label.setText("检查通过，结构与内容均正常。")
+
+    def _on_item_activated(self, item: QListWidgetItem) -> None:
+        key = item.data(Qt.UserRole)
+        if key:
+            self.moduleActivated.emit(key)
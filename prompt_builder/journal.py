@@ -0,0 +1,334 @@
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .core import ModuleCollection, ModuleItem
+from .packfile import PresetPack, copy_module, module_from_record, module_record
+
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.jsonl"
+
+Op = Dict[str, Any]
+
+
+def apply_op(modules: ModuleCollection, op: Op, packs: Dict[str, PresetPack]) -> ModuleCollection:
+    """把一条日志操作应用到模块集合上，返回操作后的集合（import 会换成新集合）。"""
+    kind = op["op"]
+    if kind == "import":
+        imported = ModuleCollection(module_from_record(record, packs) for record in op["modules"])
+        imported.profiles = op.get("profiles", {})
+        return imported
+    if kind == "profiles":
+        modules.profiles = op["profiles"]
+        return modules
+    if kind == "add":
+        modules.insert(op["row"], module_from_record(op["module"], packs))
+        return modules
+    if kind == "delete":
+        modules.remove(op["key"])
+        return modules
+    module = modules.get(op["key"])
+    if module is None:
+        raise ValueError(f"日志引用了不存在的模块：{op['key']}")
+    if kind == "edit":
+        module.content = op["content"]
+    elif kind == "rename":
+        module.title = op["title"]
+    elif kind == "toggle":
+        modules.set_enabled(op["key"], op["enabled"])
+    else:
+        raise ValueError(f"未知的日志操作：{kind}")
+    return modules
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Journal:
+    """模块级操作的追加式日志，用于崩溃后恢复上次会话。
+
+    界面线程调用 edit()/rename() 等方法只是把操作放进队列；后台线程每隔
+    flush_interval 秒批量写入并 fsync，同一模块连续的多次编辑只保留最后一次。
+    后台线程同时维护一份按日志重放的模块副本，累计 compact_every 条操作后
+    据此写出快照并清空日志（日志超过 compact_bytes 时也会提前压缩），
+    因此恢复时间取决于快照大小，加上最多 compact_every 条操作。
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        compact_every: int = 2000,
+        compact_bytes: int = 8 << 20,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.directory = Path(directory)
+        self.compact_every = compact_every
+        self.compact_bytes = compact_bytes
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Op]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._packs: Dict[str, PresetPack] = {}
+        self._state = ModuleCollection()
+        self._seq = 0
+        self._pending_ops = 0
+        self._pending_bytes = 0
+        self._file = None
+        self.error: Optional[str] = None
+        # 随快照保存的附加信息（如工作区中文档的名称与路径），在下次压缩时写出
+        self.meta: Dict[str, Any] = {}
+
+    # ---- 恢复 ----
+
+    def restore(self) -> Optional[ModuleCollection]:
+        """读取快照并重放其后的日志，返回恢复的模块；没有可恢复的会话时返回 None。
+
+        日志末尾因崩溃而写了一半的行会被忽略。
+        """
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        if not snapshot_path.exists():
+            return None
+        payload = json.loads(snapshot_path.read_text(encoding="utf-8"))
+        seq = payload["seq"]
+        self.meta = payload.get("meta", {})
+        modules = ModuleCollection(module_from_record(r, self._packs) for r in payload["modules"])
+        modules.profiles = payload.get("profiles", {})
+        ops = 0
+        journal_path = self.directory / JOURNAL_FILE
+        if journal_path.exists():
+            with journal_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break
+                    # 快照写出后、日志清空前崩溃时，日志里会留有快照已包含的操作
+                    if op["seq"] <= seq:
+                        continue
+                    modules = apply_op(modules, op, self._packs)
+                    seq = op["seq"]
+                    ops += 1
+        self._seq = seq
+        self._pending_ops = ops
+        return modules if len(modules) else None
+
+    # ---- 记录 ----
+
+    def start(self, modules: Iterable[ModuleItem]) -> None:
+        """以当前模块为起点开始记录。后台线程先把它们写成快照，再处理后续操作。"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._state = ModuleCollection(copy_module(m) for m in modules)
+        self._state.profiles = _copy_profiles(getattr(modules, "profiles", {}))
+        self._file = open(self.directory / JOURNAL_FILE, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, op: Op) -> None:
+        if self._thread is not None:
+            self._queue.put(op)
+
+    def edit(self, key: str, content: str) -> None:
+        self.record({"op": "edit", "key": key, "content": content})
+
+    def rename(self, key: str, title: str) -> None:
+        self.record({"op": "rename", "key": key, "title": title})
+
+    def toggle(self, key: str, enabled: bool) -> None:
+        self.record({"op": "toggle", "key": key, "enabled": enabled})
+
+    def add(self, row: int, module: ModuleItem) -> None:
+        self.record({"op": "add", "row": row, "module": copy_module(module)})
+
+    def delete(self, key: str) -> None:
+        self.record({"op": "delete", "key": key})
+
+    def import_modules(self, modules: Iterable[ModuleItem]) -> None:
+        profiles = _copy_profiles(getattr(modules, "profiles", {}))
+        self.record({"op": "import", "modules": [copy_module(m) for m in modules], "profiles": profiles})
+
+    def set_profiles(self, profiles: Dict[str, List[str]]) -> None:
+        self.record({"op": "profiles", "profiles": _copy_profiles(profiles)})
+
+    def close(self) -> None:
+        """写完队列中的操作并压缩为快照。"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._file is not None:
+            self._compact()
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """停止记录并删除快照与日志，下次启动不再恢复。"""
+        self.close()
+        for name in (SNAPSHOT_FILE, JOURNAL_FILE):
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+
+    # ---- 后台线程 ----
+
+    def _run(self) -> None:
+        try:
+            # 同时去掉上次崩溃时日志末尾可能残留的半行
+            self._compact()
+        except OSError as exc:
+            self.error = str(exc)
+        stop = False
+        while not stop:
+            batch: List[Op] = []
+            op = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while op is not None:
+                batch.append(op)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            stop = op is None
+            try:
+                self._write(_coalesce(batch))
+                if self._pending_ops >= self.compact_every or self._pending_bytes >= self.compact_bytes:
+                    self._compact()
+            except (OSError, ValueError, KeyError) as exc:
+                # 写日志失败不影响编辑，记下原因供界面提示
+                self.error = str(exc)
+
+    def _write(self, batch: List[Op]) -> None:
+        if not batch:
+            return
+        lines = []
+        for op in batch:
+            self._seq += 1
+            record = dict(op, seq=self._seq)
+            if op["op"] == "add":
+                record["module"] = module_record(op["module"])
+            elif op["op"] == "import":
+                record["modules"] = [module_record(m) for m in op["modules"]]
+            # 副本由记录重建，不与界面线程共用模块对象
+            self._state = apply_op(self._state, record, self._packs)
+            lines.append(json.dumps(record, ensure_ascii=False))
+        data = "\n".join(lines) + "\n"
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending_ops += len(batch)
+        self._pending_bytes += len(data)
+
+    def _compact(self) -> None:
+        payload = {
+            "seq": self._seq,
+            "meta": self.meta,
+            "profiles": self._state.profiles,
+            "modules": [module_record(m) for m in self._state],
+        }
+        _write_atomic(self.directory / SNAPSHOT_FILE, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        # 快照已包含全部操作，之后再清空日志；两步之间崩溃时按序号跳过重复操作
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending_ops = 0
+        self._pending_bytes = 0
+
+
+class JournalSet:
+    """工作区中各文档的日志，每个文档占 root 下的一个子目录 doc-<n>。
+
+    旧版本直接写在 root 下的会话当作第一个文档恢复，之后照常使用该目录。
+    """
+
+    def __init__(self, root: Union[str, Path], **options: Any) -> None:
+        self.root = Path(root)
+        self.options = options
+        self._used: Dict[Path, Journal] = {}
+
+    def _directories(self) -> List[Path]:
+        numbered = []
+        if self.root.is_dir():
+            for path in self.root.glob("doc-*"):
+                suffix = path.name[4:]
+                if path.is_dir() and suffix.isdigit():
+                    numbered.append((int(suffix), path))
+        return [self.root] + [path for _, path in sorted(numbered)]
+
+    def restore(self) -> Tuple[List[Tuple[Journal, ModuleCollection]], List[str]]:
+        """恢复全部文档的会话，返回 (日志, 模块) 列表与无法恢复的原因。
+
+        无法恢复的会话会被删除，不再反复提示。
+        """
+        restored: List[Tuple[Journal, ModuleCollection]] = []
+        errors: List[str] = []
+        for directory in self._directories():
+            journal = Journal(directory, **self.options)
+            try:
+                modules = journal.restore()
+            except (OSError, ValueError, KeyError) as exc:
+                errors.append(str(exc))
+                journal.discard()
+                continue
+            if modules is None:
+                journal.discard()
+                continue
+            self._used[directory] = journal
+            restored.append((journal, modules))
+        return restored, errors
+
+    def create(self) -> Journal:
+        """为新文档分配一个空闲目录。"""
+        directories = self._directories()
+        for directory in directories:
+            if directory not in self._used and not (directory / SNAPSHOT_FILE).exists():
+                break
+        else:
+            numbers = [int(d.name[4:]) for d in directories if d != self.root]
+            directory = self.root / f"doc-{max(numbers, default=0) + 1}"
+        journal = self._used[directory] = Journal(directory, **self.options)
+        return journal
+
+    def discard(self, journal: Journal) -> None:
+        """关闭文档时删除其会话。"""
+        journal.discard()
+        self._used.pop(journal.directory, None)
+        if journal.directory != self.root:
+            try:
+                journal.directory.rmdir()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        for journal in self._used.values():
+            journal.close()
+
+
+def _copy_profiles(profiles: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    # 方案在界面线程中会继续被修改，交给后台线程的是副本
+    return {name: list(keys) for name, keys in profiles.items()}
+
+
+def _coalesce(batch: List[Op]) -> List[Op]:
+    # 同一模块相邻的多次编辑只保留最后一次
+    result: List[Op] = []
+    for op in batch:
+        if result and op["op"] == "edit" and result[-1]["op"] == "edit" and result[-1]["key"] == op["key"]:
+            result[-1] = op
+        else:
+            result.append(op)
+    return result
+
@@ -0,0 +1,269 @@
+import hashlib
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .core import ModuleItem, load_preset
+from .packfile import PACK_SUFFIX
+
+INDEX_FILENAME = ".prompt-library.sqlite3"
+PRESET_SUFFIXES = (".json", PACK_SUFFIX)
+
+# 每处理这么多个文件提交一次事务
+COMMIT_INTERVAL = 200
+
+# unicode61 分词器把连续汉字当作一个词，索引与查询时在汉字之间插入空格，
+# 汉字按单字成词、以短语匹配，任意长度的中文片段都能检索
+_CJK_RE = re.compile(r"([\u3400-\u4dbf\u4e00-\u9fff])")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    enabled INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modules_file ON modules(file_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS module_fts USING fts5(
+    key, title, content, content='modules', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS modules_ai AFTER INSERT ON modules BEGIN
+    INSERT INTO module_fts (rowid, key, title, content)
+    VALUES (new.id, new.key, index_text(new.title), index_text(new.content));
+END;
+CREATE TRIGGER IF NOT EXISTS modules_ad AFTER DELETE ON modules BEGIN
+    INSERT INTO module_fts (module_fts, rowid, key, title, content)
+    VALUES ('delete', old.id, old.key, index_text(old.title), index_text(old.content));
+END;
+CREATE TRIGGER IF NOT EXISTS modules_au AFTER UPDATE ON modules BEGIN
+    INSERT INTO module_fts (module_fts, rowid, key, title, content)
+    VALUES ('delete', old.id, old.key, index_text(old.title), index_text(old.content));
+    INSERT INTO module_fts (rowid, key, title, content)
+    VALUES (new.id, new.key, index_text(new.title), index_text(new.content));
+END;
+"""
+
+# 表结构变化时加一；旧版本的索引文件直接丢弃重建
+SCHEMA_VERSION = 2
+
+
+def index_text(text: str) -> str:
+    return _CJK_RE.sub(r" \1 ", text)
+
+
+def fts_query(query: str) -> str:
+    """把用户输入转成 FTS5 查询：空白分隔的每一段作为一个短语，各段同时命中。"""
+    phrases = []
+    for term in query.split():
+        tokens = index_text(term).split()
+        if tokens:
+            phrases.append('"' + " ".join(tokens).replace('"', '""') + '"')
+    return " ".join(phrases)
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class IndexStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class LibraryHit:
+    module_id: int
+    path: str
+    key: str
+    title: str
+    snippet: str
+
+
+class PresetLibrary:
+    """一个目录下全部预设的全文索引，保存在该目录的 SQLite 文件中。
+
+    update() 按修改时间与大小判断文件是否变化，变化的文件再比较内容哈希，
+    只重建真正改动过的预设。每个线程应使用各自的实例。
+
+    全文索引以 modules 表为外部内容，不另存正文，由触发器保持同步。触发器
+    调用连接上注册的 index_text()，因此只应通过本类修改数据库。
+    """
+
+    def __init__(self, root: Union[str, Path], db_path: Optional[Union[str, Path]] = None) -> None:
+        self.root = Path(root)
+        self.db_path = Path(db_path) if db_path else self.root / INDEX_FILENAME
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.create_function("index_text", 1, index_text, deterministic=True)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS module_fts; DROP TABLE IF EXISTS modules; DROP TABLE IF EXISTS files;"
+            )
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def preset_files(self) -> Iterator[Path]:
+        for path in sorted(self.root.rglob("*")):
+            if path.suffix in PRESET_SUFFIXES and path.is_file():
+                yield path
+
+    def update(
+        self,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> IndexStats:
+        stats = IndexStats()
+        known: Dict[str, Tuple[int, int, int, str]] = {
+            path: (file_id, mtime_ns, size, digest)
+            for file_id, path, mtime_ns, size, digest in self.conn.execute(
+                "SELECT id, path, mtime_ns, size, digest FROM files"
+            )
+        }
+        files = list(self.preset_files())
+        seen = set()
+        try:
+            for done, path in enumerate(files, 1):
+                if cancelled is not None and cancelled():
+                    break
+                rel = path.relative_to(self.root).as_posix()
+                seen.add(rel)
+                self._update_file(path, rel, known.get(rel), stats)
+                if done % COMMIT_INTERVAL == 0:
+                    self.conn.commit()
+                if progress is not None:
+                    progress(done, len(files))
+            else:
+                for rel, (file_id, *_rest) in known.items():
+                    if rel not in seen:
+                        self._remove_file(file_id)
+                        stats.removed += 1
+        finally:
+            self.conn.commit()
+        return stats
+
+    def _update_file(
+        self, path: Path, rel: str, known: Optional[Tuple[int, int, int, str]], stats: IndexStats
+    ) -> None:
+        stat = path.stat()
+        if known is not None and known[1:3] == (stat.st_mtime_ns, stat.st_size):
+            stats.unchanged += 1
+            return
+        digest = file_digest(path)
+        if known is not None and known[3] == digest:
+            # 仅修改时间变化（如被复制、touch 过），内容未变
+            self.conn.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                (stat.st_mtime_ns, stat.st_size, known[0]),
+            )
+            stats.unchanged += 1
+            return
+
+        error = None
+        try:
+            modules = list(load_preset(str(path)))
+        except Exception as exc:
+            # 任何一个文件读不出来都只记在 files.error 中，不中断整次更新
+            modules = []
+            error = str(exc) or type(exc).__name__
+            stats.failed.append((rel, error))
+
+        if known is not None:
+            self._remove_modules(known[0])
+            file_id = known[0]
+            self.conn.execute(
+                "UPDATE files SET mtime_ns = ?, size = ?, digest = ?, error = ? WHERE id = ?",
+                (stat.st_mtime_ns, stat.st_size, digest, error, file_id),
+            )
+            stats.updated += 1
+        else:
+            file_id = self.conn.execute(
+                "INSERT INTO files (path, mtime_ns, size, digest, error) VALUES (?, ?, ?, ?, ?)",
+                (rel, stat.st_mtime_ns, stat.st_size, digest, error),
+            ).lastrowid
+            stats.added += 1
+
+        self.conn.executemany(
+            "INSERT INTO modules (file_id, key, title, content, enabled) VALUES (?, ?, ?, ?, ?)",
+            ((file_id, m.key, m.title, m.content, int(m.enabled)) for m in modules),
+        )
+
+    def _remove_modules(self, file_id: int) -> None:
+        self.conn.execute("DELETE FROM modules WHERE file_id = ?", (file_id,))
+
+    def _remove_file(self, file_id: int) -> None:
+        self._remove_modules(file_id)
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def search(self, query: str, limit: int = 50) -> List[LibraryHit]:
+        """按相关度返回命中的模块；标题命中的权重高于正文。"""
+        expression = fts_query(query)
+        if not expression:
+            return []
+        rows = self.conn.execute(
+            """
+            SELECT m.id, f.path, m.key, m.title, m.content
+            FROM (
+                SELECT rowid, bm25(module_fts, 5.0, 3.0, 1.0) AS score
+                FROM module_fts
+                WHERE module_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ) AS hit
+            JOIN modules AS m ON m.id = hit.rowid
+            JOIN files AS f ON f.id = m.file_id
+            ORDER BY hit.score
+            """,
+            (expression, limit),
+        ).fetchall()
+        terms = query.split()
+        return [
+            LibraryHit(module_id, path, key, title, make_snippet(content, terms))
+            for module_id, path, key, title, content in rows
+        ]
+
+    def module(self, module_id: int) -> Optional[ModuleItem]:
+        row = self.conn.execute(
+            "SELECT key, title, content, enabled FROM modules WHERE id = ?", (module_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        key, title, content, enabled = row
+        return ModuleItem(key, title, content, bool(enabled))
+
+    def file_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+def make_snippet(content: str, terms: List[str], width: int = 40) -> str:
+    lowered = content.lower()
+    position = -1
+    for term in terms:
+        position = lowered.find(term.lower())
+        if position >= 0:
+            break
+    start = max(0, position - width // 2) if position >= 0 else 0
+    snippet = content[start:start + width].replace("\n", " ")
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(content) else "")
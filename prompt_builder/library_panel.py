@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, Signal
+from PySide6.QtWidgets import QLabel, QListWidget, QListWidgetItem, QVBoxLayout, QWidget
+
+from .core import ModuleItem
+from .library import IndexStats, LibraryHit, PresetLibrary
+
+
+class IndexSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class IndexTask(QRunnable):
+    """在后台线程中增量更新预设库索引，使用独立的数据库连接。"""
+
+    def __init__(self, root: Path, cancel: threading.Event) -> None:
+        super().__init__()
+        self.root = root
+        self.cancel = cancel
+        self.signals = IndexSignals()
+
+    def run(self) -> None:
+        try:
+            library = PresetLibrary(self.root)
+            try:
+                stats = library.update(self._progress, self.cancel.is_set)
+            finally:
+                library.close()
+        except Exception as exc:  # 后台线程的异常只能通过信号交给界面
+            self.signals.failed.emit(str(exc))
+        else:
+            self.signals.finished.emit(stats)
+
+    def _progress(self, done: int, total: int) -> None:
+        if done % 50 == 0 or done == total:
+            self.signals.progress.emit(done, total)
+
+
+class LibrarySearchPanel(QWidget):
+    """模块中心的全文搜索模式：在预设库中检索模块，点击命中项导入。"""
+
+    moduleChosen = Signal(object, str)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.status_label = QLabel("尚未选择预设库目录")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+        self.results = QListWidget()
+        layout.addWidget(self.results)
+        self.results.itemClicked.connect(self._on_item_clicked)
+
+        self.library: Optional[PresetLibrary] = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._cancel = threading.Event()
+        self._query = ""
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self._run_search)
+
+    def set_root(self, root: Path) -> None:
+        self.close_library()
+        try:
+            self.library = PresetLibrary(root)
+        except sqlite3.Error as exc:
+            # 目录只读或索引文件损坏时无法建立索引，只提示，不影响其余功能
+            self.status_label.setText(f"无法打开预设库索引（{root}）：{exc}")
+            return
+        self.refresh_index()
+
+    def refresh_index(self) -> None:
+        if self.library is None:
+            return
+        self._cancel.set()
+        self._cancel = threading.Event()
+        task = IndexTask(self.library.root, self._cancel)
+        task.signals.progress.connect(self._on_progress, Qt.QueuedConnection)
+        task.signals.finished.connect(self._on_indexed, Qt.QueuedConnection)
+        task.signals.failed.connect(self._on_index_failed, Qt.QueuedConnection)
+        self.status_label.setText(f"正在更新索引：{self.library.root}")
+        self.pool.start(task)
+
+    def close_library(self) -> None:
+        self._cancel.set()
+        self.pool.waitForDone()
+        if self.library is not None:
+            self.library.close()
+            self.library = None
+
+    def search(self, text: str) -> None:
+        self._query = text.strip()
+        self.search_timer.start()
+
+    def _run_search(self) -> None:
+        self.results.clear()
+        if self.library is None or not self._query:
+            return
+        hits = self.library.search(self._query)
+        for hit in hits:
+            self._add_hit(hit)
+        self.status_label.setText(f"找到 {len(hits)} 个模块" if hits else "没有匹配的模块")
+
+    def _add_hit(self, hit: LibraryHit) -> None:
+        item = QListWidgetItem(f"[{hit.key}] {hit.title}  —  {hit.path}\n{hit.snippet}")
+        item.setToolTip(hit.path)
+        item.setData(Qt.UserRole, hit.module_id)
+        self.results.addItem(item)
+
+    def _on_item_clicked(self, item: QListWidgetItem) -> None:
+        if self.library is None:
+            return
+        module: Optional[ModuleItem] = self.library.module(item.data(Qt.UserRole))
+        if module is not None:
+            self.moduleChosen.emit(module, item.toolTip())
+
+    def _on_progress(self, done: int, total: int) -> None:
+        self.status_label.setText(f"正在更新索引：{done}/{total}")
+
+    def _on_indexed(self, stats: IndexStats) -> None:
+        text = f"索引已更新：新增 {stats.added}，更新 {stats.updated}，移除 {stats.removed}"
+        if stats.failed:
+            failed: List[str] = [path for path, _ in stats.failed[:3]]
+            more = "…" if len(stats.failed) > 3 else ""
+            text += f"；{len(stats.failed)} 个文件无法读取（{', '.join(failed)}{more}）"
+        self.status_label.setText(text)
+        if self._query:
+            self._run_search()
+
+    def _on_index_failed(self, message: str) -> None:
+        self.status_label.setText(f"更新索引失败：{message}")
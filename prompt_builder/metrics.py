@@ -0,0 +1,132 @@
+import functools
+import json
+import math
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# 每翻一倍分 8 个桶，分位数的相对误差约 ±4.5%
+BUCKETS_PER_OCTAVE = 8
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """按对数分桶的耗时直方图。
+
+    只保存各桶的计数，内存占用与调用次数无关；分位数取所在桶的几何中点，
+    并限制在实测的最小、最大值之间。
+    """
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        micros = seconds * 1e6
+        bucket = int(math.log2(micros) * BUCKETS_PER_OCTAVE) if micros > 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """第 q（0~1）分位的耗时，单位秒；没有记录时为 0。"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                break
+        estimate = 2 ** ((bucket + 0.5) / BUCKETS_PER_OCTAVE) / 1e6
+        return min(max(estimate, self.min), self.max)
+
+    def summary(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"count": self.count, "total_ms": self.total * 1000}
+        for q in PERCENTILES:
+            result[f"p{round(q * 100)}_ms"] = self.percentile(q) * 1000
+        result["max_ms"] = self.max * 1000
+        # 桶号 b 覆盖 [2^(b/8), 2^((b+1)/8)) 微秒，附在报告里便于事后合并或重算
+        result["buckets"] = {str(b): n for b, n in sorted(self.buckets.items())}
+        return result
+
+
+class Metrics:
+    """热点路径的调用次数与耗时分布。
+
+    界面线程之外（如 HTTP 服务的事件循环线程）也会记录，读写直方图时加锁。
+    关闭时被 timed 包装的函数只多一次属性判断；可通过 --metrics 参数、
+    PROMPT_BUILDER_METRICS 环境变量或诊断面板开启。
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": time.time() - self.started,
+            "enabled": self.enabled,
+            "metrics": self.snapshot(),
+        }
+
+    def dump(self, path: Union[str, Path]) -> None:
+        Path(path).write_text(json.dumps(self.report(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    def timed(self, name: Optional[str] = None) -> Callable[[F], F]:
+        """装饰器：开启时记录每次调用的耗时（含异常退出），名称默认取函数名。"""
+
+        def decorate(func: F) -> F:
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(label, time.perf_counter() - start)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+
+METRICS = Metrics(enabled=bool(os.environ.get("PROMPT_BUILDER_METRICS")))
+timed = METRICS.timed
+
@@ -0,0 +1,263 @@
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, List, Optional, Sized, Union
+
+from .core import Body, ModuleCollection, ModuleItem, content_digest, profiles_from_payload
+
+if TYPE_CHECKING:
+    from .export import Progress
+
+# 预设包布局：
+#   PACK_MAGIC
+#   各模块内容（UTF-8，依次拼接）
+#   索引 JSON：{"version": 2, "modules": [{"key", "title", "enabled", "offset", "length"}, ...]}
+#   索引起始位置（20 位十进制数字）+ 换行
+# 索引放在末尾，导出时可以边读模块边写，不必先把全部内容放进内存
+PACK_MAGIC = b"PBPACK1\n"
+PACK_SUFFIX = ".pbpack"
+TRAILER_SIZE = 21
+
+
+def is_pack(path: Union[str, Path]) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(PACK_MAGIC)) == PACK_MAGIC
+
+
+class PresetPack:
+    """只读打开的预设包，模块内容从内存映射中按需解码。"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path).resolve()
+        self._file: BinaryIO = open(self.path, "rb")
+        stat = os.fstat(self._file.fileno())
+        # 文件大小与修改时间，引用包内模块的记录据此确认文件未被替换
+        self.signature = [stat.st_size, stat.st_mtime_ns]
+        self._by_key: Optional[Dict[str, Dict[str, Any]]] = None
+        try:
+            self._map: Union[mmap.mmap, bytes] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.entries = self._read_index()
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+    def _read_index(self) -> List[Dict[str, Any]]:
+        data = self._map
+        if len(data) < len(PACK_MAGIC) + TRAILER_SIZE or data[: len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError("不是有效的预设包")
+        trailer = data[len(data) - TRAILER_SIZE:]
+        try:
+            index_offset = int(trailer)
+            payload = json.loads(data[index_offset: len(data) - TRAILER_SIZE].decode("utf-8"))
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ValueError("预设包索引损坏") from exc
+        if payload.get("version") != 2:
+            raise ValueError(f"不支持的预设包版本：{payload.get('version')}")
+        entries = payload.get("modules", [])
+        self.profiles = profiles_from_payload(payload)
+        for entry in entries:
+            if entry["offset"] + entry["length"] > index_offset:
+                raise ValueError(f"预设包索引越界：模块 [{entry['key']}]")
+        return entries
+
+    def read(self, offset: int, length: int) -> str:
+        return self._map[offset: offset + length].decode("utf-8")
+
+    @property
+    def detached(self) -> bool:
+        return isinstance(self._map, bytes)
+
+    def detach(self) -> None:
+        """把整个包读入内存并关闭文件。之后模块照常读取，文件可以被替换或删除。"""
+        mapped = self._map
+        if isinstance(mapped, bytes) or mapped.closed:
+            return
+        self._map = mapped[:]
+        mapped.close()
+        self._file.close()
+
+    def locate(self, key: str, length: int) -> Optional[int]:
+        """键为 key、长度为 length 的模块在包中的偏移；没有这样的模块时返回 None。"""
+        if self._by_key is None:
+            self._by_key = {entry["key"]: entry for entry in self.entries}
+        entry = self._by_key.get(key)
+        return entry["offset"] if entry is not None and entry["length"] == length else None
+
+    def modules(self) -> ModuleCollection:
+        modules = ModuleCollection(
+            LazyModuleItem(e["key"], e["title"], e.get("enabled", True), self, e["offset"], e["length"])
+            for e in self.entries
+        )
+        if not len(modules):
+            raise ValueError("未读取到模块")
+        modules.profiles = {name: list(keys) for name, keys in self.profiles.items()}
+        return modules
+
+    def close(self) -> None:
+        mapped = getattr(self, "_map", None)
+        if isinstance(mapped, mmap.mmap) and not mapped.closed:
+            mapped.close()
+        self._file.close()
+
+
+class LazyModuleItem(ModuleItem):
+    """内容留在预设包中的模块。
+
+    读取 content 时每次从映射中解码，不在内存中保留副本；赋值后改为持有
+    新内容，此后与普通模块相同。
+    """
+
+    __slots__ = ("_pack", "_offset", "_length", "_pack_digest")
+
+    def __init__(
+        self, key: str, title: str, enabled: bool, pack: PresetPack, offset: int, length: int
+    ) -> None:
+        self.key = key
+        self.title = title
+        self.enabled = enabled
+        self._body = None
+        self._pack = pack
+        self._offset = offset
+        self._length = length
+        self._pack_digest: Optional[bytes] = None
+
+    @property
+    def content(self) -> str:
+        if self._body is not None:
+            return self._body.text
+        return self._pack.read(self._offset, self._length)
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._body = Body(value)
+
+    @property
+    def digest(self) -> bytes:
+        if self._body is not None:
+            return self._body.digest
+        # 包内容在打开期间不变，摘要算一次即可
+        if self._pack_digest is None:
+            self._pack_digest = content_digest(self.content)
+        return self._pack_digest
+
+    @property
+    def loaded(self) -> bool:
+        return self._body is not None
+
+    @property
+    def size_hint(self) -> int:
+        # 未读取时以 UTF-8 字节数代替字符数，不小于实际长度
+        return len(self._body.text) if self._body is not None else self._length
+
+    def same_content(self, other: ModuleItem) -> bool:
+        if (
+            isinstance(other, LazyModuleItem)
+            and self._body is None
+            and other._body is None
+            and self._pack is other._pack
+            and self._offset == other._offset
+        ):
+            # 同一预设包中的同一段内容不必解码比较
+            return True
+        return super().same_content(other)
+
+    def copy(self) -> ModuleItem:
+        if self._body is not None:
+            return super().copy()
+        item = LazyModuleItem(self.key, self.title, self.enabled, self._pack, self._offset, self._length)
+        item._pack_digest = self._pack_digest
+        return item
+
+    def record(self) -> Dict[str, Any]:
+        # 读入内存的包对应的文件可能已被替换，记录直接带上正文
+        if self._body is not None or self._pack.detached:
+            return self.to_dict()
+        return {
+            "key": self.key,
+            "title": self.title,
+            "enabled": self.enabled,
+            "pack": str(self._pack.path),
+            "signature": self._pack.signature,
+            "offset": self._offset,
+            "length": self._length,
+        }
+
+
+def copy_module(module: ModuleItem) -> ModuleItem:
+    """复制模块，副本与原模块共用正文；未读取的预设包模块复制后仍按需读取。"""
+    return module.copy()
+
+
+def module_record(module: ModuleItem) -> Dict[str, Any]:
+    """模块的 JSON 记录；未读取的预设包模块只记录其在包中的位置。"""
+    if isinstance(module, LazyModuleItem):
+        return module.record()
+    return module.to_dict()
+
+
+def module_from_record(record: Dict[str, Any], packs: Dict[str, PresetPack]) -> ModuleItem:
+    """module_record 的逆操作。packs 缓存已打开的预设包，同一个包只映射一次。
+
+    记录之后包被重新写过（如把预设存回原文件）时，按键与长度在新包中找回
+    该模块：记录只引用未改动过的模块，存回的包中它的内容不变。
+    """
+    if "pack" not in record:
+        return ModuleItem(record["key"], record["title"], record["content"], record.get("enabled", True))
+    path = record["pack"]
+    pack = packs.get(path)
+    if pack is None:
+        pack = packs[path] = PresetPack(path)
+    offset: Optional[int] = record["offset"]
+    if pack.signature != record["signature"]:
+        offset = pack.locate(record["key"], record["length"])
+        if offset is None:
+            raise ValueError(f"预设包已被修改：{path}")
+    return LazyModuleItem(record["key"], record["title"], record.get("enabled", True), pack, offset, record["length"])
+
+
+def module_packs(modules: Iterable[ModuleItem]) -> List[PresetPack]:
+    """模块引用的预设包（去重，按首次出现的顺序）。"""
+    packs: Dict[int, PresetPack] = {}
+    for module in modules:
+        if isinstance(module, LazyModuleItem):
+            packs.setdefault(id(module._pack), module._pack)
+    return list(packs.values())
+
+
+def load_pack(path: Union[str, Path]) -> ModuleCollection:
+    return PresetPack(path).modules()
+
+
+def save_pack(path: Union[str, Path], modules: Iterable[ModuleItem], progress: Optional["Progress"] = None) -> None:
+    """逐个模块写出预设包。先写到同目录的临时文件再替换。
+
+    源模块可以来自同一文件，但 Windows 上不能替换仍被映射的文件，调用前应先
+    对该包调用 PresetPack.detach()。
+    """
+    from .export import atomic_open
+
+    entries: List[Dict[str, Any]] = []
+    total = len(modules) if isinstance(modules, Sized) else 0
+    with atomic_open(path) as f:
+        f.write(PACK_MAGIC)
+        offset = len(PACK_MAGIC)
+        for module in modules:
+            data = module.content.encode("utf-8")
+            f.write(data)
+            entries.append({
+                "key": module.key,
+                "title": module.title,
+                "enabled": module.enabled,
+                "offset": offset,
+                "length": len(data),
+            })
+            offset += len(data)
+            if progress is not None:
+                progress(len(entries), total)
+        index: Dict[str, Any] = {"version": 2, "modules": entries}
+        profiles = getattr(modules, "profiles", None)
+        if profiles:
+            index["profiles"] = profiles
+        f.write(json.dumps(index, ensure_ascii=False).encode("utf-8"))
+        f.write(f"{offset:020d}\n".encode("ascii"))
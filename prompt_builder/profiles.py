@@ -0,0 +1,63 @@
+import hashlib
+import sys
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+from .core import ModuleItem
+
+
+def composition_key(modules: Iterable[ModuleItem]) -> bytes:
+    """已启用模块（键、标题与正文摘要，按顺序）的摘要。
+
+    组合结果只取决于这些内容，启用方案不同或任一启用模块有改动时摘要随之不同。
+    正文摘要在模块对象上缓存，重复计算只是一遍拼接。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for module in modules:
+        if module.enabled:
+            h.update(module.key.encode("utf-8", "surrogatepass"))
+            h.update(b"\0")
+            h.update(module.title.encode("utf-8", "surrogatepass"))
+            h.update(b"\0")
+            h.update(module.digest)
+    return h.digest()
+
+
+class ComposeCache:
+    """按 composition_key 缓存组合结果，总大小超过 max_bytes 时淘汰最久未用的。
+
+    在启用方案之间来回切换时，切回最近用过的方案直接取缓存，不必重新组合。
+    """
+
+    def __init__(self, max_bytes: int = 32 << 20) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[bytes, Tuple[Any, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: bytes, value: Any, text: str) -> None:
+        """text 是 value 中的组合全文，用来估计占用的内存；单项超过上限时不缓存。"""
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional, Tuple
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix_length(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class SectionIndex:
+    """预览中各模块段落的位置索引。
+
+    每个段落的跨度包含其后的一个分隔换行；最后一个段落的分隔符不在文档中，
+    因此文档长度为 total() - 1。第一个标题之前若有其他文本，以键为 None 的
+    前言段落占位。跨度保存在树状数组里，单段更新与按位置查找
+    都是 O(log n)。
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Optional[str]] = []
+        self._spans: List[int] = []
+        self._tree: List[int] = [0]
+        self._rows: Dict[Optional[str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, entries: List[Tuple[Optional[str], int]]) -> None:
+        self._keys = [key for key, _ in entries]
+        self._spans = [span for _, span in entries]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        tree = [0] + self._spans
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def row_of(self, key: str) -> Optional[int]:
+        return self._rows.get(key)
+
+    def keys(self) -> List[Optional[str]]:
+        return list(self._keys)
+
+    def key_at(self, row: int) -> Optional[str]:
+        return self._keys[row]
+
+    def has_preamble(self) -> bool:
+        return bool(self._keys) and self._keys[0] is None
+
+    def span(self, row: int) -> int:
+        return self._spans[row]
+
+    def offset(self, row: int) -> int:
+        total = 0
+        while row > 0:
+            total += self._tree[row]
+            row -= row & -row
+        return total
+
+    def total(self) -> int:
+        return self.offset(len(self._keys))
+
+    def set_span(self, row: int, span: int) -> None:
+        delta = span - self._spans[row]
+        self._spans[row] = span
+        i = row + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, position: int) -> int:
+        row, step = 0, 1 << max(len(self._keys).bit_length() - 1, 0)
+        while step:
+            nxt = row + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                row = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return min(row, len(self._keys) - 1)
+
+    def insert(self, row: int, key: str, span: int) -> None:
+        entries = list(zip(self._keys, self._spans))
+        entries.insert(row, (key, span))
+        self.rebuild(entries)
+
+    def remove(self, row: int) -> None:
+        entries = list(zip(self._keys, self._spans))
+        del entries[row]
+        self.rebuild(entries)
+
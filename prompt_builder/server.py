@@ -0,0 +1,397 @@
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from .core import ModuleCollection, compose_prompt, load_preset
+from .includes import IncludeResolver, resolve_includes
+from .library import PRESET_SUFFIXES
+from .metrics import timed
+from .packfile import module_packs
+from .templates import TemplateCache, compile_modules
+from .validation import RULES, ValidationSnapshot, validate
+
+# 请求体上限；一次填充很多行时应分批请求
+MAX_BODY = 4 << 20
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def json_body(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+class PresetView:
+    """一份预设在某个启用方案下的全文、编译后的模板与检查结果，构造后只读。"""
+
+    def __init__(self, modules: ModuleCollection) -> None:
+        resolver = IncludeResolver(modules)
+        self.text = compose_prompt(modules, resolver)
+        # 各视图用自己的模板缓存，可以在扫描线程中构造而不与请求线程共用状态
+        self.template = compile_modules(resolve_includes(modules, resolver), TemplateCache())
+        self.placeholders = list(dict.fromkeys(p.name for p in self.template.placeholders))
+        self.snapshot = ValidationSnapshot.capture(modules, self.text, resolver=resolver)
+        self.compose_body = json_body({"text": self.text, "placeholders": self.placeholders})
+        self._issues: Dict[Tuple[str, ...], bytes] = {}
+
+    def fill(self, values: Mapping[str, Any]) -> Dict[str, Any]:
+        return {
+            "text": self.template.fill(values).strip() + "\n",
+            "unresolved": list(dict.fromkeys(p.name for p in self.template.unresolved(values))),
+        }
+
+    def issues_body(self, names: Tuple[str, ...]) -> bytes:
+        body = self._issues.get(names)
+        if body is None:
+            issues = validate(self.snapshot, names)
+            body = self._issues[names] = json_body({
+                "ok": not issues,
+                "issues": [{"rule": i.rule, "message": i.message, "key": i.key} for i in issues],
+            })
+        return body
+
+
+class PresetEntry:
+    """已载入的一个预设文件。默认视图在载入时就建好，方案视图第一次用到时再建。"""
+
+    def __init__(self, name: str, path: Path, signature: Tuple[int, int]) -> None:
+        self.name = name
+        self.path = path
+        self.signature = signature
+        self.modules = load_preset(str(path))
+        try:
+            self._views: Dict[Optional[str], PresetView] = {None: PresetView(self.modules)}
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """关闭预设包的文件映射；之后不能再使用该条目。"""
+        for pack in module_packs(self.modules):
+            pack.close()
+
+    def view(self, profile: Optional[str] = None) -> PresetView:
+        view = self._views.get(profile)
+        if view is None:
+            if profile not in self.modules.profiles:
+                raise RequestError(404, f"预设 {self.name} 中没有启用方案：{profile}")
+            enabled = set(self.modules.profiles[profile])
+            modules = ModuleCollection(m.copy() for m in self.modules)
+            for module in modules:
+                module.enabled = module.key in enabled
+            view = self._views[profile] = PresetView(modules)
+        return view
+
+    def describe(self) -> Dict[str, Any]:
+        view = self._views[None]
+        return {
+            "name": self.name,
+            "modules": len(self.modules),
+            "profiles": list(self.modules.profiles),
+            "placeholders": view.placeholders,
+        }
+
+
+class PresetStore:
+    """目录下全部预设的内存缓存。
+
+    scan() 按修改时间与大小找出变化的文件，只重新载入这些文件，最后整体替换
+    字典，可以在线程池中运行而不影响正在读取的请求。载入失败的文件保留旧内容，
+    错误记在 errors 中。预设名是相对目录的路径去掉扩展名。
+
+    被替换或删除的条目先放进 retired，由处理请求的线程在确认不再使用后调用
+    close_retired() 关闭。
+    """
+
+    def __init__(self, root: Union[str, Path]) -> None:
+        self.root = Path(root)
+        self.presets: Dict[str, PresetEntry] = {}
+        self.errors: Dict[str, str] = {}
+        self.retired: List[PresetEntry] = []
+
+    def get(self, name: Any) -> PresetEntry:
+        entry = self.presets.get(name) if isinstance(name, str) else None
+        if entry is None:
+            raise RequestError(404, f"没有预设：{name}")
+        return entry
+
+    def scan(self) -> List[str]:
+        """重新检查目录，返回新增、变化或删除的预设名。"""
+        if not self.root.is_dir():
+            raise ValueError(f"预设目录不存在：{self.root}")
+        current = self.presets
+        presets: Dict[str, PresetEntry] = {}
+        errors: Dict[str, str] = {}
+        changed: List[str] = []
+        for path in sorted(self.root.rglob("*")):
+            if path.suffix not in PRESET_SUFFIXES or not path.is_file():
+                continue
+            name = path.relative_to(self.root).with_suffix("").as_posix()
+            if name in presets:
+                errors[path.relative_to(self.root).as_posix()] = f"与已载入的同名预设 {name} 冲突，已忽略"
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            entry = current.get(name)
+            if entry is None or entry.signature != signature or entry.path != path:
+                try:
+                    entry = PresetEntry(name, path, signature)
+                    changed.append(name)
+                except Exception as exc:
+                    # 一个文件载入失败只跳过该文件，不影响其余预设
+                    errors[name] = str(exc) or type(exc).__name__
+            if entry is not None:
+                presets[name] = entry
+        changed.extend(name for name in current if name not in presets)
+        self.retired.extend(entry for name, entry in current.items() if presets.get(name) is not entry)
+        self.presets = presets
+        self.errors = errors
+        return changed
+
+    def close_retired(self) -> None:
+        retired, self.retired = self.retired, []
+        for entry in retired:
+            entry.close()
+
+    def close(self) -> None:
+        self.close_retired()
+        for entry in self.presets.values():
+            entry.close()
+        self.presets = {}
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes
+
+
+class PromptServer:
+    """本地 HTTP 服务：按目录中的预设组合、填充与检查 Prompt，不依赖 Qt。
+
+    请求与响应都是 JSON：
+
+        GET  /health
+        GET  /presets
+        POST /compose   {"preset": 名称, "profile": 可选}
+        POST /fill      {"preset", "profile", "values": {...}} 或 {"rows": [{...}, ...]}
+        POST /validate  {"preset", "profile", "rules": 可选，默认为默认开启的规则}
+
+    预设全文、编译后的模板与检查结果都按预设缓存，请求只做字典查找与填充；
+    目录按 interval 秒在线程池中重新扫描，文件变化后自动重新载入。
+    """
+
+    def __init__(self, store: PresetStore, host: str = "127.0.0.1", port: int = 8765, interval: float = 1.0) -> None:
+        self.store = store
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Optional["asyncio.Task[None]"] = None
+        self._connections: Dict["asyncio.Task[None]", asyncio.StreamWriter] = {}
+        self._default_rules = tuple(name for name, rule in RULES.items() if rule.default)
+
+    async def start(self) -> int:
+        """载入预设并开始监听，返回实际端口（port 为 0 时由系统分配）。"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.store.scan)
+        self._report_errors()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.interval > 0:
+            self._watcher = loop.create_task(self._watch())
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # 关闭仍保持着的长连接，等各连接的处理协程自行退出
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self.store.close()
+
+    def _report_errors(self) -> None:
+        for name, error in self.store.errors.items():
+            print(f"跳过 {name}：{error}", file=sys.stderr)
+
+    async def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                changed = await loop.run_in_executor(None, self.store.scan)
+            except Exception as exc:
+                # 监视任务一旦退出就不再重新载入，任何错误都只提示后继续
+                print(f"扫描预设目录失败：{exc}", file=sys.stderr)
+                continue
+            # 请求在本线程中同步处理，此时已没有请求在使用被替换的条目
+            self.store.close_retired()
+            if changed:
+                print(f"已重新载入：{', '.join(changed)}", file=sys.stderr)
+                self._report_errors()
+
+    # ---- HTTP ----
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # 只实现本服务用到的 HTTP/1.1 子集：Content-Length 请求体与长连接
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    writer.write(self._encode(Response(400, json_body({"error": "请求行格式错误"})), False))
+                    break
+                method, target, version = parts
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    status = 413 if length > MAX_BODY else 400
+                    writer.write(self._encode(Response(status, json_body({"error": "请求体长度无效"})), False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                writer.write(self._encode(self.dispatch(method, target, body), keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # 客户端中途断开，或请求行、头部超过 StreamReader 的长度限制
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+
+    @staticmethod
+    def _encode(response: Response, keep_alive: bool) -> bytes:
+        head = (
+            f"HTTP/1.1 {response.status} {REASONS[response.status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + response.body
+
+    @timed("server_request")
+    def dispatch(self, method: str, target: str, body: bytes) -> Response:
+        """处理一个请求。全部在事件循环线程中同步完成，用到的数据都已缓存。"""
+        path = target.split("?", 1)[0].rstrip("/") or "/"
+        routes = {
+            "/health": ("GET", self._health),
+            "/presets": ("GET", self._list),
+            "/compose": ("POST", self._compose),
+            "/fill": ("POST", self._fill),
+            "/validate": ("POST", self._validate),
+        }
+        route = routes.get(path)
+        try:
+            if route is None:
+                raise RequestError(404, f"没有这个接口：{path}")
+            expected, handler = route
+            if method != expected:
+                raise RequestError(405, f"{path} 只接受 {expected}")
+            if expected == "GET":
+                return Response(200, handler())
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                raise RequestError(400, "请求体不是合法的 JSON") from None
+            if not isinstance(request, dict):
+                raise RequestError(400, "请求体须为 JSON 对象")
+            return Response(200, handler(request))
+        except RequestError as exc:
+            return Response(exc.status, json_body({"error": str(exc)}))
+        except Exception as exc:
+            return Response(500, json_body({"error": f"{type(exc).__name__}: {exc}"}))
+
+    def _view(self, request: Dict[str, Any]) -> PresetView:
+        profile = request.get("profile")
+        if profile is not None and not isinstance(profile, str):
+            raise RequestError(400, "profile 须为字符串")
+        return self.store.get(request.get("preset")).view(profile)
+
+    def _health(self) -> bytes:
+        return json_body({"ok": True, "presets": len(self.store.presets)})
+
+    def _list(self) -> bytes:
+        return json_body({
+            "presets": [entry.describe() for entry in self.store.presets.values()],
+            "errors": self.store.errors,
+        })
+
+    def _compose(self, request: Dict[str, Any]) -> bytes:
+        return self._view(request).compose_body
+
+    def _fill(self, request: Dict[str, Any]) -> bytes:
+        view = self._view(request)
+        if "rows" in request:
+            rows = request["rows"]
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise RequestError(400, "rows 须为 JSON 对象列表")
+            return json_body({"results": [view.fill(row) for row in rows]})
+        values = request.get("values", {})
+        if not isinstance(values, dict):
+            raise RequestError(400, "values 须为 JSON 对象")
+        return json_body(view.fill(values))
+
+    def _validate(self, request: Dict[str, Any]) -> bytes:
+        names = request.get("rules")
+        if names is None:
+            names = self._default_rules
+        elif not isinstance(names, list) or any(name not in RULES for name in names):
+            raise RequestError(400, f"rules 须为规则名列表，可用：{', '.join(RULES)}")
+        return self._view(request).issues_body(tuple(names))
+
+
+async def serve(root: Union[str, Path], host: str = "127.0.0.1", port: int = 8765, interval: float = 1.0) -> None:
+    server = PromptServer(PresetStore(root), host, port, interval)
+    await server.start()
+    print(
+        f"Prompt 服务已启动：http://{server.host}:{server.port}（{len(server.store.presets)} 个预设）",
+        file=sys.stderr,
+    )
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
@@ -0,0 +1,37 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+
+class StartupProfile:
+    """记录启动各阶段耗时，供 --startup-profile 输出。"""
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name: str) -> None:
+        self.phases.append((name, time.perf_counter() - self.origin))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def format(self) -> str:
+        lines = [f"{seconds * 1000:9.1f} ms  {name}" for name, seconds in self.phases]
+        lines.append(f"{self.elapsed() * 1000:9.1f} ms  合计")
+        return "\n".join(lines)
+
+    def report(self, stream: Optional[TextIO] = None) -> None:
+        stream = stream if stream is not None else sys.stderr
+        # 打包为无控制台程序时 stderr 为 None
+        if stream is not None:
+            print(self.format(), file=stream, flush=True)
@@ -0,0 +1,300 @@
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from .core import ModuleItem, content_digest
+
+# {{include:B}} 是模块引用（见 includes.py），不算占位符
+PLACEHOLDER_RE = re.compile(r"\{(?!include:)([^{}\n]+)\}")
+
+_MISSING = object()
+
+
+def placeholder_name(token: str) -> str:
+    # `{主领域，如 等离子体物理 / ...}` 的变量名是说明文字之前的部分
+    return re.split(r"[，,]", token, maxsplit=1)[0].strip()
+
+
+class Placeholder:
+    __slots__ = ("token", "name")
+
+    def __init__(self, token: str) -> None:
+        self.token = token
+        self.name = placeholder_name(token)
+
+    def __repr__(self) -> str:
+        return f"Placeholder({self.token!r})"
+
+    @property
+    def text(self) -> str:
+        return "{" + self.token + "}"
+
+
+Segment = Union[str, Placeholder]
+
+
+class CompiledTemplate:
+    """预编译的模板：文本只扫描一次，填充时只做片段拼接。
+
+    片段列表中字符串与占位符交替出现；填充时复制片段列表，把占位符所在的
+    槽位替换为取值后整体 join。取值先按完整占位符文本查找，再按变量名查找，
+    都没有时保留原样。
+    """
+
+    __slots__ = ("segments", "_parts", "_slots")
+
+    def __init__(self, segments: Iterable[Segment]) -> None:
+        merged: List[Segment] = []
+        for segment in segments:
+            if isinstance(segment, str):
+                if not segment:
+                    continue
+                if merged and isinstance(merged[-1], str):
+                    merged[-1] += segment
+                    continue
+            merged.append(segment)
+        self.segments: Tuple[Segment, ...] = tuple(merged)
+        self._parts = [s.text if isinstance(s, Placeholder) else s for s in merged]
+        self._slots = [(i, s.token, s.name) for i, s in enumerate(merged) if isinstance(s, Placeholder)]
+
+    @classmethod
+    def parse(cls, text: str) -> "CompiledTemplate":
+        segments: List[Segment] = []
+        last = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            segments.append(text[last:match.start()])
+            segments.append(Placeholder(match.group(1)))
+            last = match.end()
+        segments.append(text[last:])
+        return cls(segments)
+
+    @property
+    def placeholders(self) -> List[Placeholder]:
+        return [s for s in self.segments if isinstance(s, Placeholder)]
+
+    def fill(self, values: Mapping[str, Any]) -> str:
+        if not self._slots:
+            return "".join(self._parts)
+        parts = self._parts.copy()
+        for index, token, name in self._slots:
+            value = values.get(token, _MISSING)
+            if value is _MISSING:
+                value = values.get(name, _MISSING)
+            if value is not _MISSING:
+                parts[index] = str(value)
+        return "".join(parts)
+
+    def fill_many(self, rows: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        fill = self.fill
+        for values in rows:
+            yield fill(values)
+
+    def unresolved(self, values: Mapping[str, Any]) -> List[Placeholder]:
+        return [p for p in self.placeholders if p.token not in values and p.name not in values]
+
+
+class TemplateCache:
+    """按内容哈希缓存编译结果，内容变化即自然失效；超出容量时淘汰最久未用的。"""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self._entries: "OrderedDict[bytes, CompiledTemplate]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> CompiledTemplate:
+        digest = content_digest(text)
+        template = self._entries.get(digest)
+        if template is not None:
+            self._entries.move_to_end(digest)
+            return template
+        template = CompiledTemplate.parse(text)
+        self._entries[digest] = template
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+default_cache = TemplateCache()
+
+
+def compile_template(text: str, cache: Optional[TemplateCache] = None) -> CompiledTemplate:
+    return (cache or default_cache).get(text)
+
+
+def compile_modules(modules: Iterable[ModuleItem], cache: Optional[TemplateCache] = None) -> CompiledTemplate:
+    # 与 compose_prompt 的输出一致：标题行按字面处理，只编译模块正文
+    segments: List[Segment] = []
+    for module in modules:
+        if not module.enabled:
+            continue
+        segments.append(("\n" if segments else "") + f"### [{module.key}] {module.title}\n")
+        segments.extend(compile_template(module.content.strip(), cache).segments)
+        segments.append("\n")
+    return CompiledTemplate(segments)
+
+
+def fill_placeholders(
+    text: str, values: Union[Mapping[str, Any], Iterable[Mapping[str, Any]]]
+) -> Union[str, Iterator[str]]:
+    template = compile_template(text)
+    if isinstance(values, Mapping):
+        return template.fill(values)
+    return template.fill_many(values)
+
+
+HEADING_PREFIX = "### ["
+
+Span = Tuple[int, int, str]
+
+
+def scan_line(text: str) -> Tuple[Span, ...]:
+    if "{" not in text and not text.startswith(HEADING_PREFIX):
+        return ()
+    spans: List[Span] = []
+    if text.startswith(HEADING_PREFIX) and "] " in text:
+        spans.append((0, len(text), "heading"))
+    spans.extend((m.start(), m.end(), "placeholder") for m in PLACEHOLDER_RE.finditer(text))
+    return tuple(spans)
+
+
+class ModuleMarkers:
+    __slots__ = ("lines", "placeholders", "headings", "source")
+
+    def __init__(self) -> None:
+        self.lines: List[Tuple[int, Tuple[Span, ...]]] = []
+        self.placeholders = 0
+        self.headings = 0
+        # 整体设置内容时记下原文，局部改动后置空
+        self.source: Optional[str] = None
+
+    def splice(self, first: int, removed: int, texts: Iterable[str]) -> Tuple[int, int]:
+        new_lines = [(hash(text), scan_line(text)) for text in texts]
+        placeholders = headings = 0
+        for _, spans in self.lines[first:first + removed]:
+            for _, _, kind in spans:
+                if kind == "placeholder":
+                    placeholders -= 1
+                else:
+                    headings -= 1
+        for _, spans in new_lines:
+            for _, _, kind in spans:
+                if kind == "placeholder":
+                    placeholders += 1
+                else:
+                    headings += 1
+        self.lines[first:first + removed] = new_lines
+        self.placeholders += placeholders
+        self.headings += headings
+        return placeholders, headings
+
+
+class MarkerIndex:
+    """各模块中占位符与 `### [` 标题行的位置索引。
+
+    按行保存，编辑器改动时只重扫受影响的行；已启用模块的占位符总数随之增量
+    维护，检查占位符时直接读取计数。每行附带文本哈希，调用方拿到的行文本与
+    索引不一致时返回 None，由调用方自行扫描。内容尚未读入内存的模块（见
+    ModuleItem.loaded）推迟到第一次用到时再扫描，汇总的计数不包括它们。
+    """
+
+    def __init__(self) -> None:
+        self._modules: Dict[str, ModuleMarkers] = {}
+        self._enabled: Dict[str, bool] = {}
+        self._pending: Dict[str, ModuleItem] = {}
+        self._placeholders = 0
+        self._headings = 0
+
+    def rebuild(self, modules: Iterable[ModuleItem]) -> None:
+        previous = self._modules
+        self._modules = {}
+        self._enabled = {}
+        self._pending = {}
+        self._placeholders = self._headings = 0
+        for module in modules:
+            if not module.loaded:
+                self._pending[module.key] = module
+                self._enabled[module.key] = module.enabled
+                continue
+            markers = previous.get(module.key)
+            if markers is None or markers.source != module.content:
+                self.set_content(module.key, module.content, module.enabled)
+                continue
+            # 内容未变的模块沿用原有索引
+            self._modules[module.key] = markers
+            self._enabled[module.key] = module.enabled
+            if module.enabled:
+                self._placeholders += markers.placeholders
+                self._headings += markers.headings
+
+    def _materialize(self, key: Optional[str]) -> None:
+        module = self._pending.pop(key, None) if key is not None else None
+        if module is not None:
+            self.set_content(key, module.content)
+
+    def set_content(self, key: str, content: str, enabled: Optional[bool] = None) -> None:
+        self._pending.pop(key, None)
+        if enabled is not None:
+            self.set_enabled(key, enabled)
+        markers = self._modules.get(key)
+        removed = len(markers.lines) if markers else 0
+        if markers is None:
+            markers = self._modules[key] = ModuleMarkers()
+        self._apply(key, markers.splice(0, removed, content.split("\n")))
+        markers.source = content
+
+    def splice(self, key: str, first: int, removed: int, texts: Iterable[str]) -> None:
+        self._materialize(key)
+        markers = self._modules.get(key)
+        if markers is None:
+            markers = self._modules[key] = ModuleMarkers()
+        markers.source = None
+        self._apply(key, markers.splice(first, removed, texts))
+
+    def _apply(self, key: str, delta: Tuple[int, int]) -> None:
+        if self._enabled.get(key, True):
+            self._placeholders += delta[0]
+            self._headings += delta[1]
+
+    def set_enabled(self, key: str, enabled: bool) -> None:
+        was = self._enabled.get(key, True)
+        self._enabled[key] = enabled
+        markers = self._modules.get(key)
+        if markers is None or was == enabled:
+            return
+        sign = 1 if enabled else -1
+        self._placeholders += sign * markers.placeholders
+        self._headings += sign * markers.headings
+
+    def remove(self, key: str) -> None:
+        self.set_enabled(key, False)
+        self._pending.pop(key, None)
+        self._modules.pop(key, None)
+        self._enabled.pop(key, None)
+
+    def line_spans(self, key: Optional[str], line: int, text: str) -> Optional[Tuple[Span, ...]]:
+        self._materialize(key)
+        markers = self._modules.get(key) if key is not None else None
+        if markers is None or not 0 <= line < len(markers.lines):
+            return None
+        digest, spans = markers.lines[line]
+        return spans if digest == hash(text) else None
+
+    def module_placeholder_count(self, key: str) -> int:
+        self._materialize(key)
+        markers = self._modules.get(key)
+        return markers.placeholders if markers else 0
+
+    def placeholder_counts(self) -> Dict[str, int]:
+        # 只给出已扫描的模块，未读入的模块由检查规则在后台线程自行扫描
+        return {key: markers.placeholders for key, markers in self._modules.items()}
+
+    def unresolved_count(self) -> int:
+        return self._placeholders
+
+    def heading_count(self) -> int:
+        return self._headings
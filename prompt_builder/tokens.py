@@ -0,0 +1,210 @@
+import base64
+import binascii
+import math
+import re
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+from .core import ModuleItem, content_digest, render_section
+
+# 与常见 BPE 分词器相同的预切分：英文单词（含前导空格）、三位以内的数字、
+# 连续汉字、标点串与空白分别成段，之后每段单独计数
+PRETOKEN_RE = re.compile(
+    r"""'(?:s|t|re|ve|m|ll|d)| ?[A-Za-z]+| ?[0-9]{1,3}|[\u3400-\u4dbf\u4e00-\u9fff]+"""
+    r"""| ?[^\sA-Za-z0-9\u3400-\u4dbf\u4e00-\u9fff]+|\s+(?!\S)|\s+"""
+)
+
+
+class Tokenizer:
+    """分词计数的基类：按 PRETOKEN_RE 预切分，子类只需实现单段计数。
+
+    同一段文本反复出现（常用词、标点、缩进），逐段的结果会缓存。
+    """
+
+    name = "tokenizer"
+    PIECE_CACHE_SIZE = 65536
+
+    def __init__(self) -> None:
+        self._pieces: Dict[str, int] = {}
+
+    def count(self, text: str) -> int:
+        pieces = self._pieces
+        total = 0
+        for piece, repeat in Counter(PRETOKEN_RE.findall(text)).items():
+            n = pieces.get(piece)
+            if n is None:
+                if len(pieces) >= self.PIECE_CACHE_SIZE:
+                    pieces.clear()
+                n = pieces[piece] = self.count_piece(piece)
+            total += n * repeat
+        return total
+
+    def count_piece(self, piece: str) -> int:
+        raise NotImplementedError
+
+
+class EstimatingTokenizer(Tokenizer):
+    """内置的离线估算器，不需要词表。
+
+    按 BPE 分词的典型结果估算：常见长度的英文单词约 1 个 token，更长的单词
+    按每 4 个字母 1 个；汉字每字 1 个；数字每段 1 个；标点每 2 个字符 1 个；
+    空白每段 1 个。与真实分词器相比通常有一到两成的偏差，只适合做预算参考。
+    """
+
+    name = "内置估算"
+
+    def count_piece(self, piece: str) -> int:
+        word = piece.lstrip(" ")
+        if not word:
+            return 1
+        first = word[0]
+        if first.isascii() and first.isalpha():
+            return 1 if len(word) <= 6 else math.ceil(len(word) / 4)
+        if "\u3400" <= first <= "\u9fff":
+            return len(word)
+        if first.isspace() or first.isdigit() or first == "'":
+            return 1
+        if len(word) == 1:
+            return 1
+        return math.ceil(len(word) / 2)
+
+
+class VocabTokenizer(Tokenizer):
+    """按本地词表做最长匹配的分词器。
+
+    在 UTF-8 字节上逐段贪心匹配词表中最长的 token，匹配不上的字节各算 1 个。
+    与按合并规则逐步合并的 BPE 不完全相同，但对同一词表给出的数量很接近。
+    """
+
+    MAX_TOKEN_BYTES = 64
+
+    def __init__(self, vocab: Iterable[bytes], name: str = "词表") -> None:
+        super().__init__()
+        self.vocab: Set[bytes] = {token for token in vocab if token}
+        if not self.vocab:
+            raise ValueError("词表为空")
+        self.name = name
+        self.max_length = min(max(len(token) for token in self.vocab), self.MAX_TOKEN_BYTES)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "VocabTokenizer":
+        """读取词表文件。
+
+        `.tiktoken` 文件每行为 base64 编码的 token 与序号；其他文件按 UTF-8
+        文本读取，每行一个 token，行内的 `\\n`、`\\t` 转义表示换行与制表符。
+        """
+        path = Path(path)
+        tokens = []
+        if path.suffix == ".tiktoken":
+            with path.open("rb") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        tokens.append(base64.b64decode(line.split()[0], validate=True))
+                    except (binascii.Error, IndexError) as exc:
+                        raise ValueError(f"词表格式错误：第 {number} 行") from exc
+        else:
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    token = line.rstrip("\r\n").replace("\\n", "\n").replace("\\t", "\t")
+                    tokens.append(token.encode("utf-8"))
+        return cls(tokens, name=path.name)
+
+    def count_piece(self, piece: str) -> int:
+        data = piece.encode("utf-8")
+        vocab = self.vocab
+        count = start = 0
+        while start < len(data):
+            end = min(len(data), start + self.max_length)
+            while end > start + 1 and data[start:end] not in vocab:
+                end -= 1
+            start = end
+            count += 1
+        return count
+
+
+def load_tokenizer(path: Optional[Union[str, Path]] = None) -> Tokenizer:
+    return VocabTokenizer.from_file(path) if path else EstimatingTokenizer()
+
+
+class TokenCounter:
+    """各模块的 token 数及已启用模块的合计。
+
+    每个模块按渲染后的段落计数，并记录其内容哈希；内容未变时不会重新分词，
+    相同内容（撤销、复制的模块）直接复用按哈希缓存的结果。合计随单个模块的
+    更新增量维护。
+    """
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, capacity: int = 4096) -> None:
+        self.tokenizer = tokenizer or EstimatingTokenizer()
+        self.capacity = capacity
+        self._by_hash: "OrderedDict[bytes, int]" = OrderedDict()
+        self._modules: Dict[str, Tuple[bytes, int, bool]] = {}
+        self._total = 0
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def set_tokenizer(self, tokenizer: Tokenizer, modules: Iterable[ModuleItem]) -> None:
+        self.tokenizer = tokenizer
+        self._by_hash.clear()
+        self.rebuild(modules)
+
+    def rebuild(self, modules: Iterable[ModuleItem]) -> None:
+        self._modules.clear()
+        self._total = 0
+        for module in modules:
+            self.update(module)
+
+    def _count(self, digest: bytes, text: str) -> int:
+        count = self._by_hash.get(digest)
+        if count is None:
+            count = self.tokenizer.count(text)
+            self._by_hash[digest] = count
+            if len(self._by_hash) > self.capacity:
+                self._by_hash.popitem(last=False)
+        else:
+            self._by_hash.move_to_end(digest)
+        return count
+
+    def update(self, module: ModuleItem) -> bool:
+        """重新统计一个模块，返回 token 数是否变化。"""
+        text = render_section(module)
+        old = self._modules.get(module.key)
+        digest = content_digest(text)
+        if old is not None and old[0] == digest:
+            count = old[1]
+        else:
+            count = self._count(digest, text)
+        self._modules[module.key] = (digest, count, module.enabled)
+        if old is not None and old[2]:
+            self._total -= old[1]
+        if module.enabled:
+            self._total += count
+        return old is None or old[1] != count
+
+    def set_enabled(self, key: str, enabled: bool) -> None:
+        entry = self._modules.get(key)
+        if entry is None or entry[2] == enabled:
+            return
+        self._modules[key] = (entry[0], entry[1], enabled)
+        self._total += entry[1] if enabled else -entry[1]
+
+    def retain(self, keys: Iterable[str]) -> None:
+        keep = set(keys)
+        for key in [key for key in self._modules if key not in keep]:
+            self.remove(key)
+
+    def remove(self, key: str) -> None:
+        entry = self._modules.pop(key, None)
+        if entry is not None and entry[2]:
+            self._total -= entry[1]
+
+    def count(self, key: str) -> Optional[int]:
+        entry = self._modules.get(key)
+        return entry[1] if entry is not None else None
+
+    def total(self) -> int:
+        return self._total
@@ -0,0 +1,209 @@
+import re
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .core import ModuleCollection, ModuleItem
+from .includes import IncludeResolver, include_keys
+from .templates import PLACEHOLDER_RE
+
+# 预览文本可能直接取自 QTextDocument.toRawText()，段落分隔符为 \u2029
+HEADING_LINE_RE = re.compile(r"### \[[^\n\u2029]*")
+LINE_BREAKS = "\n\u2029"
+
+# 规则内循环每处理这么多项检查一次是否已取消
+CHECK_INTERVAL = 256
+
+
+class ValidationCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Issue:
+    rule: str
+    message: str
+    key: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ValidationSnapshot:
+    """一次检查所需的全部数据。
+
+    在界面线程中构造，之后只读，可以安全地交给后台线程使用。preview 是需要
+    扫描的预览文本；调用方已确认存在的标题行可放进 headings，对应段落就不必
+    再放进 preview。placeholder_counts 可提供各模块已统计好的占位符数量，
+    没有提供（或缺少某个模块）时规则自行扫描模块内容。modules 中的正文是
+    展开 include 之后的内容；尚未读入内存的预设包模块记在 deferred 中，
+    由 run_rules 在后台线程按 sources（未展开的原模块）展开。
+    """
+
+    modules: Tuple[ModuleItem, ...]
+    preview: str
+    headings: FrozenSet[str] = frozenset()
+    placeholder_counts: Optional[Mapping[str, int]] = None
+    cancelled: Callable[[], bool] = field(default=lambda: False, compare=False)
+    deferred: FrozenSet[str] = frozenset()
+    sources: Tuple[ModuleItem, ...] = ()
+
+    @classmethod
+    def capture(
+        cls,
+        modules: Iterable[ModuleItem],
+        preview: str,
+        headings: Iterable[str] = (),
+        placeholder_counts: Optional[Mapping[str, int]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+        resolver: Optional[IncludeResolver] = None,
+    ) -> "ValidationSnapshot":
+        # 模块对象会在界面线程继续被修改，这里复制一份；副本与原模块共用不可变的正文
+        originals = tuple(modules)
+        deferred: FrozenSet[str] = frozenset()
+        sources: Tuple[ModuleItem, ...] = ()
+        if resolver is not None:
+            resolver.sync()
+            # 未读入内存、也未解析过引用的模块不在界面线程读取正文，留给后台展开
+            deferred = frozenset(
+                m.key for m in originals if m.enabled and not m.loaded and not resolver.parsed(m.key)
+            )
+            resolved = resolver.resolved_modules(m for m in originals if m.key not in deferred)
+            copied = tuple(m.copy() if m.key in deferred else next(resolved).copy() for m in originals)
+            if deferred:
+                sources = tuple(m.copy() for m in originals)
+        else:
+            copied = tuple(m.copy() for m in originals)
+        counts = dict(placeholder_counts) if placeholder_counts is not None else None
+        if counts is not None and resolver is not None:
+            # 展开了 include 的模块，占位符数量以展开后的正文为准，交给规则重新统计
+            for original, module in zip(originals, copied):
+                if not original.same_content(module):
+                    counts.pop(module.key, None)
+        return cls(copied, preview, frozenset(headings), counts, cancelled or (lambda: False), deferred, sources)
+
+    def resolve_deferred(self) -> "ValidationSnapshot":
+        """展开 deferred 中的模块，返回不再有推迟项的快照。会读取正文，应在后台线程调用。"""
+        if not self.deferred:
+            return self
+        resolver = IncludeResolver(ModuleCollection(self.sources))
+        counts = dict(self.placeholder_counts) if self.placeholder_counts is not None else None
+        modules = []
+        for index, module in enumerate(self.modules):
+            if index % CHECK_INTERVAL == 0:
+                self.check()
+            if module.key in self.deferred:
+                expanded = next(resolver.resolved_modules((module,)))
+                if expanded is not module and counts is not None:
+                    counts.pop(module.key, None)
+                module = expanded
+            modules.append(module)
+        return replace(self, modules=tuple(modules), placeholder_counts=counts, deferred=frozenset(), sources=())
+
+    def enabled_modules(self) -> Iterator[ModuleItem]:
+        for index, module in enumerate(self.modules):
+            if index % CHECK_INTERVAL == 0:
+                self.check()
+            if module.enabled:
+                yield module
+
+    def check(self) -> None:
+        if self.cancelled():
+            raise ValidationCancelled()
+
+
+RuleFunc = Callable[[ValidationSnapshot], Iterable[Issue]]
+
+
+@dataclass(frozen=True)
+class ValidationRule:
+    name: str
+    label: str
+    func: RuleFunc
+    default: bool = True
+
+
+RULES: Dict[str, ValidationRule] = {}
+
+
+def register_rule(name: str, label: str, default: bool = True) -> Callable[[RuleFunc], RuleFunc]:
+    """注册检查规则，界面会为每条规则生成一个开关。同名规则后注册的覆盖先注册的。"""
+
+    def decorator(func: RuleFunc) -> RuleFunc:
+        RULES[name] = ValidationRule(name, label, func, default)
+        return func
+
+    return decorator
+
+
+def heading_lines(preview: str, snapshot: Optional[ValidationSnapshot] = None) -> Iterator[re.Match]:
+    for index, match in enumerate(HEADING_LINE_RE.finditer(preview)):
+        if snapshot is not None and index % CHECK_INTERVAL == 0:
+            snapshot.check()
+        start = match.start()
+        if start == 0 or preview[start - 1] in LINE_BREAKS:
+            yield match
+
+
+@register_rule("headers", "检查模块标题完整性")
+def check_headers(snapshot: ValidationSnapshot) -> Iterator[Issue]:
+    # 一次扫描收集预览中的全部标题行，再逐个模块查表
+    present = set(snapshot.headings)
+    present.update(match.group(0) for match in heading_lines(snapshot.preview, snapshot))
+    for m in snapshot.enabled_modules():
+        if f"### [{m.key}] {m.title}" not in present:
+            yield Issue("headers", f"缺少标题：[{m.key}] {m.title}", m.key)
+
+
+@register_rule("empty", "检查空内容")
+def check_empty(snapshot: ValidationSnapshot) -> Iterator[Issue]:
+    for m in snapshot.enabled_modules():
+        if not m.content.strip():
+            yield Issue("empty", f"模块 [{m.key}] 内容为空", m.key)
+
+
+@register_rule("placeholders", "检查占位符（{...}）", default=False)
+def check_placeholders(snapshot: ValidationSnapshot) -> Iterator[Issue]:
+    counts = snapshot.placeholder_counts
+    for m in snapshot.enabled_modules():
+        count = counts.get(m.key) if counts is not None else None
+        if count is None:
+            count = len(PLACEHOLDER_RE.findall(m.content))
+        if count:
+            yield Issue("placeholders", f"模块 [{m.key}] 有 {count} 处未替换的占位符", m.key)
+    # 第一个标题之前的前言不属于任何模块，单独扫描
+    first = next(heading_lines(snapshot.preview), None)
+    preamble = snapshot.preview[: first.start()] if first else snapshot.preview
+    preamble = preamble.replace("\u2029", "\n")
+    count = len(PLACEHOLDER_RE.findall(preamble))
+    if count:
+        yield Issue("placeholders", f"标题之前的文本有 {count} 处未替换的占位符")
+
+
+@register_rule("includes", "检查模块引用（{{include:...}}）")
+def check_includes(snapshot: ValidationSnapshot) -> Iterator[Issue]:
+    # 展开后仍残留的指令要么引用了不存在的模块，要么处在循环引用中
+    keys = {m.key for m in snapshot.modules}
+    for m in snapshot.enabled_modules():
+        for target in include_keys(m.content):
+            if target not in keys:
+                yield Issue("includes", f"模块 [{m.key}] 引用的模块 [{target}] 不存在", m.key)
+            else:
+                yield Issue("includes", f"模块 [{m.key}] 对 [{target}] 的引用形成循环", m.key)
+
+
+def run_rules(
+    snapshot: ValidationSnapshot, names: Optional[Sequence[str]] = None
+) -> Iterator[Tuple[str, List[Issue]]]:
+    """按规则依次检查，每条规则完成后产出一批结果。
+
+    检查过程中 snapshot.cancelled() 为真时抛出 ValidationCancelled。
+    """
+    snapshot = snapshot.resolve_deferred()
+    for name in names if names is not None else list(RULES):
+        rule = RULES.get(name)
+        if rule is None:
+            raise ValueError(f"未知的检查规则：{name}")
+        snapshot.check()
+        yield name, list(rule.func(snapshot))
+
+
+def validate(snapshot: ValidationSnapshot, names: Optional[Sequence[str]] = None) -> List[Issue]:
+    return [issue for _, issues in run_rules(snapshot, names) for issue in issues]
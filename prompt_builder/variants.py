@@ -0,0 +1,278 @@
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .core import ModuleCollection, ModuleItem, content_digest, modules_from_payload, modules_to_payload
+from .includes import resolve_includes
+from .templates import CompiledTemplate, compile_modules, compile_template
+
+# 选项行：`深度级别：科普 / 研究生 / 论文级（默认：研究生）`；冒号后为空时，紧随的 `- ` 行是各选项
+OPTION_RE = re.compile(r"^([^\s：:][^：:]*)[：:][ \t]*(.*)$")
+DEFAULT_NOTE_RE = re.compile(r"[（(]默认[：:].*?[）)]\s*$")
+
+# (序号, 内容摘要, 文本)
+Rendered = Tuple[int, bytes, str]
+
+
+@dataclass(frozen=True)
+class OptionLines:
+    """模块正文中一个选项占据的行范围 [start, end) 及列出的选项。"""
+
+    name: str
+    start: int
+    end: int
+    choices: Tuple[str, ...]
+
+
+def option_lines(content: str) -> Dict[str, OptionLines]:
+    lines = content.split("\n")
+    options: Dict[str, OptionLines] = {}
+    index = 0
+    while index < len(lines):
+        match = OPTION_RE.match(lines[index])
+        if match is None:
+            index += 1
+            continue
+        name, rest = match.group(1).strip(), DEFAULT_NOTE_RE.sub("", match.group(2)).strip()
+        end = index + 1
+        if rest:
+            choices = tuple(c.strip() for c in rest.split("/") if c.strip())
+        else:
+            while end < len(lines) and lines[end].lstrip().startswith("- "):
+                end += 1
+            choices = tuple(line.lstrip()[2:].strip() for line in lines[index + 1:end])
+        options[name] = OptionLines(name, index, end, choices)
+        index = end
+    return options
+
+
+@dataclass(frozen=True)
+class Axis:
+    """变体矩阵的一个维度。
+
+    kind 为 placeholder（占位符取值）、option（改写模块中的选项行）或
+    module（模块启用 / 停用）。
+    """
+
+    name: str
+    kind: str
+    values: Tuple[Any, ...]
+    module: Optional[str] = None
+    option: Optional[str] = None
+
+    @property
+    def token(self) -> str:
+        # 选项行改写成的占位符，@ 开头不会与预设中的占位符重名
+        return f"@{self.module}.{self.option}" if self.kind == "option" else self.name
+
+
+def axes_from_spec(spec: Dict[str, Any], modules: ModuleCollection) -> List[Axis]:
+    """解析变体矩阵定义：
+
+        {"axes": [
+            {"placeholder": "主领域", "values": ["等离子体物理", "光学"]},
+            {"module": "H", "option": "深度级别"},
+            {"module": "G"}
+        ]}
+
+    选项轴省略 values 时取模块中列出的全部选项；只写 module 表示该模块启用 / 停用两种情况。
+    """
+    raw_axes = spec.get("axes") if isinstance(spec, dict) else None
+    if not isinstance(raw_axes, list) or not raw_axes:
+        raise ValueError("变体矩阵需要非空的 axes 列表")
+    axes: List[Axis] = []
+    placeholders = None
+    for number, raw in enumerate(raw_axes, 1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"第 {number} 个维度不是 JSON 对象")
+        values = raw.get("values")
+        if values is not None and (not isinstance(values, list) or not values):
+            raise ValueError(f"第 {number} 个维度的 values 须为非空列表")
+        if "placeholder" in raw:
+            if values is None:
+                raise ValueError(f"占位符维度 {raw['placeholder']} 缺少 values")
+            if placeholders is None:
+                placeholders = {p.name for m in modules for p in compile_template(m.content).placeholders}
+            if raw["placeholder"] not in placeholders:
+                raise ValueError(f"预设中没有占位符：{raw['placeholder']}")
+            axes.append(Axis(str(raw["placeholder"]), "placeholder", tuple(str(v) for v in values)))
+            continue
+        key = raw.get("module")
+        module = modules.get(key)
+        if module is None:
+            raise ValueError(f"第 {number} 个维度引用了不存在的模块：{key}")
+        option = raw.get("option")
+        if option is None:
+            axes.append(Axis(key, "module", (True, False), module=key))
+            continue
+        found = option_lines(module.content).get(option)
+        if found is None:
+            raise ValueError(f"模块 {key} 中没有选项行：{option}")
+        if values is None:
+            if not found.choices:
+                raise ValueError(f"模块 {key} 的选项 {option} 没有列出可选值，需在 values 中给出")
+            values = found.choices
+        axes.append(Axis(f"{key}.{option}", "option", tuple(str(v) for v in values), module=key, option=option))
+    names = [axis.name for axis in axes]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"维度重复：{', '.join(duplicated)}")
+    return axes
+
+
+class VariantMatrix:
+    """按维度的笛卡尔积生成 Prompt 变体。
+
+    变体按序号惰性展开（末位维度变化最快，与 itertools.product 相同），不在内存中
+    列出全部组合。选项行先改写成占位符，每种模块启用组合只编译一次模板，之后
+    每个变体只是一次填充。
+    """
+
+    def __init__(self, modules: ModuleCollection, axes: Sequence[Axis]) -> None:
+        self.source = modules
+        self.axes = list(axes)
+        self._toggles = [i for i, axis in enumerate(self.axes) if axis.kind == "module"]
+        self._fills = [i for i, axis in enumerate(self.axes) if axis.kind != "module"]
+        self.modules = ModuleCollection(self._prepare(modules))
+        self._templates: Dict[Tuple[bool, ...], CompiledTemplate] = {}
+        self.total = 1
+        for axis in self.axes:
+            self.total *= len(axis.values)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _prepare(self, modules: ModuleCollection) -> Iterator[ModuleItem]:
+        rewrites: Dict[str, List[Axis]] = {}
+        for axis in self.axes:
+            if axis.kind == "option":
+                rewrites.setdefault(axis.module, []).append(axis)
+        for module in modules:
+            item = module.copy()
+            if module.key in rewrites:
+                lines = module.content.split("\n")
+                options = option_lines(module.content)
+                # 从后往前替换，前面选项的行号不受影响
+                for axis in sorted(rewrites[module.key], key=lambda a: options[a.option].start, reverse=True):
+                    found = options[axis.option]
+                    lines[found.start:found.end] = [f"{axis.option}：{{{axis.token}}}"]
+                item.content = "\n".join(lines)
+            yield item
+
+    def combination(self, index: int) -> Tuple[Any, ...]:
+        """第 index 个变体在各维度上的取值。"""
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        picks: List[Any] = []
+        for axis in reversed(self.axes):
+            index, digit = divmod(index, len(axis.values))
+            picks.append(axis.values[digit])
+        picks.reverse()
+        return tuple(picks)
+
+    def values(self, index: int) -> Dict[str, Any]:
+        return {axis.name: value for axis, value in zip(self.axes, self.combination(index))}
+
+    def _template(self, enabled: Tuple[bool, ...]) -> CompiledTemplate:
+        template = self._templates.get(enabled)
+        if template is None:
+            states = {self.axes[i].module: state for i, state in zip(self._toggles, enabled)}
+            modules = ModuleCollection(m.copy() for m in self.modules)
+            for key, state in states.items():
+                modules.get(key).enabled = state
+            template = self._templates[enabled] = compile_modules(resolve_includes(modules))
+        return template
+
+    def render(self, index: int) -> str:
+        picks = self.combination(index)
+        template = self._template(tuple(picks[i] for i in self._toggles))
+        return template.fill({self.axes[i].token: picks[i] for i in self._fills}).strip() + "\n"
+
+    def render_range(self, start: int, stop: int) -> List[Rendered]:
+        rendered = []
+        for index in range(start, min(stop, self.total)):
+            text = self.render(index)
+            rendered.append((index, content_digest(text), text))
+        return rendered
+
+
+# 工作进程各自持有一份矩阵，任务只传序号范围
+_worker_matrix: Optional[VariantMatrix] = None
+
+
+def _init_worker(payload: Dict[str, Any], axes: List[Axis]) -> None:
+    global _worker_matrix
+    _worker_matrix = VariantMatrix(modules_from_payload(payload), axes)
+
+
+def _render_chunk(start: int, stop: int) -> List[Rendered]:
+    return _worker_matrix.render_range(start, stop)
+
+
+def render_variants(matrix: VariantMatrix, workers: int = 0, chunk_size: int = 256) -> Iterator[Rendered]:
+    """按序号顺序产出全部变体。
+
+    workers 大于 1 时分块交给进程池渲染；同时在途的块不超过 workers 的两倍，
+    写出速度跟不上时不会在内存中堆积结果。
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = ((start, start + chunk_size) for start in range(0, matrix.total, chunk_size))
+    if workers <= 1 or matrix.total <= chunk_size:
+        for start, stop in chunks:
+            yield from matrix.render_range(start, stop)
+        return
+    # 工作进程按改写选项行之前的模块重新构建矩阵
+    payload = modules_to_payload(matrix.source)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(payload, matrix.axes)) as pool:
+        pending: Deque["Future[List[Rendered]]"] = deque()
+        for start, stop in chunks:
+            pending.append(pool.submit(_render_chunk, start, stop))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+@dataclass
+class VariantStats:
+    total: int = 0
+    written: int = 0
+    duplicates: int = 0
+
+
+def generate_variants(
+    matrix: VariantMatrix,
+    out: Union[str, Path],
+    workers: int = 0,
+    chunk_size: int = 256,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> VariantStats:
+    """把全部变体写到 out 目录，每个变体一个文件，内容相同的只写第一个。
+
+    variants.jsonl 逐行记录每个变体的取值与文件名，重复的变体记录 duplicate_of。
+    """
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    stats = VariantStats(total=matrix.total)
+    seen: Dict[bytes, str] = {}
+    with open(out / "variants.jsonl", "w", encoding="utf-8") as manifest:
+        for done, (index, digest, text) in enumerate(render_variants(matrix, workers, chunk_size), 1):
+            record: Dict[str, Any] = {"index": index, "values": matrix.values(index)}
+            first = seen.get(digest)
+            if first is None:
+                name = seen[digest] = f"{index:08d}.txt"
+                (out / name).write_text(text, encoding="utf-8")
+                record["file"] = name
+                stats.written += 1
+            else:
+                record["duplicate_of"] = first
+                stats.duplicates += 1
+            manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if progress is not None:
+                progress(done, stats.total)
+    return stats
@@ -0,0 +1,102 @@
+import time
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from .core import ModuleCollection
+from .history import History
+
+if TYPE_CHECKING:
+    from .journal import Journal
+
+
+class PresetDocument:
+    """工作区中打开的一份预设：模块、撤销历史与自动保存日志。
+
+    索引、统计与预览文档等派生状态由界面在激活时创建并放在 view 中，
+    文档闲置后整体释放，再次激活时重建。
+    """
+
+    def __init__(
+        self,
+        modules: ModuleCollection,
+        name: str,
+        history: History,
+        path: Optional[str] = None,
+        journal: Optional["Journal"] = None,
+    ) -> None:
+        self.modules = modules
+        self.name = name
+        self.history = history
+        self.path = path
+        self.journal = journal
+        self.view: Any = None
+        self.selected_key: Optional[str] = None
+        self.last_active = 0.0
+
+    @property
+    def pristine(self) -> bool:
+        """未保存到文件且从未修改过的文档，导入预设时可以直接替换。"""
+        return self.path is None and not self.history.can_undo() and not self.history.can_redo()
+
+    def save_meta(self) -> None:
+        if self.journal is not None:
+            self.journal.meta = {"name": self.name, "path": self.path}
+
+
+class Workspace:
+    """同时打开的多份预设。
+
+    只有当前文档与最近使用的 keep_views 份文档保留派生状态；其余文档以及
+    闲置超过 idle_seconds 秒的文档由 idle_views() 列出，交给界面释放。
+    """
+
+    def __init__(self, keep_views: int = 3, idle_seconds: float = 120.0) -> None:
+        self.keep_views = keep_views
+        self.idle_seconds = idle_seconds
+        self.documents: List[PresetDocument] = []
+        self.active: Optional[PresetDocument] = None
+        self._untitled = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def index(self, document: PresetDocument) -> int:
+        return self.documents.index(document)
+
+    def untitled_name(self) -> str:
+        names = {d.name for d in self.documents}
+        while True:
+            self._untitled += 1
+            name = f"未命名 {self._untitled}"
+            if name not in names:
+                return name
+
+    def add(self, document: PresetDocument) -> int:
+        self.documents.append(document)
+        return len(self.documents) - 1
+
+    def remove(self, document: PresetDocument) -> None:
+        self.documents.remove(document)
+        if self.active is document:
+            self.active = None
+
+    def activate(self, document: PresetDocument) -> None:
+        now = time.monotonic()
+        if self.active is not None:
+            self.active.last_active = now
+        document.last_active = now
+        self.active = document
+
+    def idle_views(self, now: Optional[float] = None) -> List[PresetDocument]:
+        now = time.monotonic() if now is None else now
+        held = sorted(
+            (d for d in self.documents if d.view is not None and d is not self.active),
+            key=lambda d: d.last_active,
+            reverse=True,
+        )
+        return [
+            d for i, d in enumerate(held)
+            if i >= self.keep_views or now - d.last_active > self.idle_seconds
+        ]